@@ -0,0 +1,52 @@
+"""composite indexes for hot queries
+
+Revision ID: 0002_hot_query_indexes
+Revises: 0001_initial
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+
+
+revision = "0002_hot_query_indexes"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_submissions_student_assignment",
+        "submissions",
+        ["student_id", "assignment_id", "attempt_no"],
+    )
+    op.create_index(
+        "ix_submissions_assignment_submitted_at",
+        "submissions",
+        ["assignment_id", "submitted_at"],
+    )
+    op.create_index(
+        "ix_assignments_class_subject_type",
+        "assignments",
+        ["class_group_id", "subject_id", "type"],
+    )
+    op.create_index(
+        "ix_assignments_subject_topic_type_published",
+        "assignments",
+        ["subject_id", "topic_id", "type", "published"],
+    )
+    op.create_index("ix_theories_class_subject", "theories", ["class_group_id", "subject_id"])
+    op.create_index("ix_theories_subject_topic", "theories", ["subject_id", "topic_id"])
+    op.create_index("ix_topics_class_subject", "topics", ["class_group_id", "subject_id"])
+    op.create_index("ix_users_class_group_role", "users", ["class_group_id", "role"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_class_group_role", table_name="users")
+    op.drop_index("ix_topics_class_subject", table_name="topics")
+    op.drop_index("ix_theories_subject_topic", table_name="theories")
+    op.drop_index("ix_theories_class_subject", table_name="theories")
+    op.drop_index("ix_assignments_subject_topic_type_published", table_name="assignments")
+    op.drop_index("ix_assignments_class_subject_type", table_name="assignments")
+    op.drop_index("ix_submissions_assignment_submitted_at", table_name="submissions")
+    op.drop_index("ix_submissions_student_assignment", table_name="submissions")
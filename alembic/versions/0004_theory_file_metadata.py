@@ -0,0 +1,27 @@
+"""theory file name, size and sha256
+
+Revision ID: 0004_theory_file_metadata
+Revises: 0003_user_token_version
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_theory_file_metadata"
+down_revision = "0003_user_token_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("theories", sa.Column("file_name", sa.String(), nullable=True))
+    op.add_column("theories", sa.Column("file_size", sa.BigInteger(), nullable=True))
+    op.add_column("theories", sa.Column("file_sha256", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("theories", "file_sha256")
+    op.drop_column("theories", "file_size")
+    op.drop_column("theories", "file_name")
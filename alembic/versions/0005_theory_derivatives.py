@@ -0,0 +1,25 @@
+"""theory derivatives and processing status
+
+Revision ID: 0005_theory_derivatives
+Revises: 0004_theory_file_metadata
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_theory_derivatives"
+down_revision = "0004_theory_file_metadata"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("theories", sa.Column("processing_status", sa.String(length=16), nullable=True))
+    op.add_column("theories", sa.Column("derivatives", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("theories", "derivatives")
+    op.drop_column("theories", "processing_status")
@@ -0,0 +1,44 @@
+"""unique attempt numbers per student and assignment
+
+Revision ID: 0006_unique_submission_attempts
+Revises: 0005_theory_derivatives
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+
+
+revision = "0006_unique_submission_attempts"
+down_revision = "0005_theory_derivatives"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Concurrent submits could store the same attempt_no twice; renumber those attempts in id order.
+    op.execute(
+        """
+        UPDATE submissions
+        SET attempt_no = (
+            SELECT count(*) FROM submissions AS earlier
+            WHERE earlier.assignment_id = submissions.assignment_id
+              AND earlier.student_id = submissions.student_id
+              AND earlier.id <= submissions.id
+        )
+        WHERE (assignment_id, student_id) IN (
+            SELECT assignment_id, student_id FROM submissions
+            GROUP BY assignment_id, student_id
+            HAVING count(*) <> count(DISTINCT attempt_no)
+        )
+        """
+    )
+    op.create_index(
+        "ux_submissions_assignment_student_attempt",
+        "submissions",
+        ["assignment_id", "student_id", "attempt_no"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_submissions_assignment_student_attempt", table_name="submissions")
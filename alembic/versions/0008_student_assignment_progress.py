@@ -0,0 +1,58 @@
+"""per-student assignment progress
+
+Revision ID: 0008_student_assignment_progress
+Revises: 0007_idempotency_keys
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_student_assignment_progress"
+down_revision = "0007_idempotency_keys"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "student_assignment_progress",
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("assignment_id", sa.Integer(), sa.ForeignKey("assignments.id"), nullable=False),
+        sa.Column("attempts_used", sa.Integer(), nullable=False),
+        sa.Column("last_score", sa.Integer(), nullable=True),
+        sa.Column("last_grade", sa.Integer(), nullable=True),
+        sa.Column("best_score", sa.Integer(), nullable=True),
+        sa.Column("best_grade", sa.Integer(), nullable=True),
+        sa.Column("last_submitted_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("student_id", "assignment_id"),
+    )
+    # Same query as app.services.progress.rebuild_progress.
+    op.execute(
+        """
+        INSERT INTO student_assignment_progress (
+            student_id, assignment_id, attempts_used, last_score, last_grade,
+            best_score, best_grade, last_submitted_at
+        )
+        SELECT student_id, assignment_id, attempts_used, score, grade, best_score, best_grade, submitted_at
+        FROM (
+            SELECT
+                student_id,
+                assignment_id,
+                score,
+                grade,
+                submitted_at,
+                count(*) OVER (PARTITION BY student_id, assignment_id) AS attempts_used,
+                max(score) OVER (PARTITION BY student_id, assignment_id) AS best_score,
+                max(grade) OVER (PARTITION BY student_id, assignment_id) AS best_grade,
+                row_number() OVER (PARTITION BY student_id, assignment_id ORDER BY attempt_no DESC) AS rn
+            FROM submissions
+        ) AS ranked
+        WHERE rn = 1
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("student_assignment_progress")
@@ -0,0 +1,22 @@
+"""index theories.file_path for blob reference counts
+
+Revision ID: 0009_theory_file_path_index
+Revises: 0008_student_assignment_progress
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+
+
+revision = "0009_theory_file_path_index"
+down_revision = "0008_student_assignment_progress"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_theories_file_path", "theories", ["file_path"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_theories_file_path", table_name="theories")
@@ -0,0 +1,47 @@
+"""theory derivative blob keys in an indexed table
+
+Revision ID: 0010_theory_derivative_blobs
+Revises: 0009_theory_file_path_index
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010_theory_derivative_blobs"
+down_revision = "0009_theory_file_path_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    table = op.create_table(
+        "theory_derivatives",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("theory_id", sa.Integer(), sa.ForeignKey("theories.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("blob_key", sa.String(), nullable=False),
+    )
+    op.create_index("ix_theory_derivatives_blob_key", "theory_derivatives", ["blob_key"])
+
+    # Same key layout as app.services.storage.blob_key.
+    rows = []
+    theories = op.get_bind().execute(sa.text("SELECT id, derivatives FROM theories WHERE derivatives IS NOT NULL"))
+    for theory_id, derivatives in theories:
+        if isinstance(derivatives, str):
+            derivatives = json.loads(derivatives)
+        for kind, derivative in (derivatives or {}).items():
+            sha256 = derivative["sha256"]
+            rows.append(
+                {"theory_id": theory_id, "kind": kind, "blob_key": f"{sha256[:2]}/{sha256[2:4]}/{sha256}"}
+            )
+    if rows:
+        op.bulk_insert(table, rows)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_theory_derivatives_blob_key", table_name="theory_derivatives")
+    op.drop_table("theory_derivatives")
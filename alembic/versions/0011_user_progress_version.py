@@ -0,0 +1,26 @@
+"""progress version counter on users
+
+Revision ID: 0011_user_progress_version
+Revises: 0010_theory_derivative_blobs
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011_user_progress_version"
+down_revision = "0010_theory_derivative_blobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("progress_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "progress_version")
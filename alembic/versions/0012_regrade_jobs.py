@@ -0,0 +1,46 @@
+"""regrade jobs shared by all API processes
+
+Revision ID: 0012_regrade_jobs
+Revises: 0011_user_progress_version
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0012_regrade_jobs"
+down_revision = "0011_user_progress_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "regrade_jobs",
+        sa.Column("id", sa.String(length=32), primary_key=True),
+        sa.Column(
+            "assignment_id", sa.Integer(), sa.ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("processed", sa.Integer(), nullable=False),
+        sa.Column("updated", sa.Integer(), nullable=False),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("heartbeat_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        "ux_regrade_jobs_active_assignment",
+        "regrade_jobs",
+        ["assignment_id"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+        sqlite_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_regrade_jobs_active_assignment", table_name="regrade_jobs")
+    op.drop_table("regrade_jobs")
@@ -1,48 +1,121 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
 from app.core.config import get_settings
-from app.db.session import SessionLocal
+from app.db import session as db_session
 from app.models import User, UserRole
+from app.services.auth import Principal, principal_from_claims
+from app.services.principal_cache import principal_cache
+from app.services.reference_data import SubjectRef, reference_data
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
 def get_db():
-    db = SessionLocal()
+    db = db_session.SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
-) -> User:
-    credentials_exception = HTTPException(
+async def get_async_db():
+    if db_session.AsyncSessionLocal is None:
+        raise RuntimeError("Async database access is disabled, set ASYNC_DB_ENABLED=true")
+    async with db_session.AsyncSessionLocal() as db:
+        yield db
+
+
+def get_subject(db: Session, name: str) -> SubjectRef:
+    subject = reference_data.subject_by_name(db, name)
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    return subject
+
+
+async def get_subject_async(db: AsyncSession, name: str) -> SubjectRef:
+    subject = await db.run_sync(reference_data.subject_by_name, name)
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    return subject
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def decode_token(token: str) -> dict:
     try:
         settings = get_settings()
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        phone = payload.get("sub")
-        role = payload.get("role")
-        if not phone or not role:
-            raise credentials_exception
     except JWTError as exc:
-        raise credentials_exception from exc
+        raise credentials_exception() from exc
+    if not payload.get("sub") or not payload.get("role"):
+        raise credentials_exception()
+    return payload
+
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+) -> User:
+    payload = decode_token(token)
+
+    user = principal_cache.get(db, token)
+    if user is not None:
+        return user
 
-    user = db.query(User).filter(User.phone == phone).first()
+    principal = principal_from_claims(payload)
+    query = db.query(User).options(joinedload(User.class_group), joinedload(User.subject))
+    if principal is not None:
+        generation = principal_cache.generation(principal.id)
+        user = query.filter(User.id == principal.id).first()
+        if user and (user.token_version or 0) != principal.token_version:
+            raise credentials_exception()
+    else:
+        user = query.filter(User.phone == payload["sub"]).first()
+        generation = principal_cache.generation(user.id) if user else 0
     if not user:
-        raise credentials_exception
+        raise credentials_exception()
+    principal_cache.set(token, user, generation)
     return user
 
 
+def get_current_principal(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+) -> Principal:
+    payload = decode_token(token)
+    principal = principal_from_claims(payload)
+    if principal is None:
+        return Principal.from_user(get_current_user(db, token))
+    if principal_cache.token_version(db, principal.id) != principal.token_version:
+        raise credentials_exception()
+    return principal
+
+
+async def get_current_principal_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme),
+) -> Principal:
+    # Same checks as get_current_principal on the request's async session, so async routes never
+    # open a sync connection or hop to the threadpool; a cached token version needs no query.
+    payload = decode_token(token)
+    principal = principal_from_claims(payload)
+    if principal is None:
+        return await db.run_sync(lambda session: Principal.from_user(get_current_user(session, token)))
+    if await db.run_sync(principal_cache.token_version, principal.id) != principal.token_version:
+        raise credentials_exception()
+    return principal
+
+
 def get_current_teacher(current_user: User = Depends(get_current_user)) -> User:
     if current_user.role != UserRole.teacher:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Teacher role required")
@@ -53,3 +126,23 @@ def get_current_student(current_user: User = Depends(get_current_user)) -> User:
     if current_user.role != UserRole.student:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Student role required")
     return current_user
+
+
+def get_student_principal(principal: Principal = Depends(get_current_principal)) -> Principal:
+    if principal.role != UserRole.student:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Student role required")
+    return principal
+
+
+async def get_student_principal_async(
+    principal: Principal = Depends(get_current_principal_async),
+) -> Principal:
+    if principal.role != UserRole.student:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Student role required")
+    return principal
+
+
+def get_teacher_principal(principal: Principal = Depends(get_current_principal)) -> Principal:
+    if principal.role != UserRole.teacher:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Teacher role required")
+    return principal
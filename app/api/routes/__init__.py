@@ -1,3 +1,3 @@
-from app.api.routes import auth, teacher, student, files
+from app.api.routes import auth, teacher, student, student_async, files, metrics
 
-__all__ = ["auth", "teacher", "student", "files"]
+__all__ = ["auth", "teacher", "student", "student_async", "files", "metrics"]
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.api.deps import get_db, get_current_user
 from app.core.config import get_settings
-from app.core.security import verify_password, hash_password
-from app.services.auth import build_access_token
+from app.core.security import PasswordHasherBusy, hash_password_pooled, verify_password_pooled
+from app.services.auth import build_user_access_token
+from app.services.principal_cache import principal_cache
 from app.models import User, UserRole
 from app.schemas.auth import LoginRequest, LoginResponse, LoginUser, SetPasswordRequest, SetPasswordResponse, MeResponse
 
@@ -12,8 +14,17 @@ router = APIRouter()
 settings = get_settings()
 
 
-@router.post("/auth/login", response_model=LoginResponse)
-def login(request: LoginRequest, db: Session = Depends(get_db)) -> LoginResponse:
+def password_hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, try again",
+        headers={"Retry-After": "1"},
+    )
+
+
+# The handlers are async so bcrypt is awaited on the event loop; the sync Session is only used
+# inside run_in_threadpool.
+def _login_user(db: Session, request: LoginRequest) -> User:
     user = db.query(User).filter(User.phone == request.phone).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
@@ -24,15 +35,11 @@ def login(request: LoginRequest, db: Session = Depends(get_db)) -> LoginResponse
 
     if not user.password_hash:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Password not set")
+    return user
 
-    if not verify_password(request.password, user.password_hash):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    access_token = build_access_token(
-        phone=user.phone,
-        role=user.role.value,
-        expires_minutes=settings.access_token_expire_minutes,
-    )
+def _login_response(user: User) -> LoginResponse:
+    access_token = build_user_access_token(user, expires_minutes=settings.access_token_expire_minutes)
 
     class_name = user.class_group.name if user.class_group else None
     subject_name = user.subject.name if user.subject else None
@@ -51,8 +58,19 @@ def login(request: LoginRequest, db: Session = Depends(get_db)) -> LoginResponse
     )
 
 
-@router.post("/auth/set-password", response_model=SetPasswordResponse)
-def set_password(request: SetPasswordRequest, db: Session = Depends(get_db)) -> SetPasswordResponse:
+@router.post("/auth/login", response_model=LoginResponse)
+async def login(request: LoginRequest, db: Session = Depends(get_db)) -> LoginResponse:
+    user = await run_in_threadpool(_login_user, db, request)
+    try:
+        password_ok = await verify_password_pooled(request.password, user.password_hash)
+    except PasswordHasherBusy as exc:
+        raise password_hasher_busy() from exc
+    if not password_ok:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    return await run_in_threadpool(_login_response, user)
+
+
+def _password_user(db: Session, request: SetPasswordRequest) -> User:
     user = db.query(User).filter(User.phone == request.phone).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -60,9 +78,24 @@ def set_password(request: SetPasswordRequest, db: Session = Depends(get_db)) ->
     if user.role == UserRole.teacher:
         if not request.teacher_code or request.teacher_code != user.teacher_code:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid teacher code")
+    return user
 
-    user.password_hash = hash_password(request.new_password)
+
+def _store_password(db: Session, user: User, password_hash: str) -> None:
+    user.password_hash = password_hash
+    user.token_version = (user.token_version or 0) + 1
     db.commit()
+    principal_cache.invalidate_user(user.id)
+
+
+@router.post("/auth/set-password", response_model=SetPasswordResponse)
+async def set_password(request: SetPasswordRequest, db: Session = Depends(get_db)) -> SetPasswordResponse:
+    user = await run_in_threadpool(_password_user, db, request)
+    try:
+        password_hash = await hash_password_pooled(request.new_password)
+    except PasswordHasherBusy as exc:
+        raise password_hasher_busy() from exc
+    await run_in_threadpool(_store_password, db, user, password_hash)
 
     return SetPasswordResponse(ok=True)
 
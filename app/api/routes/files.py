@@ -1,20 +1,168 @@
+import mimetypes
 import os
+import time
+from typing import Optional
+from urllib.parse import quote, urlsplit
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
-from app.models import Theory
+from app.core.config import get_settings
+from app.core.signing import nginx_secure_link
+from app.services.storage import StorageBackend, get_storage
+from app.services.theory_files import TheoryFile, load_theory_file, signed_theory_file, verify_file_link
 
 router = APIRouter()
+settings = get_settings()
+
+
+def parse_single_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    units, _, spec = header.partition("=")
+    if units.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last) + 1, size) if last else size
+        else:
+            start, end = max(size - int(last), 0), size
+    except ValueError:
+        return None
+    if start >= size or start >= end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def content_disposition(filename: Optional[str]) -> str:
+    filename = filename or "file"
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def signed_static_url(key: str) -> str:
+    base_url = settings.files_static_base_url.rstrip("/")
+    uri = f"{urlsplit(base_url).path}/{key}"
+    expires = int(time.time()) + settings.files_link_ttl_seconds
+    token = nginx_secure_link(uri, expires, settings.files_link_secret or settings.secret_key)
+    return f"{base_url}/{key}?md5={token}&expires={expires}"
+
+
+def offload_theory_file(storage: StorageBackend, theory_file: TheoryFile, headers: dict) -> Optional[Response]:
+    mode = settings.file_delivery
+    if mode == "redirect":
+        return RedirectResponse(
+            signed_static_url(theory_file.key),
+            status_code=307,
+            headers={"Cache-Control": "no-store"},
+        )
+    if mode == "x-accel":
+        headers["X-Accel-Redirect"] = f"{settings.files_internal_prefix.rstrip('/')}/{theory_file.key}"
+    elif mode == "x-sendfile":
+        path = storage.local_path(theory_file.key)
+        if path is None:
+            return None
+        headers["X-Sendfile"] = os.path.abspath(path)
+    else:
+        return None
+    headers["Content-Disposition"] = content_disposition(theory_file.name)
+    media_type = mimetypes.guess_type(theory_file.name or "")[0] or "application/octet-stream"
+    return Response(media_type=media_type, headers=headers)
+
+
+def stream_theory_file(
+    storage: StorageBackend, theory_file: TheoryFile, request: Request, headers: dict
+) -> StreamingResponse:
+    size = storage.size(theory_file.key)
+    if size is None:
+        raise HTTPException(status_code=404, detail="File missing in storage")
+    media_type = mimetypes.guess_type(theory_file.name or "")[0] or "application/octet-stream"
+    headers["Accept-Ranges"] = "bytes"
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range in (None, theory_file.etag, theory_file.last_modified):
+        byte_range = parse_single_range(range_header, size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(storage.iter_bytes(theory_file.key), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    headers["Content-Length"] = str(end - start)
+    return StreamingResponse(
+        storage.iter_bytes(theory_file.key, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
 
 
 @router.get("/files/{theory_id}")
-def get_theory_file(theory_id: int, db: Session = Depends(get_db)):
-    theory = db.query(Theory).filter(Theory.id == theory_id).first()
-    if not theory or not theory.file_path:
+def get_theory_file(
+    theory_id: int,
+    request: Request,
+    v: Optional[str] = Query(None),
+    d: Optional[str] = Query(None),
+    n: Optional[str] = Query(None),
+    s: Optional[int] = Query(None),
+    exp: Optional[int] = Query(None),
+    sig: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage),
+):
+    max_age = None
+    if sig is not None:
+        if exp is None or not verify_file_link(theory_id, v, s, n, exp, sig):
+            raise HTTPException(status_code=403, detail="Invalid file signature")
+        max_age = exp - int(time.time())
+        if max_age <= 0:
+            raise HTTPException(status_code=403, detail="File link expired")
+        if v:
+            theory_file = signed_theory_file(theory_id, v, s, n)
+        else:
+            # Legacy uploads have no content hash to derive the blob key from.
+            theory_file = load_theory_file(db, theory_id)
+    elif settings.files_require_signature:
+        raise HTTPException(status_code=403, detail="Signed file URL required")
+    else:
+        theory_file = load_theory_file(db, theory_id, d)
+    if theory_file is None:
         raise HTTPException(status_code=404, detail="File not found")
-    if not os.path.exists(theory.file_path):
-        raise HTTPException(status_code=404, detail="File missing on disk")
-    return FileResponse(theory.file_path)
+
+    if not theory_file.sha256:
+        if not os.path.exists(theory_file.key):
+            raise HTTPException(status_code=404, detail="File missing on disk")
+        return FileResponse(theory_file.key)
+
+    if max_age is not None:
+        cache_control = f"public, max-age={min(max_age, settings.files_immutable_max_age)}, immutable"
+    elif v == theory_file.version:
+        cache_control = f"public, max-age={settings.files_immutable_max_age}, immutable"
+    else:
+        cache_control = "no-cache"
+    headers = {"ETag": theory_file.etag, "Cache-Control": cache_control}
+    if theory_file.last_modified:
+        headers["Last-Modified"] = theory_file.last_modified
+
+    if theory_file.is_not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+
+    offloaded = offload_theory_file(storage, theory_file, headers)
+    if offloaded is not None:
+        return offloaded
+
+    path = storage.local_path(theory_file.key)
+    if path is None:
+        return stream_theory_file(storage, theory_file, request, headers)
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="File missing in storage") from exc
+    return FileResponse(path, filename=theory_file.name, stat_result=stat_result, headers=headers)
@@ -0,0 +1,27 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import get_settings
+from app.db import session as db_session
+from app.db.pool import render_pool_metrics
+
+router = APIRouter()
+settings = get_settings()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(authorization: Optional[str] = Header(None)) -> PlainTextResponse:
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.metrics_token and not hmac.compare_digest(
+        authorization or "", f"Bearer {settings.metrics_token}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    pools = {
+        "sync": db_session.engine.pool,
+        "async": db_session.async_engine.pool if db_session.async_engine is not None else None,
+    }
+    return PlainTextResponse(render_pool_metrics(pools), media_type="text/plain; version=0.0.4")
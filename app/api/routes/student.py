@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Callable, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_current_student
-from app.models import User, Subject, Topic, Theory, Assignment, Submission, AssignmentType
+from app.api.deps import get_db, get_current_student, get_student_principal, get_subject
+from app.core.responses import FastJSONResponse
+from app.models import User, Topic, Theory, Assignment, Submission, AssignmentType
 from app.schemas.student import (
     StudentProfileOut,
     SubjectOut,
@@ -13,19 +16,30 @@ from app.schemas.student import (
     GradesResponse,
 )
 from app.schemas.assignment import AssignmentSubmitRequest, AssignmentSubmitResponse
-from app.services.attempts import get_attempts_used
-from app.services.grading import grade_submission
+from app.services.attempts import get_attempts_used, get_attempts_summary, record_attempt
+from app.services.auth import Principal
+from app.services.etags import (
+    assignments_stamp_statement,
+    etag_headers,
+    etag_matches,
+    grades_stamp_statement,
+    not_modified,
+    weak_etag,
+)
+from app.services.grading import GradingBusy, grade_submission
+from app.services.idempotency import IN_PROGRESS, MISMATCH, REPLAY, get_idempotency_store, request_fingerprint
+from app.services.reference_data import reference_data
+from app.services.response_cache import (
+    REFERENCE_NAMESPACE,
+    catalog_key,
+    get_response_cache,
+    theory_topic_namespace,
+)
+from app.services.theory_files import theory_file_fields
 
 router = APIRouter()
 
 
-def get_subject(db: Session, name: str) -> Subject:
-    subject = db.query(Subject).filter(Subject.name == name).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Subject not found")
-    return subject
-
-
 @router.get("/profile", response_model=StudentProfileOut)
 def student_profile(current_student: User = Depends(get_current_student)) -> StudentProfileOut:
     if not current_student.class_group:
@@ -40,26 +54,36 @@ def student_profile(current_student: User = Depends(get_current_student)) -> Stu
 
 @router.get("/subjects", response_model=list[SubjectOut])
 def student_subjects(
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_student: User = Depends(get_current_student),
+    current_student: Principal = Depends(get_student_principal),
 ):
-    subjects = db.query(Subject).all()
-    return subjects
+    return get_response_cache().respond(
+        catalog_key("subjects", "student"),
+        (REFERENCE_NAMESPACE,),
+        list[SubjectOut],
+        lambda: list(reference_data.subjects(db).values()),
+        if_none_match=if_none_match,
+    )
 
 
 @router.get("/topics", response_model=list[TopicOut])
 def student_topics(
     subject: str = Query(...),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_student: User = Depends(get_current_student),
+    current_student: Principal = Depends(get_student_principal),
 ):
     if not current_student.class_group_id:
         raise HTTPException(status_code=400, detail="Student class not set")
     subject_obj = get_subject(db, subject)
-    return (
-        db.query(Topic)
-        .filter(Topic.subject_id == subject_obj.id, Topic.class_group_id == current_student.class_group_id)
-        .all()
+    class_id = current_student.class_group_id
+    return get_response_cache().respond(
+        catalog_key("topics", "student", class_id, subject_obj.id),
+        (REFERENCE_NAMESPACE,),
+        list[TopicOut],
+        lambda: reference_data.topics(db, class_id, subject_obj.id),
+        if_none_match=if_none_match,
     )
 
 
@@ -67,38 +91,58 @@ def student_topics(
 def student_theory(
     subject: str = Query(...),
     topic_id: int = Query(...),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_student: User = Depends(get_current_student),
+    current_student: Principal = Depends(get_student_principal),
 ):
     subject_obj = get_subject(db, subject)
-    theories = (
-        db.query(Theory)
-        .filter(Theory.subject_id == subject_obj.id, Theory.topic_id == topic_id)
-        .all()
-    )
-    result = []
-    for theory in theories:
-        result.append(
-            TheoryOut(
-                id=theory.id,
-                kind=theory.kind.value,
-                text=theory.text,
-                file_url=f"/files/{theory.id}" if theory.file_path else None,
-                updated_at=theory.updated_at.isoformat() if theory.updated_at else "",
-            )
+
+    def load() -> list[TheoryOut]:
+        theories = (
+            db.query(Theory)
+            .filter(Theory.subject_id == subject_obj.id, Theory.topic_id == topic_id)
+            .all()
         )
-    return result
+        result = []
+        for theory in theories:
+            result.append(
+                TheoryOut(
+                    id=theory.id,
+                    kind=theory.kind.value,
+                    text=theory.text,
+                    **theory_file_fields(theory),
+                    updated_at=theory.updated_at.isoformat() if theory.updated_at else "",
+                )
+            )
+        return result
+
+    # Theory is shared by every class studying the topic, so the student's class is not part of the key.
+    return get_response_cache().respond(
+        catalog_key("theory", "student", None, subject_obj.id, topic_id),
+        (theory_topic_namespace(topic_id),),
+        list[TheoryOut],
+        load,
+        if_none_match=if_none_match,
+    )
 
 
 @router.get("/assignments", response_model=list[AssignmentOut])
 def student_assignments(
+    response: Response,
     subject: str = Query(...),
     type: AssignmentType = Query(...),
     topic_id: int = Query(...),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_student: User = Depends(get_current_student),
+    current_student: Principal = Depends(get_student_principal),
 ):
     subject_obj = get_subject(db, subject)
+    stamp = db.execute(assignments_stamp_statement(current_student.id, subject_obj.id, topic_id, type)).one()
+    etag = weak_etag("assignments", current_student.id, subject_obj.id, topic_id, type.value, *stamp)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers.update(etag_headers(etag))
+
     assignments = (
         db.query(Assignment)
         .filter(
@@ -110,15 +154,11 @@ def student_assignments(
         .all()
     )
 
+    summary = get_attempts_summary(db, current_student.id, [assignment.id for assignment in assignments])
+
     output = []
     for assignment in assignments:
-        attempts_used = get_attempts_used(db, current_student.id, assignment.id)
-        last_submission = (
-            db.query(Submission)
-            .filter(Submission.student_id == current_student.id, Submission.assignment_id == assignment.id)
-            .order_by(Submission.attempt_no.desc())
-            .first()
-        )
+        attempts_used, last_grade = summary[assignment.id]
         output.append(
             AssignmentOut(
                 id=assignment.id,
@@ -127,7 +167,7 @@ def student_assignments(
                 max_attempts=assignment.max_attempts,
                 attempts_used=attempts_used,
                 attempts_left=max(assignment.max_attempts - attempts_used, 0),
-                last_grade=last_submission.grade if last_submission else None,
+                last_grade=last_grade,
             )
         )
     return output
@@ -137,7 +177,7 @@ def student_assignments(
 def student_assignment_detail(
     assignment_id: int,
     db: Session = Depends(get_db),
-    current_student: User = Depends(get_current_student),
+    current_student: Principal = Depends(get_student_principal),
 ):
     assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
     if not assignment:
@@ -155,50 +195,114 @@ def student_assignment_detail(
     )
 
 
-@router.post("/assignments/{assignment_id}/submit", response_model=AssignmentSubmitResponse)
-def submit_assignment(
+def record_submission(
+    db: Session,
     assignment_id: int,
-    payload: AssignmentSubmitRequest,
-    db: Session = Depends(get_db),
-    current_student: User = Depends(get_current_student),
-):
+    student_id: int,
+    answers: dict,
+    on_response: Optional[Callable[[AssignmentSubmitResponse], None]] = None,
+) -> AssignmentSubmitResponse:
     assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
 
-    attempts_used = get_attempts_used(db, current_student.id, assignment.id)
+    attempts_used = get_attempts_used(db, student_id, assignment.id)
     if attempts_used >= assignment.max_attempts:
         raise HTTPException(status_code=400, detail="No attempts left")
 
-    score, grade = grade_submission(assignment, payload.answers)
-    submission = Submission(
+    try:
+        score, grade = grade_submission(assignment, answers)
+    except GradingBusy as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Grading is busy, try again",
+            headers={"Retry-After": "1"},
+        ) from exc
+
+    def build_response(attempt_no: int) -> AssignmentSubmitResponse:
+        return AssignmentSubmitResponse(
+            ok=True,
+            attempt_no=attempt_no,
+            score=score,
+            grade=grade,
+            attempts_left=max(assignment.max_attempts - attempt_no, 0),
+        )
+
+    def recorded_in_transaction(submission_id: int, attempt_no: int) -> None:
+        if on_response is not None:
+            on_response(build_response(attempt_no))
+
+    recorded = record_attempt(
+        db,
         assignment_id=assignment.id,
-        student_id=current_student.id,
-        attempt_no=attempts_used + 1,
-        answers=payload.answers,
+        student_id=student_id,
+        max_attempts=assignment.max_attempts,
+        answers=answers,
         score=score,
         grade=grade,
+        on_recorded=recorded_in_transaction,
     )
-    db.add(submission)
-    db.commit()
+    if recorded is None:
+        raise HTTPException(status_code=400, detail="No attempts left")
+    return build_response(recorded[1])
 
-    attempts_left = max(assignment.max_attempts - (attempts_used + 1), 0)
-    return AssignmentSubmitResponse(
-        ok=True,
-        attempt_no=attempts_used + 1,
-        score=score,
-        grade=grade,
-        attempts_left=attempts_left,
-    )
+
+@router.post("/assignments/{assignment_id}/submit", response_model=AssignmentSubmitResponse)
+def submit_assignment(
+    assignment_id: int,
+    payload: AssignmentSubmitRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db),
+    current_student: Principal = Depends(get_student_principal),
+):
+    if idempotency_key is None:
+        return record_submission(db, assignment_id, current_student.id, payload.answers)
+
+    store = get_idempotency_store()
+    scope = f"student:{current_student.id}"
+    fingerprint = request_fingerprint("submit", assignment_id, payload.answers)
+    claim = store.claim(db, scope, idempotency_key, fingerprint)
+    if claim.status == REPLAY:
+        response.headers["Idempotent-Replayed"] = "true"
+        return AssignmentSubmitResponse(**claim.response)
+    if claim.status == MISMATCH:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was used with a different request")
+    if claim.status == IN_PROGRESS:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is in progress",
+            headers={"Retry-After": "1"},
+        )
+
+    try:
+        return record_submission(
+            db,
+            assignment_id,
+            current_student.id,
+            payload.answers,
+            on_response=lambda result: store.complete(db, scope, idempotency_key, result.model_dump()),
+        )
+    except Exception:
+        db.rollback()
+        store.release(db, scope, idempotency_key)
+        raise
 
 
 @router.get("/grades", response_model=GradesResponse)
 def student_grades(
     subject: str = Query(...),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_student: User = Depends(get_current_student),
+    current_student: Principal = Depends(get_student_principal),
 ):
     subject_obj = get_subject(db, subject)
+    stamp = db.execute(grades_stamp_statement(current_student.id, subject_obj.id)).one()
+    topics = reference_data.topics(db, current_student.class_group_id, subject_obj.id)
+    etag = weak_etag("grades", current_student.id, subject_obj.id, *stamp, [topic.title for topic in topics])
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
     submissions = (
         db.query(Submission, Assignment, Topic)
         .join(Assignment, Submission.assignment_id == Assignment.id)
@@ -227,4 +331,4 @@ def student_grades(
         )
 
     avg_grade = sum(grades) / len(grades) if grades else 0.0
-    return GradesResponse(avg_grade=round(avg_grade, 2), items=items)
+    return FastJSONResponse({"avg_grade": round(avg_grade, 2), "items": items}, headers=etag_headers(etag))
@@ -0,0 +1,187 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_async_db, get_student_principal_async, get_subject_async
+from app.core.responses import FastJSONResponse
+from app.models import Topic, Theory, Assignment, Submission, AssignmentType
+from app.schemas.student import (
+    TopicOut,
+    TheoryOut,
+    AssignmentOut,
+    GradesResponse,
+)
+from app.services.attempts import attempts_summary_statement, summarize_attempts
+from app.services.auth import Principal
+from app.services.etags import (
+    assignments_stamp_statement,
+    etag_headers,
+    etag_matches,
+    grades_stamp_statement,
+    not_modified,
+    weak_etag,
+)
+from app.services.reference_data import reference_data
+from app.services.response_cache import (
+    REFERENCE_NAMESPACE,
+    catalog_key,
+    get_response_cache,
+    theory_topic_namespace,
+)
+from app.services.theory_files import theory_file_fields
+
+router = APIRouter()
+
+
+@router.get("/topics", response_model=list[TopicOut])
+async def student_topics(
+    subject: str = Query(...),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_student: Principal = Depends(get_student_principal_async),
+):
+    if not current_student.class_group_id:
+        raise HTTPException(status_code=400, detail="Student class not set")
+    subject_obj = await get_subject_async(db, subject)
+    class_id = current_student.class_group_id
+    return await get_response_cache().respond_async(
+        catalog_key("topics", "student", class_id, subject_obj.id),
+        (REFERENCE_NAMESPACE,),
+        list[TopicOut],
+        lambda: db.run_sync(reference_data.topics, class_id, subject_obj.id),
+        if_none_match=if_none_match,
+    )
+
+
+@router.get("/theory", response_model=list[TheoryOut])
+async def student_theory(
+    subject: str = Query(...),
+    topic_id: int = Query(...),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_student: Principal = Depends(get_student_principal_async),
+):
+    subject_obj = await get_subject_async(db, subject)
+
+    async def load() -> list[TheoryOut]:
+        theories = (
+            await db.execute(select(Theory).where(Theory.subject_id == subject_obj.id, Theory.topic_id == topic_id))
+        ).scalars()
+        return [
+            TheoryOut(
+                id=theory.id,
+                kind=theory.kind.value,
+                text=theory.text,
+                **theory_file_fields(theory),
+                updated_at=theory.updated_at.isoformat() if theory.updated_at else "",
+            )
+            for theory in theories
+        ]
+
+    # Shares the sync route's entries, so both see the same invalidations and ETags.
+    return await get_response_cache().respond_async(
+        catalog_key("theory", "student", None, subject_obj.id, topic_id),
+        (theory_topic_namespace(topic_id),),
+        list[TheoryOut],
+        load,
+        if_none_match=if_none_match,
+    )
+
+
+@router.get("/assignments", response_model=list[AssignmentOut])
+async def student_assignments(
+    response: Response,
+    subject: str = Query(...),
+    type: AssignmentType = Query(...),
+    topic_id: int = Query(...),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_student: Principal = Depends(get_student_principal_async),
+):
+    subject_obj = await get_subject_async(db, subject)
+    stamp = (
+        await db.execute(assignments_stamp_statement(current_student.id, subject_obj.id, topic_id, type))
+    ).one()
+    etag = weak_etag("assignments", current_student.id, subject_obj.id, topic_id, type.value, *stamp)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers.update(etag_headers(etag))
+
+    assignments = (
+        await db.execute(
+            select(Assignment).where(
+                Assignment.subject_id == subject_obj.id,
+                Assignment.topic_id == topic_id,
+                Assignment.type == type,
+                Assignment.published.is_(True),
+            )
+        )
+    ).scalars().all()
+
+    assignment_ids = [assignment.id for assignment in assignments]
+    rows = []
+    if assignment_ids:
+        rows = await db.execute(attempts_summary_statement(current_student.id, assignment_ids))
+    summary = summarize_attempts(assignment_ids, rows)
+
+    output = []
+    for assignment in assignments:
+        attempts_used, last_grade = summary[assignment.id]
+        output.append(
+            AssignmentOut(
+                id=assignment.id,
+                title=assignment.title,
+                type=assignment.type.value,
+                max_attempts=assignment.max_attempts,
+                attempts_used=attempts_used,
+                attempts_left=max(assignment.max_attempts - attempts_used, 0),
+                last_grade=last_grade,
+            )
+        )
+    return output
+
+
+@router.get("/grades", response_model=GradesResponse)
+async def student_grades(
+    subject: str = Query(...),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_student: Principal = Depends(get_student_principal_async),
+):
+    subject_obj = await get_subject_async(db, subject)
+    stamp = (await db.execute(grades_stamp_statement(current_student.id, subject_obj.id))).one()
+    topics = await db.run_sync(reference_data.topics, current_student.class_group_id, subject_obj.id)
+    etag = weak_etag("grades", current_student.id, subject_obj.id, *stamp, [topic.title for topic in topics])
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    submissions = await db.execute(
+        select(Submission, Assignment, Topic)
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .join(Topic, Assignment.topic_id == Topic.id)
+        .where(
+            Submission.student_id == current_student.id,
+            Assignment.subject_id == subject_obj.id,
+        )
+        .order_by(Submission.submitted_at.desc())
+    )
+
+    items = []
+    grades = []
+    for submission, assignment, topic in submissions:
+        grades.append(submission.grade)
+        items.append(
+            {
+                "topic_id": topic.id,
+                "topic_title": topic.title,
+                "assignment_title": assignment.title,
+                "type": assignment.type.value,
+                "grade": submission.grade,
+                "submitted_at": submission.submitted_at.isoformat(),
+            }
+        )
+
+    avg_grade = sum(grades) / len(grades) if grades else 0.0
+    return FastJSONResponse({"avg_grade": round(avg_grade, 2), "items": items}, headers=etag_headers(etag))
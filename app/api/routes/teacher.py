@@ -1,12 +1,15 @@
-from datetime import datetime
 import os
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
 
-from app.api.deps import get_db, get_current_teacher
+from app.api.deps import get_db, get_current_teacher, get_subject
 from app.core.config import get_settings
-from app.models import User, UserRole, ClassGroup, Subject, Topic, Theory, TheoryKind, Assignment, Submission, AssignmentType
+from app.core.responses import FastJSONResponse, model_response
+from app.models import User, Theory, TheoryKind, Assignment, Submission, AssignmentType, RegradeJob
 from app.models.teacher_class import TeacherClass
 from app.schemas.class_group import ClassGroupOut
 from app.schemas.teacher import (
@@ -24,20 +27,40 @@ from app.schemas.assignment import (
     AssignmentOut,
     AssignmentDetailOut,
     SubmissionList,
+    RegradeJobOut,
 )
 from app.services.attempts import reset_attempts_for_student
+from app.services.etags import (
+    class_grades_stamp_statement,
+    etag_headers,
+    etag_matches,
+    not_modified,
+    submissions_stamp_statement,
+    topic_grades_stamp_statement,
+    weak_etag,
+)
+from app.services.grade_aggregates import class_grade_summary
+from app.services.grade_export import EXPORT_FORMATS, export_chunks, export_statement
+from app.services.reference_data import reference_data
+from app.services.response_cache import (
+    REFERENCE_NAMESPACE,
+    assignment_namespace,
+    catalog_key,
+    get_response_cache,
+    invalidate_responses,
+    theory_class_namespace,
+    theory_namespaces,
+)
+from app.services.regrade import DONE, run_regrade_job, start_regrade_job
+from app.services.storage import StorageBackend, blob_key, get_storage, release_blob
+from app.services.theory_files import theory_file_fields
+from app.services.theory_processing import PENDING, process_theory_file
+from app.services.uploads import InvalidUpload, UploadTooLarge, save_multipart_upload
 
 router = APIRouter()
 settings = get_settings()
 
 
-def get_subject(db: Session, name: str) -> Subject:
-    subject = db.query(Subject).filter(Subject.name == name).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Subject not found")
-    return subject
-
-
 @router.get("/profile", response_model=TeacherProfileOut)
 def teacher_profile(current_teacher: User = Depends(get_current_teacher)) -> TeacherProfileOut:
     return TeacherProfileOut(
@@ -56,64 +79,65 @@ def teacher_classes(
     db: Session = Depends(get_db),
     current_teacher: User = Depends(get_current_teacher),
 ):
-    links = db.query(TeacherClass).filter(TeacherClass.teacher_id == current_teacher.id).all()
-    return [link.class_group for link in links]
+    class_group_ids = db.execute(
+        select(TeacherClass.class_group_id)
+        .where(TeacherClass.teacher_id == current_teacher.id)
+        .order_by(TeacherClass.id)
+    ).scalars()
+    class_groups = [reference_data.class_group(db, class_group_id) for class_group_id in class_group_ids]
+    return [class_group for class_group in class_groups if class_group is not None]
 
 
 @router.get("/topics", response_model=list[TopicOut])
 def teacher_topics(
     class_id: int = Query(...),
     subject: str = Query(...),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_teacher: User = Depends(get_current_teacher),
 ):
     subject_obj = get_subject(db, subject)
-    topics = (
-        db.query(Topic)
-        .filter(Topic.class_group_id == class_id, Topic.subject_id == subject_obj.id)
-        .all()
+    return get_response_cache().respond(
+        catalog_key("topics", "teacher", class_id, subject_obj.id),
+        (REFERENCE_NAMESPACE,),
+        list[TopicOut],
+        lambda: reference_data.topics(db, class_id, subject_obj.id),
+        if_none_match=if_none_match,
     )
-    return topics
 
 
 @router.get("/grades/summary", response_model=GradeSummaryResponse)
 def grades_summary(
     class_id: int = Query(...),
     subject: str = Query(...),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_teacher: User = Depends(get_current_teacher),
 ):
     subject_obj = get_subject(db, subject)
-    class_group = db.query(ClassGroup).filter(ClassGroup.id == class_id).first()
+    class_group = reference_data.class_group(db, class_id)
     if not class_group:
         raise HTTPException(status_code=404, detail="Class not found")
 
-    students = (
-        db.query(User)
-        .filter(User.role == UserRole.student, User.class_group_id == class_id)
-        .all()
-    )
+    class_out = ClassGroupOut.model_validate(class_group)
+    stamp = db.execute(class_grades_stamp_statement(class_id, subject_obj.id)).one()
+    etag = weak_etag("grades-summary", class_out.model_dump(mode="json"), subject_obj.id, *stamp)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
-    data = []
-    for student in students:
-        submissions = (
-            db.query(Submission)
-            .join(Assignment, Submission.assignment_id == Assignment.id)
-            .filter(
-                Submission.student_id == student.id,
-                Assignment.subject_id == subject_obj.id,
-                Assignment.class_group_id == class_id,
-            )
-            .all()
-        )
-        if submissions:
-            avg_grade = sum(s.grade for s in submissions) / len(submissions)
-        else:
-            avg_grade = 0.0
-        data.append({"id": student.id, "full_name": student.full_name, "avg_grade": round(avg_grade, 2)})
+    rows = class_grade_summary(db, class_id, subject_obj.id)
+    data = [
+        {
+            "id": row.id,
+            "full_name": row.full_name,
+            "avg_grade": round(row.avg_grade or 0.0, 2),
+            "submissions_count": row.submissions_count,
+            "last_grade": row.last_grade,
+        }
+        for row in rows
+    ]
 
-    return GradeSummaryResponse(
-        class_group=ClassGroupOut.model_validate(class_group), students=data)
+    return model_response(GradeSummaryResponse(class_group=class_out, students=data), headers=etag_headers(etag))
 
 
 @router.get("/grades/by-topic", response_model=GradeByTopicResponse)
@@ -124,10 +148,16 @@ def grades_by_topic(
     subject: str = Query(...),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_teacher: User = Depends(get_current_teacher),
 ):
     subject_obj = get_subject(db, subject)
+    stamp = db.execute(topic_grades_stamp_statement(class_id, subject_obj.id, topic_id, type)).one()
+    etag = weak_etag("grades-by-topic", class_id, subject_obj.id, topic_id, type.value, page, page_size, *stamp)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
     base_query = (
         db.query(Submission, Assignment, User)
         .join(Assignment, Submission.assignment_id == Assignment.id)
@@ -159,7 +189,33 @@ def grades_by_topic(
             }
         )
 
-    return GradeByTopicResponse(items=items, page=page, page_size=page_size, total=total)
+    return FastJSONResponse(
+        {"items": items, "page": page, "page_size": page_size, "total": total}, headers=etag_headers(etag)
+    )
+
+
+@router.get("/grades/export")
+def export_grades(
+    class_id: int = Query(...),
+    subject: str = Query(...),
+    topic_id: Optional[int] = Query(None),
+    type: Optional[AssignmentType] = Query(None),
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    db: Session = Depends(get_db),
+    current_teacher: User = Depends(get_current_teacher),
+):
+    subject_obj = get_subject(db, subject)
+    media_type, _ = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export_chunks(
+            sessionmaker(bind=db.get_bind()),
+            export_statement(class_id, subject_obj.id, topic_id, type),
+            format,
+            settings.grades_export_batch_size,
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="grades-{class_id}-{subject_obj.id}.{format}"'},
+    )
 
 
 @router.post("/attempts/reset", response_model=ResetAttemptsResponse)
@@ -176,59 +232,91 @@ def reset_attempts(
 def list_theory(
     class_id: int = Query(...),
     subject: str = Query(...),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_teacher: User = Depends(get_current_teacher),
 ):
     subject_obj = get_subject(db, subject)
-    theories = (
-        db.query(Theory)
-        .filter(Theory.class_group_id == class_id, Theory.subject_id == subject_obj.id)
-        .all()
-    )
-    result = []
-    for theory in theories:
-        result.append(
-            TheoryOut(
-                id=theory.id,
-                topic_id=theory.topic_id,
-                topic_title=theory.topic.title,
-                kind=theory.kind.value,
-                text=theory.text,
-                file_url=f"/files/{theory.id}" if theory.file_path else None,
-                updated_at=theory.updated_at.isoformat() if theory.updated_at else "",
-            )
+
+    def load() -> list[TheoryOut]:
+        theories = (
+            db.query(Theory)
+            .filter(Theory.class_group_id == class_id, Theory.subject_id == subject_obj.id)
+            .all()
         )
-    return result
+        result = []
+        for theory in theories:
+            result.append(
+                TheoryOut(
+                    id=theory.id,
+                    topic_id=theory.topic_id,
+                    topic_title=theory.topic.title,
+                    kind=theory.kind.value,
+                    text=theory.text,
+                    **theory_file_fields(theory),
+                    updated_at=theory.updated_at.isoformat() if theory.updated_at else "",
+                )
+            )
+        return result
+
+    return get_response_cache().respond(
+        catalog_key("theory", "teacher", class_id, subject_obj.id),
+        (theory_class_namespace(class_id, subject_obj.id), REFERENCE_NAMESPACE),
+        list[TheoryOut],
+        load,
+        if_none_match=if_none_match,
+    )
 
 
 @router.post("/theory", response_model=TheoryOut)
 async def create_theory(
     request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage),
     current_teacher: User = Depends(get_current_teacher),
 ):
     content_type = request.headers.get("content-type", "")
 
     if content_type.startswith("multipart/form-data"):
-        form = await request.form()
-        class_id = int(form.get("class_id"))
-        subject = form.get("subject")
-        topic_id = int(form.get("topic_id"))
-        kind = form.get("kind")
-        upload = form.get("file")
-        if kind != "file" or upload is None:
+        content_length = request.headers.get("content-length")
+        # Leave room for the multipart envelope and the other form fields.
+        if content_length and content_length.isdigit() and int(content_length) > settings.max_upload_bytes + 64 * 1024:
+            raise HTTPException(status_code=413, detail="File too large")
+        try:
+            fields, stored = await save_multipart_upload(
+                request.stream(),
+                content_type,
+                storage,
+                os.path.join(settings.files_dir, ".staging"),
+                file_field="file",
+                max_bytes=settings.max_upload_bytes,
+                chunk_size=settings.upload_chunk_bytes,
+            )
+        except UploadTooLarge as exc:
+            raise HTTPException(status_code=413, detail="File too large") from exc
+        except InvalidUpload as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        # A blob stored for a request rejected below is left to collect_garbage.
+        if fields.get("kind") != "file" or stored is None:
             raise HTTPException(status_code=400, detail="File upload required for file kind")
+        try:
+            class_id = int(fields["class_id"])
+            topic_id = int(fields["topic_id"])
+            subject = fields["subject"]
+        except (KeyError, ValueError) as exc:
+            raise HTTPException(status_code=400, detail="class_id, subject and topic_id are required") from exc
         subject_obj = get_subject(db, subject)
-        os.makedirs(settings.files_dir, exist_ok=True)
-        file_path = f"{settings.files_dir}/{datetime.utcnow().timestamp()}_{upload.filename}"
-        with open(file_path, "wb") as output:
-            output.write(await upload.read())
         theory = Theory(
             class_group_id=class_id,
             subject_id=subject_obj.id,
             topic_id=topic_id,
             kind=TheoryKind.file,
-            file_path=file_path,
+            file_path=stored.key,
+            file_name=stored.filename,
+            file_size=stored.size,
+            file_sha256=stored.sha256,
+            processing_status=PENDING if settings.derivatives_enabled else None,
         )
     else:
         payload = await request.json()
@@ -245,6 +333,9 @@ async def create_theory(
     db.add(theory)
     db.commit()
     db.refresh(theory)
+    invalidate_responses(*theory_namespaces(theory))
+    if theory.processing_status == PENDING:
+        background_tasks.add_task(process_theory_file, sessionmaker(bind=db.get_bind()), storage, theory.id)
 
     return TheoryOut(
         id=theory.id,
@@ -252,7 +343,7 @@ async def create_theory(
         topic_title=theory.topic.title,
         kind=theory.kind.value,
         text=theory.text,
-        file_url=f"/files/{theory.id}" if theory.file_path else None,
+        **theory_file_fields(theory),
         updated_at=theory.updated_at.isoformat() if theory.updated_at else "",
     )
 
@@ -267,6 +358,7 @@ def update_theory(
     theory = db.query(Theory).filter(Theory.id == theory_id).first()
     if not theory:
         raise HTTPException(status_code=404, detail="Theory not found")
+    stale = theory_namespaces(theory)
 
     if payload.class_id is not None:
         theory.class_group_id = payload.class_id
@@ -282,6 +374,7 @@ def update_theory(
 
     db.commit()
     db.refresh(theory)
+    invalidate_responses(*stale, *theory_namespaces(theory))
 
     return TheoryOut(
         id=theory.id,
@@ -289,7 +382,7 @@ def update_theory(
         topic_title=theory.topic.title,
         kind=theory.kind.value,
         text=theory.text,
-        file_url=f"/files/{theory.id}" if theory.file_path else None,
+        **theory_file_fields(theory),
         updated_at=theory.updated_at.isoformat() if theory.updated_at else "",
     )
 
@@ -298,13 +391,22 @@ def update_theory(
 def delete_theory(
     theory_id: int,
     db: Session = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage),
     current_teacher: User = Depends(get_current_teacher),
 ):
     theory = db.query(Theory).filter(Theory.id == theory_id).first()
     if not theory:
         raise HTTPException(status_code=404, detail="Theory not found")
+    blobs = []
+    if theory.file_sha256:
+        blobs.append(theory.file_path)
+        blobs.extend(blob_key(derivative["sha256"]) for derivative in (theory.derivatives or {}).values())
+    stale = theory_namespaces(theory)
     db.delete(theory)
     db.commit()
+    invalidate_responses(*stale)
+    for blob in blobs:
+        release_blob(db, storage, blob)
     return {"ok": True}
 
 
@@ -313,20 +415,26 @@ def list_assignments(
     class_id: int = Query(...),
     subject: str = Query(...),
     type: AssignmentType = Query(...),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_teacher: User = Depends(get_current_teacher),
 ):
     subject_obj = get_subject(db, subject)
-    assignments = (
-        db.query(Assignment)
-        .filter(
-            Assignment.class_group_id == class_id,
-            Assignment.subject_id == subject_obj.id,
-            Assignment.type == type,
-        )
-        .all()
+    return get_response_cache().respond(
+        catalog_key("assignments", "teacher", class_id, subject_obj.id, None, type.value),
+        (assignment_namespace(class_id, subject_obj.id),),
+        list[AssignmentOut],
+        lambda: (
+            db.query(Assignment)
+            .filter(
+                Assignment.class_group_id == class_id,
+                Assignment.subject_id == subject_obj.id,
+                Assignment.type == type,
+            )
+            .all()
+        ),
+        if_none_match=if_none_match,
     )
-    return assignments
 
 
 @router.post("/assignments", response_model=dict)
@@ -350,6 +458,7 @@ def create_assignment(
     db.add(assignment)
     db.commit()
     db.refresh(assignment)
+    invalidate_responses(assignment_namespace(assignment.class_group_id, assignment.subject_id))
     return {"id": assignment.id}
 
 
@@ -382,6 +491,7 @@ def update_assignment(
     assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
+    stale = assignment_namespace(assignment.class_group_id, assignment.subject_id)
 
     if payload.class_id is not None:
         assignment.class_group_id = payload.class_id
@@ -404,6 +514,7 @@ def update_assignment(
 
     db.commit()
     db.refresh(assignment)
+    invalidate_responses(stale, assignment_namespace(assignment.class_group_id, assignment.subject_id))
 
     return AssignmentDetailOut(
         id=assignment.id,
@@ -424,19 +535,71 @@ def delete_assignment(
     assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
+    stale = assignment_namespace(assignment.class_group_id, assignment.subject_id)
     db.delete(assignment)
     db.commit()
+    invalidate_responses(stale)
     return {"ok": True}
 
 
+def regrade_job_out(job: RegradeJob) -> RegradeJobOut:
+    return RegradeJobOut(
+        id=job.id,
+        assignment_id=job.assignment_id,
+        status=job.status,
+        total=job.total,
+        processed=job.processed,
+        updated=job.updated,
+        progress=round(job.processed / job.total, 4) if job.total else (1.0 if job.status == DONE else 0.0),
+        error=job.error,
+        created_at=job.created_at.isoformat(),
+        finished_at=job.finished_at.isoformat() if job.finished_at else None,
+    )
+
+
+@router.post("/assignments/{assignment_id}/regrade", response_model=RegradeJobOut, status_code=202)
+def regrade_assignment_submissions(
+    assignment_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_teacher: User = Depends(get_current_teacher),
+):
+    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    job, created = start_regrade_job(db, assignment.id)
+    if created:
+        background_tasks.add_task(run_regrade_job, sessionmaker(bind=db.get_bind()), job.id)
+    return regrade_job_out(job)
+
+
+@router.get("/regrade-jobs/{job_id}", response_model=RegradeJobOut)
+def get_regrade_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_teacher: User = Depends(get_current_teacher),
+):
+    # populate_existing: the runner updates the job from its own session.
+    job = db.get(RegradeJob, job_id, populate_existing=True)
+    if not job:
+        raise HTTPException(status_code=404, detail="Regrade job not found")
+    return regrade_job_out(job)
+
+
 @router.get("/submissions", response_model=SubmissionList)
 def list_submissions(
     assignment_id: int = Query(...),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_teacher: User = Depends(get_current_teacher),
 ):
+    stamp = db.execute(submissions_stamp_statement(assignment_id)).one()
+    etag = weak_etag("submissions", assignment_id, page, page_size, *stamp)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
     base_query = (
         db.query(Submission, User)
         .join(User, Submission.student_id == User.id)
@@ -461,4 +624,6 @@ def list_submissions(
             }
         )
 
-    return SubmissionList(items=items, page=page, page_size=page_size, total=total)
+    return FastJSONResponse(
+        {"items": items, "page": page, "page_size": page_size, "total": total}, headers=etag_headers(etag)
+    )
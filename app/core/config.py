@@ -1,14 +1,81 @@
 from functools import lru_cache
+from typing import Literal
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     project_name: str = "Цифровой класс"
     database_url: str = "sqlite:///./app.db"
+    async_db_enabled: bool = False
+    async_database_url: str = ""
+    db_pool_size: int = 20
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    metrics_enabled: bool = False
+    metrics_token: str = ""
     secret_key: str = "change-me"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     files_dir: str = "uploads"
     files_base_url: str = ""
+    storage_backend: Literal["local", "s3-local", "s3"] = "local"
+    s3_bucket: str = "theory-files"
+    s3_prefix: str = ""
+    s3_endpoint_url: str = ""
+    s3_local_root: str = "s3-data"
+    blob_grace_seconds: int = 3600
+    file_meta_cache_size: int = 10000
+    file_meta_cache_ttl_seconds: int = 300
+    files_immutable_max_age: int = 31536000
+    file_delivery: Literal["direct", "x-accel", "x-sendfile", "redirect"] = "direct"
+    files_internal_prefix: str = "/protected-files"
+    files_static_base_url: str = ""
+    files_link_secret: str = ""
+    files_link_ttl_seconds: int = 300
+    files_signed_urls: bool = True
+    files_require_signature: bool = True
+    files_url_ttl_seconds: int = 3600
+    files_url_bucket_seconds: int = 600
+    derivatives_enabled: bool = True
+    derivatives_workers: int = 2
+    derivatives_max_pending: int = 256
+    derivatives_timeout_seconds: float = 120.0
+    derivative_image_max_px: int = 1600
+    derivative_thumbnail_px: int = 320
+    derivative_jpeg_quality: int = 80
+    max_upload_bytes: int = 200 * 1024 * 1024
+    upload_chunk_bytes: int = 1024 * 1024
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64
+    principal_cache_size: int = 10000
+    principal_cache_ttl_seconds: int = 60
+    reference_cache_size: int = 4096
+    reference_cache_ttl_seconds: int = 300
+    response_cache_backend: Literal["memory", "redis-local", "redis"] = "memory"
+    response_cache_size: int = 10000
+    response_cache_ttl_seconds: int = 60
+    response_cache_wait_seconds: float = 5.0
+    response_cache_redis_url: str = "redis://localhost:6379/0"
+    response_cache_prefix: str = "school:"
+    grading_plan_cache_size: int = 1024
+    regrade_chunk_size: int = 2000
+    regrade_stale_seconds: int = 300
+    regrade_deadline_seconds: float = 60.0
+    grades_export_batch_size: int = 1000
+    grading_workers: int = 2
+    grading_max_pending: int = 256
+    grading_timeout_seconds: float = 1.0
+    grading_deadline_seconds: float = 10.0
+    grading_batch_size: int = 500
+    grading_max_answer_chars: int = 2000
+    idempotency_backend: Literal["db", "memory"] = "db"
+    idempotency_ttl_seconds: int = 24 * 3600
+    idempotency_lock_seconds: int = 60
+    idempotency_cache_size: int = 10000
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -17,6 +84,17 @@ class Settings(BaseSettings):
         extra="ignore",
     )
 
+    @model_validator(mode="after")
+    def check_settings(self):
+        if self.files_require_signature and not self.files_signed_urls:
+            raise ValueError("FILES_REQUIRE_SIGNATURE needs FILES_SIGNED_URLS; set it to false to serve unsigned links")
+        if self.file_delivery == "redirect" and not self.files_static_base_url:
+            raise ValueError("FILE_DELIVERY=redirect needs FILES_STATIC_BASE_URL")
+        # A chunk may be graded twice before its heartbeat; a shorter window fails live jobs.
+        if self.regrade_stale_seconds <= 2 * self.regrade_deadline_seconds:
+            raise ValueError("REGRADE_STALE_SECONDS must exceed twice REGRADE_DEADLINE_SECONDS")
+        return self
+
 @lru_cache
 def get_settings() -> Settings:
     return Settings()
@@ -0,0 +1,26 @@
+from typing import Any
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(Response):
+    # Returning this from a route bypasses response_model validation, so the route is responsible
+    # for building content in the declared shape. Plain dicts, lists, datetimes, enums and
+    # dataclasses are encoded by orjson in a single pass.
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def model_response(model: BaseModel, **kwargs: Any) -> Response:
+    # For a model that was already validated when it was built: skips the second validation pass.
+    return Response(content=model.model_dump_json(), media_type="application/json", **kwargs)
@@ -5,21 +5,61 @@ import bcrypt
 from jose import jwt
 
 from app.core.config import get_settings
+from app.core.workers import WorkerPool, WorkerPoolBusy
 
 settings = get_settings()
 
-def hash_password(password: str) -> str:
-    pw = password.encode("utf-8")
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(pw, salt).decode("utf-8")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+class PasswordHasherBusy(WorkerPoolBusy):
+    pass
+
+
+def _hashpw(password: str, rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+
+
+def _checkpw(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(
         plain_password.encode("utf-8"),
         hashed_password.encode("utf-8"),
     )
 
-def create_access_token(subject: str, role: str, expires_delta: Optional[timedelta] = None) -> str:
+
+class PasswordHasher(WorkerPool):
+    busy_exception = PasswordHasherBusy
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
+
+
+def hash_password(password: str) -> str:
+    return _hashpw(password, settings.bcrypt_rounds)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _checkpw(plain_password, hashed_password)
+
+
+# Awaited on the event loop, so a login burst queues in the hasher pool instead of holding
+# threadpool threads while bcrypt runs.
+async def hash_password_pooled(password: str) -> str:
+    return await password_hasher.run(_hashpw, password, settings.bcrypt_rounds)
+
+
+async def verify_password_pooled(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(_checkpw, plain_password, hashed_password)
+
+
+def create_access_token(
+    subject: str,
+    role: str,
+    expires_delta: Optional[timedelta] = None,
+    claims: Optional[dict] = None,
+) -> str:
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
-    payload = {"sub": subject, "role": role, "exp": expire}
+    payload = {**(claims or {}), "sub": subject, "role": role, "exp": expire}
     return jwt.encode(payload, settings.secret_key, algorithm=settings.algorithm)
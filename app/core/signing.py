@@ -0,0 +1,18 @@
+import base64
+import hashlib
+import hmac
+
+
+def nginx_secure_link(uri: str, expires: int, secret: str) -> str:
+    # Matches `secure_link_md5 "$secure_link_expires$uri <secret>"` in nginx.
+    digest = hashlib.md5(f"{expires}{uri} {secret}".encode(), usedforsecurity=False).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def sign(message: str, secret: str) -> str:
+    digest = hmac.new(secret.encode(), message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def verify(message: str, signature: str, secret: str) -> bool:
+    return hmac.compare_digest(sign(message, secret), signature)
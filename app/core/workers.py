@@ -0,0 +1,115 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+
+class WorkerPoolBusy(Exception):
+    pass
+
+
+def _report_pid(pids) -> None:
+    # Pool initializer: tells the parent which processes kill() has to stop.
+    pids.put(os.getpid())
+
+
+class WorkerPool:
+    busy_exception = WorkerPoolBusy
+
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pids = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn keeps worker start-up independent of the threads running in the API process
+                context = multiprocessing.get_context("spawn")
+                self._pids = context.SimpleQueue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_report_pid,
+                    initargs=(self._pids,),
+                )
+            return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise self.busy_exception()
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func, *args, timeout: Optional[float] = None):
+        # Same timeout and broken-pool handling as call(), awaited instead of blocking a thread.
+        self._acquire()
+        try:
+            executor = self._get_executor()
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(loop.run_in_executor(executor, func, *args), timeout)
+        except asyncio.TimeoutError:
+            self.kill()
+            raise
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            self._release()
+
+    def call(self, func, *args, timeout: Optional[float] = None):
+        # Blocking variant for sync handlers. A task still running after the timeout cannot be
+        # cancelled, so the workers are killed and the next call starts a fresh pool.
+        self._acquire()
+        try:
+            executor = self._get_executor()
+            future = executor.submit(func, *args)
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            self.kill()
+            raise
+        except BrokenProcessPool:
+            # Killed by a timed-out call or a crashed worker: let the next call start a new pool.
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            self._release()
+
+    def kill(self) -> None:
+        # Every task running in this pool fails with BrokenProcessPool.
+        with self._lock:
+            executor, self._executor = self._executor, None
+            pids, self._pids = self._pids, None
+        if executor is None:
+            return
+        while not pids.empty():
+            try:
+                os.kill(pids.get(), signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = WAIT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+
+
+class PoolStats:
+    def __init__(self) -> None:
+        self.wait_seconds = Histogram()
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+
+pool_stats: Dict[str, PoolStats] = {"sync": PoolStats(), "async": PoolStats()}
+
+
+class _WaitTimingMixin:
+    metrics_label = "sync"
+
+    def _do_get(self):
+        stats = pool_stats[self.metrics_label]
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            stats.record_timeout()
+            raise
+        finally:
+            stats.wait_seconds.observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    metrics_label = "sync"
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+def _format_labels(**labels) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def render_pool_metrics(pools: Dict[str, Optional[Pool]]) -> str:
+    # Pools and their stats live in the worker process that serves the scrape; the pid label keeps
+    # series from different workers apart.
+    pid = os.getpid()
+    lines = [
+        "# HELP db_pool_size Configured number of persistent connections.",
+        "# TYPE db_pool_size gauge",
+        "# HELP db_pool_checked_out Connections currently checked out of the pool.",
+        "# TYPE db_pool_checked_out gauge",
+        "# HELP db_pool_overflow Connections opened above the pool size.",
+        "# TYPE db_pool_overflow gauge",
+    ]
+    for label, pool in pools.items():
+        if not isinstance(pool, QueuePool):
+            continue
+        labels = _format_labels(pool=label, pid=pid)
+        lines.append(f"db_pool_size{{{labels}}} {pool.size()}")
+        lines.append(f"db_pool_checked_out{{{labels}}} {pool.checkedout()}")
+        lines.append(f"db_pool_overflow{{{labels}}} {max(pool.overflow(), 0)}")
+
+    lines += [
+        "# HELP db_pool_wait_seconds Time spent waiting for a pooled connection.",
+        "# TYPE db_pool_wait_seconds histogram",
+    ]
+    for label, stats in pool_stats.items():
+        histogram = stats.wait_seconds
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f"db_pool_wait_seconds_bucket{{{_format_labels(pool=label, pid=pid, le=bound)}}} {count}")
+        lines.append(f"db_pool_wait_seconds_bucket{{{_format_labels(pool=label, pid=pid, le='+Inf')}}} {histogram.count}")
+        lines.append(f"db_pool_wait_seconds_sum{{{_format_labels(pool=label, pid=pid)}}} {histogram.sum:.6f}")
+        lines.append(f"db_pool_wait_seconds_count{{{_format_labels(pool=label, pid=pid)}}} {histogram.count}")
+
+    lines += [
+        "# HELP db_pool_timeouts_total Checkouts that gave up after pool_timeout.",
+        "# TYPE db_pool_timeouts_total counter",
+    ]
+    for label, stats in pool_stats.items():
+        lines.append(f"db_pool_timeouts_total{{{_format_labels(pool=label, pid=pid)}}} {stats.timeouts}")
+    return "\n".join(lines) + "\n"
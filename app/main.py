@@ -2,7 +2,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import get_settings
-from app.api.routes import auth, teacher, student, files
+from app.core.security import password_hasher
+from app.services.grading import grading_pool
+from app.services.theory_processing import derivative_workers
+from app.api.routes import auth, teacher, student, student_async, files, metrics
 from app.db.base import Base
 from app.db.session import engine
 from app.db.init_db import seed_demo_data
@@ -17,6 +20,13 @@ def on_startup():
     Base.metadata.create_all(bind=engine)
     seed_demo_data()
 
+
+@app.on_event("shutdown")
+def on_shutdown():
+    password_hasher.shutdown()
+    derivative_workers.shutdown()
+    grading_pool.shutdown()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origin_regex=".*",
@@ -28,5 +38,9 @@ app.add_middleware(
 
 app.include_router(auth.router, tags=["auth"])
 app.include_router(teacher.router, prefix="/teacher", tags=["teacher"])
+if settings.async_db_enabled:
+    # Registered first so these async handlers take precedence over the sync ones on the same paths.
+    app.include_router(student_async.router, prefix="/student", tags=["student"])
 app.include_router(student.router, prefix="/student", tags=["student"])
 app.include_router(files.router, tags=["files"])
+app.include_router(metrics.router, tags=["metrics"])
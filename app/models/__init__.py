@@ -2,9 +2,11 @@ from app.models.user import User, UserRole
 from app.models.class_group import ClassGroup
 from app.models.subject import Subject
 from app.models.topic import Topic
-from app.models.theory import Theory, TheoryKind
-from app.models.assignment import Assignment, AssignmentType, Submission
+from app.models.theory import Theory, TheoryDerivative, TheoryKind
+from app.models.assignment import Assignment, AssignmentType, Submission, StudentAssignmentProgress
 from app.models.teacher_class import TeacherClass
+from app.models.idempotency import IdempotencyKey
+from app.models.regrade_job import RegradeJob
 
 __all__ = [
     "User",
@@ -14,8 +16,12 @@ __all__ = [
     "Topic",
     "Theory",
     "TheoryKind",
+    "TheoryDerivative",
     "Assignment",
     "AssignmentType",
     "Submission",
+    "StudentAssignmentProgress",
     "TeacherClass",
+    "IdempotencyKey",
+    "RegradeJob",
 ]
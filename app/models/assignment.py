@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -14,6 +14,10 @@ class AssignmentType(str, enum.Enum):
 
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (
+        Index("ix_assignments_class_subject_type", "class_group_id", "subject_id", "type"),
+        Index("ix_assignments_subject_topic_type_published", "subject_id", "topic_id", "type", "published"),
+    )
 
     id = Column(Integer, primary_key=True)
     class_group_id = Column(Integer, ForeignKey("class_groups.id"), nullable=False)
@@ -34,10 +38,18 @@ class Assignment(Base):
     subject = relationship("Subject", back_populates="assignments")
     topic = relationship("Topic", back_populates="assignments")
     submissions = relationship("Submission", back_populates="assignment", cascade="all, delete-orphan")
+    progress = relationship("StudentAssignmentProgress", cascade="all, delete-orphan")
 
 
 class Submission(Base):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # Same columns as the unique index, but led by student_id: a student's grades page and its
+        # ETag stamp filter on student_id alone and reach assignments through the join.
+        Index("ix_submissions_student_assignment", "student_id", "assignment_id", "attempt_no"),
+        Index("ux_submissions_assignment_student_attempt", "assignment_id", "student_id", "attempt_no", unique=True),
+        Index("ix_submissions_assignment_submitted_at", "assignment_id", "submitted_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     assignment_id = Column(Integer, ForeignKey("assignments.id"), nullable=False)
@@ -50,3 +62,17 @@ class Submission(Base):
 
     assignment = relationship("Assignment", back_populates="submissions")
     student = relationship("User", back_populates="submissions")
+
+
+class StudentAssignmentProgress(Base):
+    # Per-student summary of submissions, kept in step with them by app.services.progress.
+    __tablename__ = "student_assignment_progress"
+
+    student_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    assignment_id = Column(Integer, ForeignKey("assignments.id"), primary_key=True)
+    attempts_used = Column(Integer, nullable=False, default=0)
+    last_score = Column(Integer, nullable=True)
+    last_grade = Column(Integer, nullable=True)
+    best_score = Column(Integer, nullable=True)
+    best_grade = Column(Integer, nullable=True)
+    last_submitted_at = Column(DateTime, nullable=True)
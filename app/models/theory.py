@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Enum, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -13,6 +13,11 @@ class TheoryKind(str, enum.Enum):
 
 class Theory(Base):
     __tablename__ = "theories"
+    __table_args__ = (
+        Index("ix_theories_class_subject", "class_group_id", "subject_id"),
+        Index("ix_theories_subject_topic", "subject_id", "topic_id"),
+        Index("ix_theories_file_path", "file_path"),
+    )
 
     id = Column(Integer, primary_key=True)
     class_group_id = Column(Integer, ForeignKey("class_groups.id"), nullable=False)
@@ -22,8 +27,25 @@ class Theory(Base):
     kind = Column(Enum(TheoryKind, name="theory_kind"), nullable=False)
     text = Column(String, nullable=True)
     file_path = Column(String, nullable=True)
+    file_name = Column(String, nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    file_sha256 = Column(String(64), nullable=True)
+    processing_status = Column(String(16), nullable=True)
+    derivatives = Column(JSON, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     class_group = relationship("ClassGroup", back_populates="theories")
     subject = relationship("Subject", back_populates="theories")
     topic = relationship("Topic", back_populates="theories")
+    derivative_blobs = relationship("TheoryDerivative", cascade="all, delete-orphan")
+
+
+class TheoryDerivative(Base):
+    # Blob keys from Theory.derivatives, so blob references can be counted through an index.
+    __tablename__ = "theory_derivatives"
+    __table_args__ = (Index("ix_theory_derivatives_blob_key", "blob_key"),)
+
+    id = Column(Integer, primary_key=True)
+    theory_id = Column(Integer, ForeignKey("theories.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(16), nullable=False)
+    blob_key = Column(String, nullable=False)
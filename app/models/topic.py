@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -6,6 +6,7 @@ from app.db.base import Base
 
 class Topic(Base):
     __tablename__ = "topics"
+    __table_args__ = (Index("ix_topics_class_subject", "class_group_id", "subject_id"),)
 
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -12,6 +12,7 @@ class UserRole(str, enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_class_group_role", "class_group_id", "role"),)
 
     id = Column(Integer, primary_key=True)
     full_name = Column(String, nullable=False)
@@ -19,6 +20,9 @@ class User(Base):
     email = Column(String, nullable=True)
     password_hash = Column(String, nullable=True)
     role = Column(Enum(UserRole, name="user_role"), nullable=False)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped with every change to the student's submissions or progress; list ETags include it.
+    progress_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     teacher_code = Column(String, nullable=True)
     subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=True)
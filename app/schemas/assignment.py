@@ -1,8 +1,11 @@
+import re
 from typing import List, Optional, Literal, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 
+from app.services.graders import get_grader
 
-QuestionType = Literal["select", "checkbox", "text"]
+
+QuestionType = Literal["select", "checkbox", "text", "numeric", "math", "regex", "fuzzy"]
 AssignmentType = Literal["practice", "homework"]
 
 
@@ -13,6 +16,19 @@ class AssignmentQuestion(BaseModel):
     required: bool = True
     points: int
     correct_answer: Optional[Any] = None
+    tolerance: Optional[float] = None
+    relative_tolerance: Optional[float] = None
+    threshold: Optional[float] = None
+    case_sensitive: bool = False
+
+    @model_validator(mode="after")
+    def check_correct_answer(self):
+        if self.correct_answer is not None:
+            try:
+                get_grader(self.type).compile(self.model_dump())
+            except (ValueError, TypeError, SyntaxError, re.error) as exc:
+                raise ValueError(f"Invalid correct_answer for {self.type} question: {exc}") from exc
+        return self
 
 
 class AssignmentCreate(BaseModel):
@@ -101,3 +117,16 @@ class AssignmentSubmitResponse(BaseModel):
     score: int
     grade: int
     attempts_left: int
+
+
+class RegradeJobOut(BaseModel):
+    id: str
+    assignment_id: int
+    status: str
+    total: int
+    processed: int
+    updated: int
+    progress: float
+    error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
@@ -23,6 +23,8 @@ class GradeSummaryStudent(BaseModel):
     id: int
     full_name: str
     avg_grade: float
+    submissions_count: int = 0
+    last_grade: Optional[int] = None
 
 
 class GradeSummaryResponse(BaseModel):
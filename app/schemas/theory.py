@@ -9,6 +9,10 @@ class TheoryOut(BaseModel):
     kind: str
     text: Optional[str] = None
     file_url: Optional[str] = None
+    processing_status: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    optimized_url: Optional[str] = None
+    text_url: Optional[str] = None
     updated_at: str
 
 
@@ -1,13 +1,117 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import JSON, Select, bindparam, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.models import Submission
+from app.models import StudentAssignmentProgress, Submission
+from app.services.progress import clear_progress, record_progress
 
 
 def get_attempts_used(db: Session, student_id: int, assignment_id: int) -> int:
-    return db.query(Submission).filter(
-        Submission.student_id == student_id,
+    attempts_used = db.execute(
+        select(StudentAssignmentProgress.attempts_used).where(
+            StudentAssignmentProgress.student_id == student_id,
+            StudentAssignmentProgress.assignment_id == assignment_id,
+        )
+    ).scalar()
+    return attempts_used or 0
+
+
+RECORD_ATTEMPT_RETRIES = 3
+
+
+def record_attempt_statement(
+    assignment_id: int,
+    student_id: int,
+    max_attempts: int,
+    answers: Any,
+    score: int,
+    grade: int,
+    submitted_at: datetime,
+):
+    # Counting and inserting in one statement leaves no gap between the check and the insert. Two
+    # concurrent inserts can still pick the same attempt_no; the unique index rejects the second one.
+    taken = select(
+        literal(assignment_id),
+        literal(student_id),
+        func.coalesce(func.max(Submission.attempt_no), 0) + 1,
+        bindparam("answers", answers, type_=JSON),
+        literal(score),
+        literal(grade),
+        literal(submitted_at),
+    ).where(
         Submission.assignment_id == assignment_id,
-    ).count()
+        Submission.student_id == student_id,
+    ).having(func.count() < max_attempts)
+    return (
+        insert(Submission)
+        .from_select(
+            ["assignment_id", "student_id", "attempt_no", "answers", "score", "grade", "submitted_at"],
+            taken,
+        )
+        .returning(Submission.id, Submission.attempt_no)
+    )
+
+
+def record_attempt(
+    db: Session,
+    assignment_id: int,
+    student_id: int,
+    max_attempts: int,
+    answers: Any,
+    score: int,
+    grade: int,
+    on_recorded: Optional[Callable[[int, int], None]] = None,
+) -> Optional[Tuple[int, int]]:
+    # on_recorded(submission_id, attempt_no) runs in the same transaction as the insert.
+    submitted_at = datetime.utcnow()
+    statement = record_attempt_statement(
+        assignment_id, student_id, max_attempts, answers, score, grade, submitted_at
+    )
+    for attempt in range(RECORD_ATTEMPT_RETRIES):
+        try:
+            row = db.execute(statement).first()
+            if row is not None:
+                record_progress(db, student_id, assignment_id, row.attempt_no, score, grade, submitted_at)
+                if on_recorded is not None:
+                    on_recorded(row.id, row.attempt_no)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            if attempt == RECORD_ATTEMPT_RETRIES - 1:
+                raise
+            continue
+        return None if row is None else (row.id, row.attempt_no)
+
+
+def attempts_summary_statement(student_id: int, assignment_ids: List[int]) -> Select:
+    return select(
+        StudentAssignmentProgress.assignment_id,
+        StudentAssignmentProgress.attempts_used,
+        StudentAssignmentProgress.last_grade,
+    ).where(
+        StudentAssignmentProgress.student_id == student_id,
+        StudentAssignmentProgress.assignment_id.in_(assignment_ids),
+    )
+
+
+def get_attempts_summary(
+    db: Session, student_id: int, assignment_ids: Iterable[int]
+) -> Dict[int, Tuple[int, Optional[int]]]:
+    assignment_ids = list(assignment_ids)
+    if not assignment_ids:
+        return {}
+
+    return summarize_attempts(assignment_ids, db.execute(attempts_summary_statement(student_id, assignment_ids)))
+
+
+def summarize_attempts(assignment_ids: List[int], rows) -> Dict[int, Tuple[int, Optional[int]]]:
+    summary: Dict[int, Tuple[int, Optional[int]]] = {assignment_id: (0, None) for assignment_id in assignment_ids}
+    for assignment_id, attempts_used, last_grade in rows:
+        summary[assignment_id] = (attempts_used, last_grade)
+    return summary
 
 
 def reset_attempts_for_student(db: Session, student_id: int, assignment_id: int) -> None:
@@ -15,4 +119,5 @@ def reset_attempts_for_student(db: Session, student_id: int, assignment_id: int)
         Submission.student_id == student_id,
         Submission.assignment_id == assignment_id,
     ).delete(synchronize_session=False)
+    clear_progress(db, student_id, assignment_id)
     db.commit()
@@ -1,7 +1,83 @@
+from dataclasses import dataclass
 from datetime import timedelta
+from typing import Optional
 
 from app.core.security import create_access_token
+from app.models import User, UserRole
 
+TOKEN_CLAIMS_VERSION = 2
 
-def build_access_token(phone: str, role: str, expires_minutes: int) -> str:
-    return create_access_token(subject=phone, role=role, expires_delta=timedelta(minutes=expires_minutes))
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    phone: str
+    role: UserRole
+    class_group_id: Optional[int]
+    subject_id: Optional[int]
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            phone=user.phone,
+            role=user.role,
+            class_group_id=user.class_group_id,
+            subject_id=user.subject_id,
+            token_version=user.token_version or 0,
+        )
+
+
+def build_access_token(
+    phone: str,
+    role: str,
+    expires_minutes: int,
+    user_id: Optional[int] = None,
+    class_group_id: Optional[int] = None,
+    subject_id: Optional[int] = None,
+    token_version: int = 0,
+) -> str:
+    claims = None
+    if user_id is not None:
+        claims = {
+            "tv": TOKEN_CLAIMS_VERSION,
+            "uid": user_id,
+            "cid": class_group_id,
+            "sid": subject_id,
+            "ver": token_version,
+        }
+    return create_access_token(
+        subject=phone,
+        role=role,
+        expires_delta=timedelta(minutes=expires_minutes),
+        claims=claims,
+    )
+
+
+def build_user_access_token(user: User, expires_minutes: int) -> str:
+    return build_access_token(
+        phone=user.phone,
+        role=user.role.value,
+        expires_minutes=expires_minutes,
+        user_id=user.id,
+        class_group_id=user.class_group_id,
+        subject_id=user.subject_id,
+        token_version=user.token_version or 0,
+    )
+
+
+def principal_from_claims(payload: dict) -> Optional[Principal]:
+    if payload.get("tv") != TOKEN_CLAIMS_VERSION:
+        return None
+    try:
+        return Principal(
+            id=int(payload["uid"]),
+            phone=payload["sub"],
+            role=UserRole(payload["role"]),
+            class_group_id=payload.get("cid"),
+            subject_id=payload.get("sid"),
+            token_version=int(payload.get("ver", 0)),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
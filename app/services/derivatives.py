@@ -0,0 +1,132 @@
+import os
+import shutil
+import zipfile
+from typing import Dict, Tuple
+from xml.etree import ElementTree
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+Outputs = Dict[str, Tuple[str, str]]
+
+
+def build_derivatives(
+    source_path: str,
+    filename: str,
+    output_dir: str,
+    image_max_px: int,
+    thumbnail_px: int,
+    jpeg_quality: int,
+) -> Outputs:
+    # Runs in a worker process; returns kind -> (output path, download name).
+    stem, extension = os.path.splitext(filename)
+    stem = stem or "file"
+    extension = extension.lower()
+    outputs: Outputs = {}
+    if extension in IMAGE_EXTENSIONS:
+        _image_derivatives(source_path, stem, output_dir, image_max_px, thumbnail_px, jpeg_quality, outputs)
+    elif extension == ".pdf":
+        _pdf_derivatives(source_path, stem, output_dir, thumbnail_px, jpeg_quality, outputs)
+    elif extension == ".docx":
+        _docx_derivatives(source_path, stem, output_dir, outputs)
+    return outputs
+
+
+def _save_jpeg(image, path: str, max_px: int, quality: int) -> None:
+    image = image.copy()
+    image.thumbnail((max_px, max_px))
+    image.save(path, "JPEG", quality=quality, optimize=True, progressive=True)
+
+
+def _image_derivatives(source_path, stem, output_dir, image_max_px, thumbnail_px, jpeg_quality, outputs) -> None:
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        optimized_path = os.path.join(output_dir, "optimized.jpg")
+        _save_jpeg(image, optimized_path, image_max_px, jpeg_quality)
+        if os.path.getsize(optimized_path) < os.path.getsize(source_path):
+            outputs["optimized"] = (optimized_path, f"{stem}.jpg")
+        else:
+            os.remove(optimized_path)
+
+        thumbnail_path = os.path.join(output_dir, "thumbnail.jpg")
+        _save_jpeg(image, thumbnail_path, thumbnail_px, jpeg_quality)
+        outputs["thumbnail"] = (thumbnail_path, f"{stem}-thumbnail.jpg")
+
+
+def _pdf_derivatives(source_path, stem, output_dir, thumbnail_px, jpeg_quality, outputs) -> None:
+    try:
+        import pikepdf
+    except ImportError:
+        pikepdf = None
+    if pikepdf is not None:
+        optimized_path = os.path.join(output_dir, "optimized.pdf")
+        with pikepdf.open(source_path) as pdf:
+            pdf.save(
+                optimized_path,
+                linearize=True,
+                compress_streams=True,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            )
+        outputs["optimized"] = (optimized_path, f"{stem}.pdf")
+
+    try:
+        # pdfium is Apache-2.0/BSD licensed, unlike the AGPL PyMuPDF.
+        import pypdfium2
+    except ImportError:
+        pypdfium2 = None
+    if pypdfium2 is not None:
+        document = pypdfium2.PdfDocument(source_path)
+        try:
+            if len(document):
+                page = document[0]
+                scale = thumbnail_px / max(page.get_size())
+                thumbnail_path = os.path.join(output_dir, "thumbnail.jpg")
+                _save_jpeg(page.render(scale=scale).to_pil().convert("RGB"), thumbnail_path, thumbnail_px, jpeg_quality)
+                outputs["thumbnail"] = (thumbnail_path, f"{stem}-thumbnail.jpg")
+            text = "\n".join(page.get_textpage().get_text_bounded() for page in document)
+        finally:
+            document.close()
+    else:
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return
+        text = "\n".join(page.extract_text() or "" for page in PdfReader(source_path).pages)
+    _write_text(text, stem, output_dir, outputs)
+
+
+def _docx_derivatives(source_path, stem, output_dir, outputs) -> None:
+    with zipfile.ZipFile(source_path) as archive:
+        names = set(archive.namelist())
+        if "word/document.xml" in names:
+            root = ElementTree.fromstring(archive.read("word/document.xml"))
+            paragraphs = [
+                "".join(node.text or "" for node in paragraph.iter(f"{WORD_NAMESPACE}t"))
+                for paragraph in root.iter(f"{WORD_NAMESPACE}p")
+            ]
+            _write_text("\n".join(paragraphs), stem, output_dir, outputs)
+        for name, extension in (("docProps/thumbnail.jpeg", "jpg"), ("docProps/thumbnail.png", "png")):
+            if name in names:
+                thumbnail_path = os.path.join(output_dir, f"thumbnail.{extension}")
+                with archive.open(name) as source, open(thumbnail_path, "wb") as target:
+                    shutil.copyfileobj(source, target)
+                outputs["thumbnail"] = (thumbnail_path, f"{stem}-thumbnail.{extension}")
+                break
+
+
+def _write_text(text: str, stem: str, output_dir: str, outputs: Outputs) -> None:
+    text = text.strip()
+    if not text:
+        return
+    text_path = os.path.join(output_dir, "text.txt")
+    with open(text_path, "w", encoding="utf-8") as output:
+        output.write(text)
+    outputs["text"] = (text_path, f"{stem}.txt")
@@ -0,0 +1,121 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Response, status
+from sqlalchemy import Select, func, select
+
+from app.models import Assignment, AssignmentType, Submission, User, UserRole
+
+# Clients may keep the body but must revalidate it on every poll.
+CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(*parts: Any) -> str:
+    payload = json.dumps(parts, separators=(",", ":"), ensure_ascii=False, default=str)
+    return f'W/"{hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()}"'
+
+
+def body_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison.
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+
+
+def _progress_version(student_id: int):
+    return select(User.progress_version).where(User.id == student_id).scalar_subquery()
+
+
+def assignments_stamp_statement(student_id: int, subject_id: int, topic_id: int, type: AssignmentType) -> Select:
+    # Changes whenever an assignment in the list is added, removed or edited, or anything about
+    # the student's submissions changes: submits, resets and regrades bump progress_version.
+    return select(
+        func.count(Assignment.id),
+        func.max(Assignment.id),
+        func.max(Assignment.updated_at),
+        _progress_version(student_id),
+    ).where(
+        Assignment.subject_id == subject_id,
+        Assignment.topic_id == topic_id,
+        Assignment.type == type,
+        Assignment.published.is_(True),
+    )
+
+
+def grades_stamp_statement(student_id: int, subject_id: int) -> Select:
+    return (
+        select(
+            func.count(Submission.id),
+            func.max(Submission.id),
+            func.max(Assignment.updated_at),
+            _progress_version(student_id),
+        )
+        .select_from(Submission)
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .where(Submission.student_id == student_id, Assignment.subject_id == subject_id)
+    )
+
+
+def _student_progress_sum():
+    # Submits, resets and regrades bump progress_version of every student they touch, so the sum
+    # over the listed students grows with each change to their scores and grades.
+    return func.coalesce(func.sum(User.progress_version), 0)
+
+
+def submissions_stamp_statement(assignment_id: int) -> Select:
+    return (
+        select(func.count(Submission.id), func.max(Submission.id), _student_progress_sum())
+        .select_from(Submission)
+        .join(User, Submission.student_id == User.id)
+        .where(Submission.assignment_id == assignment_id)
+    )
+
+
+def topic_grades_stamp_statement(class_id: int, subject_id: int, topic_id: int, type: AssignmentType) -> Select:
+    return (
+        select(
+            func.count(Submission.id),
+            func.max(Submission.id),
+            func.max(Assignment.updated_at),
+            _student_progress_sum(),
+        )
+        .select_from(Submission)
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .join(User, Submission.student_id == User.id)
+        .where(
+            Assignment.class_group_id == class_id,
+            Assignment.subject_id == subject_id,
+            Assignment.topic_id == topic_id,
+            Assignment.type == type,
+        )
+    )
+
+
+def class_grades_stamp_statement(class_id: int, subject_id: int) -> Select:
+    # The summary lists every student of the class, with or without submissions.
+    submissions = (
+        select(func.count(Submission.id), func.max(Submission.id), func.max(Assignment.updated_at))
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .where(Assignment.class_group_id == class_id, Assignment.subject_id == subject_id)
+        .subquery()
+    )
+    students = (
+        select(func.count(User.id), func.max(User.id), _student_progress_sum())
+        .where(User.role == UserRole.student, User.class_group_id == class_id)
+        .subquery()
+    )
+    return select(submissions, students)
@@ -0,0 +1,59 @@
+from typing import List, Optional
+
+from sqlalchemy import Row, Select, case, func, select
+from sqlalchemy.orm import Session
+
+from app.models import Assignment, AssignmentType, Submission, User, UserRole
+
+
+def class_grade_summary_statement(
+    class_id: int,
+    subject_id: int,
+    topic_id: Optional[int] = None,
+    assignment_type: Optional[AssignmentType] = None,
+) -> Select:
+    filters = [Assignment.class_group_id == class_id, Assignment.subject_id == subject_id]
+    if topic_id is not None:
+        filters.append(Assignment.topic_id == topic_id)
+    if assignment_type is not None:
+        filters.append(Assignment.type == assignment_type)
+
+    ranked = (
+        select(
+            Submission.student_id.label("student_id"),
+            Submission.grade.label("grade"),
+            func.row_number()
+            .over(
+                partition_by=Submission.student_id,
+                order_by=(Submission.submitted_at.desc(), Submission.id.desc()),
+            )
+            .label("rn"),
+        )
+        .join(Assignment, Submission.assignment_id == Assignment.id)
+        .where(*filters)
+        .subquery()
+    )
+
+    return (
+        select(
+            User.id,
+            User.full_name,
+            func.avg(ranked.c.grade).label("avg_grade"),
+            func.count(ranked.c.grade).label("submissions_count"),
+            func.max(case((ranked.c.rn == 1, ranked.c.grade))).label("last_grade"),
+        )
+        .outerjoin(ranked, ranked.c.student_id == User.id)
+        .where(User.role == UserRole.student, User.class_group_id == class_id)
+        .group_by(User.id, User.full_name)
+        .order_by(User.full_name, User.id)
+    )
+
+
+def class_grade_summary(
+    db: Session,
+    class_id: int,
+    subject_id: int,
+    topic_id: Optional[int] = None,
+    assignment_type: Optional[AssignmentType] = None,
+) -> List[Row]:
+    return db.execute(class_grade_summary_statement(class_id, subject_id, topic_id, assignment_type)).all()
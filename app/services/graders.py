@@ -0,0 +1,271 @@
+import ast
+import difflib
+import math
+import operator
+import random
+import re
+import signal
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+class GradingTimeout(Exception):
+    pass
+
+
+class Grader(ABC):
+    # Expensive graders run in the grading process pool with a time limit.
+    expensive = False
+
+    def compile(self, question: dict) -> Any:
+        return question.get("correct_answer")
+
+    @abstractmethod
+    def check(self, correct: Any, answer: Any) -> bool:
+        ...
+
+
+GRADERS: Dict[str, Grader] = {}
+
+
+def register_grader(name: str, grader: Grader) -> Grader:
+    # Register at import time: pool workers only see graders defined when this module is imported.
+    GRADERS[name] = grader
+    return grader
+
+
+def get_grader(name: Optional[str]) -> Optional[Grader]:
+    return GRADERS.get(name) if name else None
+
+
+def _normalize_text(value: Any) -> str:
+    return " ".join(str(value).split()).lower()
+
+
+class SelectGrader(Grader):
+    def check(self, correct: Any, answer: Any) -> bool:
+        return answer == correct
+
+
+class ChoiceGrader(Grader):
+    def compile(self, question: dict) -> Any:
+        return frozenset(question["correct_answer"])
+
+    def check(self, correct: frozenset, answer: Any) -> bool:
+        return isinstance(answer, str) and answer in correct
+
+
+class CheckboxGrader(Grader):
+    def compile(self, question: dict) -> Any:
+        return frozenset(question["correct_answer"])
+
+    def check(self, correct: frozenset, answer: Any) -> bool:
+        return isinstance(answer, list) and frozenset(answer) == correct
+
+
+class TextGrader(Grader):
+    def compile(self, question: dict) -> Any:
+        return str(question["correct_answer"]).strip().lower()
+
+    def check(self, correct: str, answer: Any) -> bool:
+        return isinstance(answer, str) and answer.strip().lower() == correct
+
+
+def parse_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str):
+        try:
+            number = float(value.strip().replace(" ", "").replace(",", "."))
+        except ValueError:
+            return None
+    else:
+        return None
+    return number if math.isfinite(number) else None
+
+
+class NumericGrader(Grader):
+    def compile(self, question: dict) -> Any:
+        expected = parse_number(question["correct_answer"])
+        if expected is None:
+            raise ValueError(f"Numeric correct_answer expected, got {question['correct_answer']!r}")
+        return expected, float(question.get("tolerance") or 0), float(question.get("relative_tolerance") or 0)
+
+    def check(self, correct: Tuple[float, float, float], answer: Any) -> bool:
+        expected, tolerance, relative_tolerance = correct
+        value = parse_number(answer)
+        return value is not None and math.isclose(value, expected, rel_tol=relative_tolerance, abs_tol=tolerance)
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_FUNCTIONS = {
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "sqrt": math.sqrt,
+    "log": math.log,
+    "ln": math.log,
+    "exp": math.exp,
+    "abs": abs,
+}
+_CONSTANTS = {"pi": math.pi, "e": math.e}
+MAX_EXPRESSION_NODES = 200
+
+
+def parse_expression(source: str) -> Tuple[ast.AST, frozenset]:
+    tree = ast.parse(source.replace("^", "**").replace("×", "*").replace(",", "."), mode="eval")
+    variables = set()
+    nodes = 0
+    for node in ast.walk(tree):
+        nodes += 1
+        if nodes > MAX_EXPRESSION_NODES:
+            raise ValueError("Expression is too long")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or len(node.args) != 1:
+                raise ValueError("Unsupported function")
+        elif isinstance(node, ast.Name):
+            if node.id not in _FUNCTIONS and node.id not in _CONSTANTS:
+                variables.add(node.id)
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+                raise ValueError("Unsupported constant")
+        elif not isinstance(
+            node,
+            (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Load, *_BINARY_OPERATORS, *_UNARY_OPERATORS),
+        ):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+    return tree, frozenset(variables)
+
+
+def evaluate_expression(node: ast.AST, values: Dict[str, float]) -> float:
+    if isinstance(node, ast.Expression):
+        return evaluate_expression(node.body, values)
+    if isinstance(node, ast.Constant):
+        # Floats only: integer powers like 9**9**9 would otherwise run unbounded.
+        return float(node.value)
+    if isinstance(node, ast.Name):
+        return _CONSTANTS[node.id] if node.id in _CONSTANTS else values[node.id]
+    if isinstance(node, ast.UnaryOp):
+        return _UNARY_OPERATORS[type(node.op)](evaluate_expression(node.operand, values))
+    if isinstance(node, ast.BinOp):
+        left = evaluate_expression(node.left, values)
+        right = evaluate_expression(node.right, values)
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    return _FUNCTIONS[node.func.id](evaluate_expression(node.args[0], values))
+
+
+class MathExpressionGrader(Grader):
+    expensive = True
+    samples = 8
+
+    def compile(self, question: dict) -> Any:
+        return parse_expression(str(question["correct_answer"]))
+
+    def check(self, correct: Tuple[ast.AST, frozenset], answer: Any) -> bool:
+        if not isinstance(answer, str) or not answer.strip():
+            return False
+        try:
+            answer_tree, answer_variables = parse_expression(answer)
+        except (SyntaxError, ValueError):
+            return False
+        expected_tree, expected_variables = correct
+        variables = sorted(expected_variables | answer_variables)
+        rng = random.Random(20240917)
+        compared = 0
+        for _ in range(self.samples * 3):
+            values = {name: rng.uniform(0.5, 3.0) for name in variables}
+            try:
+                expected = evaluate_expression(expected_tree, values)
+            except (ArithmeticError, ValueError, TypeError):
+                continue
+            try:
+                actual = evaluate_expression(answer_tree, values)
+            except (ArithmeticError, ValueError, TypeError):
+                return False
+            if isinstance(expected, complex) or isinstance(actual, complex):
+                return False
+            if not math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9):
+                return False
+            compared += 1
+            if compared == self.samples:
+                break
+        return compared > 0
+
+
+class RegexGrader(Grader):
+    expensive = True
+
+    def compile(self, question: dict) -> Any:
+        flags = 0 if question.get("case_sensitive") else re.IGNORECASE
+        return re.compile(str(question["correct_answer"]), flags)
+
+    def check(self, correct: re.Pattern, answer: Any) -> bool:
+        return isinstance(answer, str) and correct.fullmatch(answer.strip()) is not None
+
+
+class FuzzyTextGrader(Grader):
+    expensive = True
+    default_threshold = 0.85
+
+    def compile(self, question: dict) -> Any:
+        threshold = question.get("threshold")
+        return _normalize_text(question["correct_answer"]), self.default_threshold if threshold is None else threshold
+
+    def check(self, correct: Tuple[str, float], answer: Any) -> bool:
+        if not isinstance(answer, str):
+            return False
+        expected, threshold = correct
+        return difflib.SequenceMatcher(None, _normalize_text(answer), expected).ratio() >= threshold
+
+
+register_grader("select", SelectGrader())
+register_grader("checkbox", CheckboxGrader())
+register_grader("text", TextGrader())
+register_grader("numeric", NumericGrader())
+register_grader("math", MathExpressionGrader())
+register_grader("regex", RegexGrader())
+register_grader("fuzzy", FuzzyTextGrader())
+# Question types of the legacy tests in common/.
+register_grader("single_choice", ChoiceGrader())
+register_grader("multiple_choice", CheckboxGrader())
+register_grader("text_input", TextGrader())
+
+
+def _raise_timeout(signum, frame):
+    raise GradingTimeout()
+
+
+@contextmanager
+def time_limit(seconds: float):
+    # SIGALRM only works in the main thread, which is where pool workers run their tasks.
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def check_batch(items: Sequence[Tuple[str, Any, Any]], timeout: float) -> List[Optional[bool]]:
+    # Runs in a grading worker process; None marks an answer whose check ran out of time.
+    results: List[Optional[bool]] = []
+    for grader_name, correct, answer in items:
+        try:
+            with time_limit(timeout):
+                results.append(bool(GRADERS[grader_name].check(correct, answer)))
+        except GradingTimeout:
+            results.append(None)
+        except Exception:
+            results.append(False)
+    return results
@@ -1,42 +1,187 @@
-from typing import Dict, Tuple
+import logging
+import re
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.workers import WorkerPool, WorkerPoolBusy
 from app.models import Assignment
+from app.services.graders import Grader, check_batch, get_grader
 
+logger = logging.getLogger(__name__)
+settings = get_settings()
 
-def grade_submission(assignment: Assignment, answers: Dict) -> Tuple[int, int]:
-    total_points = 0
-    earned_points = 0
-
-    for index, question in enumerate(assignment.questions, start=1):
-        points = int(question.get("points", 1))
-        total_points += points
-        key = f"q{index}"
-        answer = answers.get(key)
-        correct_answer = question.get("correct_answer")
-        q_type = question.get("type")
-
-        if correct_answer is None:
+
+class GradingBusy(WorkerPoolBusy):
+    pass
+
+
+class GradingIncomplete(Exception):
+    # Raised instead of counting unchecked answers as wrong when the caller asks for it.
+    pass
+
+
+class GradingPool(WorkerPool):
+    busy_exception = GradingBusy
+
+
+grading_pool = GradingPool(workers=settings.grading_workers, max_pending=settings.grading_max_pending)
+
+
+@dataclass(frozen=True)
+class CompiledQuestion:
+    key: str
+    type: Optional[str]
+    points: int
+    correct: Any
+    grader: Optional[Grader] = field(default=None, compare=False, repr=False)
+
+
+@dataclass(frozen=True)
+class GradingPlan:
+    questions: Tuple[CompiledQuestion, ...]
+    points: Tuple[int, ...]
+    total_points: int
+    expensive: bool = False
+
+
+def _compile_answer(question: dict) -> Any:
+    grader = get_grader(question.get("type"))
+    if grader is None or question.get("correct_answer") is None:
+        return None
+    try:
+        return grader.compile(question)
+    except (ValueError, TypeError, SyntaxError, re.error):
+        # Stored before the type was validated; such a question is never counted as correct.
+        logger.warning(
+            "Cannot compile %s question with answer %r", question.get("type"), question.get("correct_answer")
+        )
+        return None
+
+
+def compile_grading_plan(questions: Iterable[dict]) -> GradingPlan:
+    compiled = []
+    for index, question in enumerate(questions, start=1):
+        correct = _compile_answer(question)
+        compiled.append(
+            CompiledQuestion(
+                key=f"q{index}",
+                type=question.get("type"),
+                points=int(question.get("points", 1)),
+                correct=correct,
+                grader=None if correct is None else get_grader(question.get("type")),
+            )
+        )
+    points = tuple(question.points for question in compiled)
+    return GradingPlan(
+        questions=tuple(compiled),
+        points=points,
+        total_points=sum(points),
+        expensive=any(question.grader is not None and question.grader.expensive for question in compiled),
+    )
+
+
+grading_plan_cache = TTLCache(settings.grading_plan_cache_size)
+
+
+def get_grading_plan(assignment: Assignment) -> GradingPlan:
+    if assignment.id is None:
+        return compile_grading_plan(assignment.questions)
+    cache_key = (assignment.id, assignment.updated_at)
+    plan = grading_plan_cache.get(cache_key)
+    if plan is None:
+        plan = compile_grading_plan(assignment.questions)
+        grading_plan_cache.set(cache_key, plan)
+    return plan
+
+
+def _unchecked(items: List[Tuple[str, Any, Any]], strict: bool, reason: str) -> List[bool]:
+    if strict:
+        raise GradingIncomplete(f"{reason} for a batch of {len(items)} answers")
+    logger.warning("%s for a batch of %s answers", reason, len(items))
+    return [False] * len(items)
+
+
+def _check_in_pool(items: List[Tuple[str, Any, Any]], deadline: float, strict: bool = False) -> List[bool]:
+    timeout = settings.grading_timeout_seconds
+    for attempt in range(2):
+        # Every item has its own limit inside the worker; the hard limit also covers starting the
+        # pool and never runs past the request's grading deadline.
+        hard_timeout = min(timeout * len(items) + 5.0, deadline - time.monotonic())
+        if hard_timeout <= 0:
+            return _unchecked(items, strict, "No grading time left")
+        try:
+            results = grading_pool.call(check_batch, items, timeout, timeout=hard_timeout)
+        except FutureTimeout:
+            return _unchecked(items, strict, "Grading timed out")
+        except BrokenProcessPool as exc:
+            # Another batch timed out and took the workers down; retry once on a fresh pool.
+            if attempt:
+                raise GradingBusy() from exc
             continue
+        if strict and None in results:
+            raise GradingIncomplete(f"{results.count(None)} answers timed out")
+        return [bool(ok) for ok in results]
 
-        if q_type == "select":
-            if answer == correct_answer:
-                earned_points += points
-        elif q_type == "checkbox":
-            if isinstance(answer, list) and set(answer) == set(correct_answer):
-                earned_points += points
-        elif q_type == "text":
-            if isinstance(answer, str) and str(correct_answer).strip().lower() == answer.strip().lower():
-                earned_points += points
 
-    score = int((earned_points / total_points) * 100) if total_points else 0
+def check_answers(
+    pairs: Sequence[Tuple[CompiledQuestion, Any]], deadline: Optional[float] = None, strict: bool = False
+) -> List[bool]:
+    # A submission counts answers that could not be checked in time as wrong; strict callers get
+    # GradingIncomplete instead.
+    results = [False] * len(pairs)
+    expensive = []
+    for index, (question, answer) in enumerate(pairs):
+        grader = question.grader
+        if grader is None or answer is None:
+            continue
+        if not grader.expensive:
+            results[index] = grader.check(question.correct, answer)
+        elif not isinstance(answer, str) or len(answer) <= settings.grading_max_answer_chars:
+            expensive.append(index)
+
+    batch_size = settings.grading_batch_size
+    if deadline is None:
+        deadline = time.monotonic() + settings.grading_deadline_seconds
+    for start in range(0, len(expensive), batch_size):
+        indexes = expensive[start:start + batch_size]
+        items = [(pairs[index][0].type, pairs[index][0].correct, pairs[index][1]) for index in indexes]
+        for index, ok in zip(indexes, _check_in_pool(items, deadline, strict)):
+            results[index] = ok
+    return results
 
+
+def score_to_grade(score: int) -> int:
     if score >= 90:
-        grade = 5
-    elif score >= 75:
-        grade = 4
-    elif score >= 60:
-        grade = 3
-    else:
-        grade = 2
-
-    return score, grade
+        return 5
+    if score >= 75:
+        return 4
+    if score >= 60:
+        return 3
+    return 2
+
+
+def earned_points(plan: GradingPlan, answers: Dict) -> int:
+    if not plan.expensive:
+        earned = 0
+        for question in plan.questions:
+            answer = answers.get(question.key)
+            if question.grader is not None and answer is not None and question.grader.check(question.correct, answer):
+                earned += question.points
+        return earned
+    checks = check_answers([(question, answers.get(question.key)) for question in plan.questions])
+    return sum(question.points for question, ok in zip(plan.questions, checks) if ok)
+
+
+def grade_answers(plan: GradingPlan, answers: Dict) -> Tuple[int, int]:
+    earned = earned_points(plan, answers)
+    score = int((earned / plan.total_points) * 100) if plan.total_points else 0
+    return score, score_to_grade(score)
+
+
+def grade_submission(assignment: Assignment, answers: Dict) -> Tuple[int, int]:
+    return grade_answers(get_grading_plan(assignment), answers)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.models import IdempotencyKey
+
+NEW = "new"
+REPLAY = "replay"
+IN_PROGRESS = "in_progress"
+MISMATCH = "mismatch"
+
+
+@dataclass(frozen=True)
+class Claim:
+    status: str
+    response: Optional[dict] = None
+
+
+def request_fingerprint(*parts: Any) -> str:
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore(ABC):
+    # claim() reserves the key before the work starts, complete() stores the response inside the
+    # caller's transaction, release() frees a key whose request failed so the client can retry it.
+    @abstractmethod
+    def claim(self, db: Session, scope: str, key: str, fingerprint: str) -> Claim:
+        ...
+
+    @abstractmethod
+    def complete(self, db: Session, scope: str, key: str, response: dict) -> None:
+        ...
+
+    @abstractmethod
+    def release(self, db: Session, scope: str, key: str) -> None:
+        ...
+
+    def purge_expired(self, db: Session) -> int:
+        return 0
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    locked_at: datetime
+    response: Optional[dict] = None
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    # Single-node only: every API process keeps its own keys.
+    def __init__(self, maxsize: int, ttl: float, lock_seconds: float) -> None:
+        self._entries = TTLCache(maxsize, ttl=ttl)
+        self._lock_timeout = timedelta(seconds=lock_seconds)
+        self._lock = threading.Lock()
+
+    def claim(self, db: Session, scope: str, key: str, fingerprint: str) -> Claim:
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if entry is None:
+                self._entries.set((scope, key), _Entry(fingerprint=fingerprint, locked_at=now))
+                return Claim(NEW)
+            if entry.fingerprint != fingerprint:
+                return Claim(MISMATCH)
+            if entry.response is not None:
+                return Claim(REPLAY, entry.response)
+            if entry.locked_at <= now - self._lock_timeout:
+                entry.locked_at = now
+                return Claim(NEW)
+            return Claim(IN_PROGRESS)
+
+    def complete(self, db: Session, scope: str, key: str, response: dict) -> None:
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if entry is not None:
+                entry.response = response
+
+    def release(self, db: Session, scope: str, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if entry is not None and entry.response is None:
+                self._entries.pop((scope, key))
+
+
+class DatabaseIdempotencyStore(IdempotencyStore):
+    def __init__(self, ttl: float, lock_seconds: float) -> None:
+        self._ttl = timedelta(seconds=ttl)
+        self._lock_timeout = timedelta(seconds=lock_seconds)
+
+    def claim(self, db: Session, scope: str, key: str, fingerprint: str) -> Claim:
+        now = datetime.utcnow()
+        row = db.get(IdempotencyKey, (scope, key))
+        if row is not None and row.created_at <= now - self._ttl:
+            db.delete(row)
+            db.commit()
+            row = None
+        if row is None:
+            db.add(IdempotencyKey(scope=scope, key=key, fingerprint=fingerprint, created_at=now, locked_at=now))
+            try:
+                db.commit()
+                return Claim(NEW)
+            except IntegrityError:
+                # A parallel request with the same key claimed it first.
+                db.rollback()
+                row = db.get(IdempotencyKey, (scope, key))
+                if row is None:
+                    return Claim(IN_PROGRESS)
+
+        if row.fingerprint != fingerprint:
+            return Claim(MISMATCH)
+        if row.completed_at is not None:
+            return Claim(REPLAY, row.response)
+        if row.locked_at <= now - self._lock_timeout:
+            # The request holding the key died; take it over unless someone else already did.
+            taken = db.execute(
+                update(IdempotencyKey)
+                .where(
+                    IdempotencyKey.scope == scope,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.locked_at == row.locked_at,
+                    IdempotencyKey.completed_at.is_(None),
+                )
+                .values(locked_at=now)
+            ).rowcount
+            db.commit()
+            if taken:
+                return Claim(NEW)
+        return Claim(IN_PROGRESS)
+
+    def complete(self, db: Session, scope: str, key: str, response: dict) -> None:
+        db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            .values(response=response, completed_at=datetime.utcnow())
+        )
+
+    def release(self, db: Session, scope: str, key: str) -> None:
+        db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.completed_at.is_(None),
+            )
+        )
+        db.commit()
+
+    def purge_expired(self, db: Session) -> int:
+        purged = db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.created_at <= datetime.utcnow() - self._ttl)
+        ).rowcount
+        db.commit()
+        return purged
+
+
+@lru_cache
+def get_idempotency_store() -> IdempotencyStore:
+    settings = get_settings()
+    if settings.idempotency_backend == "db":
+        return DatabaseIdempotencyStore(settings.idempotency_ttl_seconds, settings.idempotency_lock_seconds)
+    if settings.idempotency_backend == "memory":
+        return MemoryIdempotencyStore(
+            settings.idempotency_cache_size, settings.idempotency_ttl_seconds, settings.idempotency_lock_seconds
+        )
+    raise RuntimeError(f"Unknown idempotency backend: {settings.idempotency_backend}")
+
+
+if __name__ == "__main__":
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        purged = get_idempotency_store().purge_expired(db)
+    print(f"Purged {purged} expired idempotency keys")
@@ -0,0 +1,100 @@
+import itertools
+import threading
+from typing import Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.models import User
+
+settings = get_settings()
+
+TOKEN_SCOPE_FIELDS = ("phone", "role", "class_group_id", "subject_id")
+
+
+def _detached_copy(instance):
+    if instance is None:
+        return None
+    mapper = inspect(instance).mapper
+    copy = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        set_committed_value(copy, attr.key, getattr(instance, attr.key))
+    make_transient_to_detached(copy)
+    return copy
+
+
+class PrincipalCache:
+    # Invalidation is local to the process: other workers keep serving their cached users and
+    # token versions until the entries expire, at most ttl seconds after the change.
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._entries = TTLCache(maxsize, ttl)
+        self._versions = TTLCache(maxsize, ttl)
+        # A generation is set after every entry it invalidates and expires after them. Values come
+        # from one counter, so a generation recorded again after expiry never matches an old entry.
+        self._generations = TTLCache(maxsize, ttl)
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def generation(self, user_id: int) -> int:
+        return self._generations.get(user_id, 0)
+
+    def get(self, db: Session, token: str) -> Optional[User]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        generation, snapshot = entry
+        if generation != self.generation(snapshot.id):
+            self._entries.pop(token)
+            return None
+        return db.merge(snapshot, load=False)
+
+    def set(self, token: str, user: User, generation: int) -> None:
+        snapshot = _detached_copy(user)
+        set_committed_value(snapshot, "class_group", _detached_copy(user.class_group))
+        set_committed_value(snapshot, "subject", _detached_copy(user.subject))
+        self._entries.set(token, (generation, snapshot))
+
+    def token_version(self, db: Session, user_id: int) -> Optional[int]:
+        entry = self._versions.get(user_id)
+        if entry is not None and entry[0] == self.generation(user_id):
+            return entry[1]
+        generation = self.generation(user_id)
+        version = db.execute(select(User.token_version).where(User.id == user_id)).scalar_one_or_none()
+        if version is not None:
+            self._versions.set(user_id, (generation, version))
+        return version
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            if self._generations.get(user_id) is None and len(self._generations) >= self._generations.maxsize:
+                # Evicting a live generation would let the entries it invalidated match again.
+                self.clear()
+            self._generations.set(user_id, next(self._counter))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._versions.clear()
+        self._generations.clear()
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.principal_cache_size,
+    ttl=settings.principal_cache_ttl_seconds,
+)
+
+
+@event.listens_for(User, "before_update")
+def _revoke_tokens_on_scope_change(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in TOKEN_SCOPE_FIELDS):
+        target.token_version = (target.token_version or 0) + 1
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    principal_cache.invalidate_user(target.id)
@@ -0,0 +1,146 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import StudentAssignmentProgress, Submission, User
+
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def progress_upsert_statement(
+    dialect_name: str,
+    student_id: int,
+    assignment_id: int,
+    attempt_no: int,
+    score: int,
+    grade: int,
+    submitted_at: datetime,
+):
+    # Attempt numbers are dense, so the highest one seen is the attempt count. Comparing instead of
+    # incrementing keeps the row right when concurrent submits commit out of order.
+    progress = StudentAssignmentProgress
+    statement = _UPSERTS[dialect_name](progress).values(
+        student_id=student_id,
+        assignment_id=assignment_id,
+        attempts_used=attempt_no,
+        last_score=score,
+        last_grade=grade,
+        best_score=score,
+        best_grade=grade,
+        last_submitted_at=submitted_at,
+    )
+    excluded = statement.excluded
+    newer = excluded.attempts_used > progress.attempts_used
+    return statement.on_conflict_do_update(
+        index_elements=[progress.student_id, progress.assignment_id],
+        set_={
+            "attempts_used": case((newer, excluded.attempts_used), else_=progress.attempts_used),
+            "last_score": case((newer, excluded.last_score), else_=progress.last_score),
+            "last_grade": case((newer, excluded.last_grade), else_=progress.last_grade),
+            "last_submitted_at": case((newer, excluded.last_submitted_at), else_=progress.last_submitted_at),
+            "best_score": case(
+                (progress.best_score.is_(None) | (excluded.best_score > progress.best_score), excluded.best_score),
+                else_=progress.best_score,
+            ),
+            "best_grade": case(
+                (progress.best_grade.is_(None) | (excluded.best_grade > progress.best_grade), excluded.best_grade),
+                else_=progress.best_grade,
+            ),
+        },
+    )
+
+
+def bump_progress_versions(db: Session, student_ids) -> None:
+    # student_ids is a list or a select of ids; runs in the caller's transaction.
+    db.execute(
+        update(User)
+        .where(User.id.in_(student_ids))
+        .values(progress_version=User.progress_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_progress(
+    db: Session, student_id: int, assignment_id: int, attempt_no: int, score: int, grade: int, submitted_at: datetime
+) -> None:
+    # Runs in the caller's transaction, next to the submission insert.
+    dialect_name = db.get_bind().dialect.name
+    db.execute(
+        progress_upsert_statement(dialect_name, student_id, assignment_id, attempt_no, score, grade, submitted_at)
+    )
+    bump_progress_versions(db, [student_id])
+
+
+def clear_progress(db: Session, student_id: int, assignment_id: int) -> None:
+    db.execute(
+        delete(StudentAssignmentProgress).where(
+            StudentAssignmentProgress.student_id == student_id,
+            StudentAssignmentProgress.assignment_id == assignment_id,
+        )
+    )
+    bump_progress_versions(db, [student_id])
+
+
+def rebuild_progress(db: Session, assignment_id: Optional[int] = None) -> int:
+    # Recomputes the rows from submissions, for one assignment or for all of them; the caller commits.
+    partition = (Submission.student_id, Submission.assignment_id)
+    ranked = select(
+        Submission.student_id,
+        Submission.assignment_id,
+        func.count().over(partition_by=partition).label("attempts_used"),
+        Submission.score,
+        Submission.grade,
+        func.max(Submission.score).over(partition_by=partition).label("best_score"),
+        func.max(Submission.grade).over(partition_by=partition).label("best_grade"),
+        Submission.submitted_at,
+        func.row_number().over(partition_by=partition, order_by=Submission.attempt_no.desc()).label("rn"),
+    )
+    cleared = delete(StudentAssignmentProgress)
+    with_progress = select(StudentAssignmentProgress.student_id)
+    with_submissions = select(Submission.student_id)
+    if assignment_id is not None:
+        ranked = ranked.where(Submission.assignment_id == assignment_id)
+        cleared = cleared.where(StudentAssignmentProgress.assignment_id == assignment_id)
+        with_progress = with_progress.where(StudentAssignmentProgress.assignment_id == assignment_id)
+        with_submissions = with_submissions.where(Submission.assignment_id == assignment_id)
+    ranked = ranked.subquery()
+
+    db.flush()
+    bump_progress_versions(db, with_progress.union(with_submissions))
+    db.execute(cleared)
+    return db.execute(
+        insert(StudentAssignmentProgress).from_select(
+            [
+                "student_id",
+                "assignment_id",
+                "attempts_used",
+                "last_score",
+                "last_grade",
+                "best_score",
+                "best_grade",
+                "last_submitted_at",
+            ],
+            select(
+                ranked.c.student_id,
+                ranked.c.assignment_id,
+                ranked.c.attempts_used,
+                ranked.c.score,
+                ranked.c.grade,
+                ranked.c.best_score,
+                ranked.c.best_grade,
+                ranked.c.submitted_at,
+            ).where(ranked.c.rn == 1),
+        )
+    ).rowcount
+
+
+if __name__ == "__main__":
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        rebuilt = rebuild_progress(db)
+        db.commit()
+    print(f"Rebuilt progress for {rebuilt} student assignments")
@@ -0,0 +1,160 @@
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.models import ClassGroup, Subject, Topic
+
+settings = get_settings()
+
+CHANGED_TABLES_KEY = "reference_data_changed"
+
+
+@dataclass(frozen=True)
+class SubjectRef:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class ClassGroupRef:
+    id: int
+    grade: int
+    letter: str
+    name: str
+
+
+@dataclass(frozen=True)
+class TopicRef:
+    id: int
+    title: str
+    subject_id: int
+    class_group_id: int
+
+
+class ReferenceData:
+    # Subjects, class groups and topics change rarely, so they are served from memory. Entries are
+    # keyed by the table version; a committed write bumps the version and the next read reloads.
+    # The TTL bounds staleness for writes made by other processes; a lookup by key that misses the
+    # snapshot checks the database and drops the snapshot if the row exists.
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._entries = TTLCache(maxsize, ttl)
+        self._versions: Dict[str, int] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    def version(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        # Called with the table name after each invalidation, e.g. to drop responses built from it.
+        self._listeners.append(listener)
+
+    def invalidate(self, table: str) -> None:
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+        for listener in self._listeners:
+            listener(table)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _cached(self, table: str, key: Hashable, load: Callable):
+        # The version is read before loading, so a write committed meanwhile leaves this entry unused.
+        cache_key = (table, self.version(table), key)
+        value = self._entries.get(cache_key)
+        if value is None:
+            value = load()
+            self._entries.set(cache_key, value)
+        return value
+
+    def subjects(self, db: Session) -> Dict[str, SubjectRef]:
+        return self._cached(
+            Subject.__tablename__,
+            None,
+            lambda: {
+                row.name: SubjectRef(id=row.id, name=row.name)
+                for row in db.execute(select(Subject.id, Subject.name).order_by(Subject.id))
+            },
+        )
+
+    def subject_by_name(self, db: Session, name: str) -> Optional[SubjectRef]:
+        subject = self.subjects(db).get(name)
+        if subject is None:
+            row = db.execute(select(Subject.id, Subject.name).where(Subject.name == name)).first()
+            if row is not None:
+                self.invalidate(Subject.__tablename__)
+                subject = SubjectRef(id=row.id, name=row.name)
+        return subject
+
+    def class_group(self, db: Session, class_group_id: int) -> Optional[ClassGroupRef]:
+        columns = (ClassGroup.id, ClassGroup.grade, ClassGroup.letter, ClassGroup.name)
+        class_groups = self._cached(
+            ClassGroup.__tablename__,
+            None,
+            lambda: {
+                row.id: ClassGroupRef(id=row.id, grade=row.grade, letter=row.letter, name=row.name)
+                for row in db.execute(select(*columns))
+            },
+        )
+        class_group = class_groups.get(class_group_id)
+        if class_group is None:
+            row = db.execute(select(*columns).where(ClassGroup.id == class_group_id)).first()
+            if row is not None:
+                self.invalidate(ClassGroup.__tablename__)
+                class_group = ClassGroupRef(id=row.id, grade=row.grade, letter=row.letter, name=row.name)
+        return class_group
+
+    def topics(self, db: Session, class_group_id: int, subject_id: int) -> Tuple[TopicRef, ...]:
+        return self._cached(
+            Topic.__tablename__,
+            (class_group_id, subject_id),
+            lambda: tuple(
+                TopicRef(id=row.id, title=row.title, subject_id=row.subject_id, class_group_id=row.class_group_id)
+                for row in db.execute(
+                    select(Topic.id, Topic.title, Topic.subject_id, Topic.class_group_id)
+                    .where(Topic.class_group_id == class_group_id, Topic.subject_id == subject_id)
+                    .order_by(Topic.id)
+                )
+            ),
+        )
+
+
+reference_data = ReferenceData(
+    maxsize=settings.reference_cache_size,
+    ttl=settings.reference_cache_ttl_seconds,
+)
+
+
+@event.listens_for(Subject, "after_insert")
+@event.listens_for(Subject, "after_update")
+@event.listens_for(Subject, "after_delete")
+@event.listens_for(ClassGroup, "after_insert")
+@event.listens_for(ClassGroup, "after_update")
+@event.listens_for(ClassGroup, "after_delete")
+@event.listens_for(Topic, "after_insert")
+@event.listens_for(Topic, "after_update")
+@event.listens_for(Topic, "after_delete")
+def _mark_changed(mapper, connection, target) -> None:
+    # Published on commit: bumping at flush time would let a concurrent reader cache the old rows
+    # under the new version before the write is visible.
+    session = object_session(target)
+    if session is None:
+        reference_data.invalidate(mapper.local_table.name)
+        return
+    session.info.setdefault(CHANGED_TABLES_KEY, set()).add(mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session: Session) -> None:
+    for table in session.info.pop(CHANGED_TABLES_KEY, ()):
+        reference_data.invalidate(table)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(CHANGED_TABLES_KEY, None)
@@ -0,0 +1,205 @@
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import Assignment, RegradeJob, Submission
+from app.services.grading import GradingIncomplete, GradingPlan, check_answers, get_grading_plan
+from app.services.progress import bump_progress_versions, rebuild_progress
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+
+def correctness_matrix(plan: GradingPlan, answers: Sequence[Dict]) -> np.ndarray:
+    # Strict: an answer the pool could not check in time raises GradingIncomplete, because a
+    # regrade would otherwise overwrite a stored score with a guess.
+    deadline = time.monotonic() + settings.regrade_deadline_seconds
+    matrix = np.zeros((len(answers), len(plan.questions)), dtype=bool)
+    for column, question in enumerate(plan.questions):
+        if question.correct is None:
+            continue
+        matrix[:, column] = check_answers(
+            [(question, row.get(question.key)) for row in answers], deadline=deadline, strict=True
+        )
+    return matrix
+
+
+def grade_matrix(plan: GradingPlan, matrix: np.ndarray) -> tuple:
+    if not plan.total_points:
+        scores = np.zeros(len(matrix), dtype=np.int64)
+    else:
+        earned = matrix @ np.asarray(plan.points, dtype=np.int64)
+        # Same float arithmetic as grade_answers so both paths agree on the boundaries.
+        scores = (earned / plan.total_points * 100).astype(np.int64)
+    grades = np.select([scores >= 90, scores >= 75, scores >= 60], [5, 4, 3], default=2)
+    return scores, grades
+
+
+def start_regrade_job(db: Session, assignment_id: int) -> Tuple[RegradeJob, bool]:
+    # Returns the assignment's queued or running job, or a new one; True when it was created.
+    for _ in range(2):
+        now = datetime.utcnow()
+        active = db.execute(
+            select(RegradeJob).where(RegradeJob.assignment_id == assignment_id, RegradeJob.status.in_(ACTIVE))
+        ).scalar_one_or_none()
+        if active is not None:
+            if active.heartbeat_at > now - timedelta(seconds=settings.regrade_stale_seconds):
+                return active, False
+            # The process running it died; fail it unless its runner reported meanwhile.
+            db.execute(
+                update(RegradeJob)
+                .where(RegradeJob.id == active.id, RegradeJob.heartbeat_at == active.heartbeat_at)
+                .values(status=FAILED, error="Interrupted", finished_at=now)
+            )
+            db.commit()
+            continue
+        job = RegradeJob(
+            id=uuid.uuid4().hex,
+            assignment_id=assignment_id,
+            status=QUEUED,
+            total=0,
+            processed=0,
+            updated=0,
+            created_at=now,
+            heartbeat_at=now,
+        )
+        db.add(job)
+        try:
+            db.commit()
+            return job, True
+        except IntegrityError:
+            # A parallel request started one first.
+            db.rollback()
+    raise RuntimeError(f"Could not start a regrade job for assignment {assignment_id}")
+
+
+class RegradeJobLost(Exception):
+    # The job was failed as stale (or finished elsewhere) while this runner still worked on it.
+    pass
+
+
+_jobs = RegradeJob.__table__
+_submissions = Submission.__table__
+update_scores = (
+    update(_submissions)
+    .where(_submissions.c.id == bindparam("submission_id"))
+    .values(score=bindparam("new_score"), grade=bindparam("new_grade"))
+)
+
+
+@dataclass
+class JobLease:
+    # A runner owns its job while the row still carries the heartbeat the runner wrote last.
+    job_id: str
+    heartbeat_at: datetime
+
+    def renew(self, db: Session, expected: str = RUNNING, **values) -> None:
+        # Written in the caller's transaction; when the job is no longer ours the transaction,
+        # including the chunk it would have recorded, is rolled back.
+        now = datetime.utcnow()
+        result = db.execute(
+            update(_jobs)
+            .where(_jobs.c.id == self.job_id, _jobs.c.status == expected, _jobs.c.heartbeat_at == self.heartbeat_at)
+            .values(heartbeat_at=now, **values)
+        )
+        if result.rowcount != 1:
+            db.rollback()
+            raise RegradeJobLost(self.job_id)
+        self.heartbeat_at = now
+
+
+def _grade_rows(plan: GradingPlan, rows: Sequence) -> tuple:
+    answers = [row.answers or {} for row in rows]
+    try:
+        matrix = correctness_matrix(plan, answers)
+    except GradingIncomplete as exc:
+        # Usually a busy pool; a second miss fails the job and leaves the stored scores alone.
+        logger.warning("Regrade chunk could not be graded in time (%s), retrying", exc)
+        matrix = correctness_matrix(plan, answers)
+    return grade_matrix(plan, matrix)
+
+
+def regrade_assignment(db: Session, assignment_id: int, lease: JobLease, chunk_size: int) -> None:
+    assignment = db.get(Assignment, assignment_id)
+    if assignment is None:
+        raise LookupError("Assignment not found")
+    plan = get_grading_plan(assignment)
+    total = db.execute(
+        select(func.count(Submission.id)).where(Submission.assignment_id == assignment_id)
+    ).scalar_one()
+    lease.renew(db, total=total, processed=0, updated=0)
+    db.commit()
+
+    processed = updated = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Submission.id, Submission.student_id, Submission.answers, Submission.score, Submission.grade)
+            .where(Submission.assignment_id == assignment_id, Submission.id > last_id)
+            .order_by(Submission.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        scores, grades = _grade_rows(plan, rows)
+        changed = [
+            (row, int(score), int(grade))
+            for row, score, grade in zip(rows, scores, grades)
+            if row.score != score or row.grade != grade
+        ]
+        changes: List[dict] = [
+            {"submission_id": row.id, "new_score": score, "new_grade": grade} for row, score, grade in changed
+        ]
+        if changes:
+            db.execute(update_scores, changes)
+            bump_progress_versions(db, sorted({row.student_id for row, _, _ in changed}))
+        processed += len(rows)
+        updated += len(changes)
+        # Progress is committed together with the chunk it describes.
+        lease.renew(db, processed=processed, updated=updated)
+        db.commit()
+
+    if updated:
+        rebuild_progress(db, assignment_id)
+    lease.renew(db, status=DONE, finished_at=datetime.utcnow())
+    db.commit()
+
+
+def run_regrade_job(session_factory, job_id: str, chunk_size: Optional[int] = None) -> None:
+    with session_factory() as db:
+        job = db.get(RegradeJob, job_id)
+        if job is None:
+            return
+        lease = JobLease(job.id, job.heartbeat_at)
+        assignment_id = job.assignment_id
+        try:
+            lease.renew(db, expected=QUEUED, status=RUNNING)
+            db.commit()
+            regrade_assignment(db, assignment_id, lease, chunk_size or settings.regrade_chunk_size)
+        except RegradeJobLost:
+            logger.warning("Regrade job %s is no longer owned by this runner, stopping", job_id)
+        except Exception as exc:
+            logger.exception("Regrade job %s failed", job_id)
+            db.rollback()
+            try:
+                lease.renew(db, status=FAILED, error=str(exc), finished_at=datetime.utcnow())
+                db.commit()
+            except RegradeJobLost:
+                pass
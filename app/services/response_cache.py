@@ -0,0 +1,311 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.services.etags import body_etag, etag_headers, etag_matches, not_modified
+from app.services.reference_data import reference_data
+
+# Subjects, class groups and topic titles.
+REFERENCE_NAMESPACE = "reference"
+
+
+def theory_class_namespace(class_group_id: int, subject_id: int) -> str:
+    return f"theory:class:{class_group_id}:{subject_id}"
+
+
+def theory_topic_namespace(topic_id: int) -> str:
+    return f"theory:topic:{topic_id}"
+
+
+def theory_namespaces(theory) -> Tuple[str, ...]:
+    # Teachers list theory per class and subject, students per topic.
+    return theory_class_namespace(theory.class_group_id, theory.subject_id), theory_topic_namespace(theory.topic_id)
+
+
+def assignment_namespace(class_group_id: int, subject_id: int) -> str:
+    return f"assignments:{class_group_id}:{subject_id}"
+
+
+def catalog_key(
+    endpoint: str,
+    role: str,
+    class_id: Optional[int] = None,
+    subject_id: Optional[int] = None,
+    topic_id: Optional[int] = None,
+    *extra: Any,
+) -> str:
+    parts = [endpoint, role, class_id, subject_id, topic_id, *extra]
+    return ":".join("" if part is None else str(part) for part in parts)
+
+
+class ResponseCacheBackend(ABC):
+    # Backends doing network I/O are called from the threadpool by async routes.
+    blocking = False
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        ...
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryResponseCacheBackend(ResponseCacheBackend):
+    # Single-node only: a write made through another API process is seen once the TTL runs out.
+    def __init__(self, maxsize: int) -> None:
+        self._entries = TTLCache(maxsize)
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        # Version counters never expire: evicting one would make stale bodies reachable again.
+        values = []
+        for key in keys:
+            counter = self._counters.get(key)
+            values.append(self._entries.get(key) if counter is None else str(counter).encode())
+        return values
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries.set(key, value, ttl=ttl)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        with self._lock:
+            self._counters.clear()
+
+
+class RedisResponseCacheBackend(ResponseCacheBackend):
+    # Shared by every API process, so an invalidation is seen everywhere at once.
+    blocking = True
+
+    def __init__(self, client, prefix: str = "") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return self.client.mget([f"{self.prefix}{key}" for key in keys])
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(f"{self.prefix}{key}", value, ex=max(math.ceil(ttl), 1))
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(f"{self.prefix}{key}")
+
+
+class LocalRedisClient:
+    # In-memory stand-in for the subset of the redis-py client used by RedisResponseCacheBackend.
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str) -> Optional[bytes]:
+        item = self._data.get(name)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[name]
+            return None
+        return value
+
+    def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        with self._lock:
+            return [self._get(key) for key in keys]
+
+    def set(self, name: str, value: bytes, ex: Optional[int] = None) -> bool:
+        with self._lock:
+            self._data[name] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    def incr(self, name: str) -> int:
+        with self._lock:
+            value = int(self._get(name) or 0) + 1
+            self._data[name] = (None, str(value).encode())
+        return value
+
+    def flushdb(self) -> bool:
+        with self._lock:
+            self._data.clear()
+        return True
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    # Concurrent misses for the same key wait for the first caller instead of querying the database
+    # themselves. Only covers this process; other processes may still load the key once each.
+    def __init__(self) -> None:
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, load: Callable[[], bytes], wait_seconds: float) -> bytes:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if call.done.wait(wait_seconds):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # The first caller is stuck; don't hold this request hostage to it.
+            return load()
+        try:
+            call.result = load()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+_ADAPTERS: Dict[Any, TypeAdapter] = {}
+
+
+def _adapter(response_model) -> TypeAdapter:
+    adapter = _ADAPTERS.get(response_model)
+    if adapter is None:
+        adapter = _ADAPTERS[response_model] = TypeAdapter(response_model)
+    return adapter
+
+
+def render(response_model, data: Any) -> bytes:
+    # Same filtering and encoding the route's response_model would apply.
+    adapter = _adapter(response_model)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+class ResponseCache:
+    # Cached bodies are keyed by the current version of every namespace they depend on. Writes bump
+    # the versions after commit, so entries rendered from the old rows are never read again and age
+    # out through the TTL.
+    def __init__(self, backend: ResponseCacheBackend, ttl: float, wait_seconds: float) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.wait_seconds = wait_seconds
+        self._flights = SingleFlight()
+
+    def _versions(self, namespaces: Sequence[str]) -> str:
+        versions = self.backend.get_many([f"version:{namespace}" for namespace in namespaces])
+        return ",".join(str(int(version or 0)) for version in versions)
+
+    def _lookup(self, key: str, namespaces: Sequence[str]) -> Tuple[str, Optional[bytes]]:
+        key = f"response:{key}:{self._versions(namespaces)}"
+        return key, self.backend.get_many([key])[0]
+
+    def get_or_load(self, key: str, namespaces: Sequence[str], load: Callable[[], bytes]) -> Tuple[bytes, bool]:
+        key, body = self._lookup(key, namespaces)
+        if body is not None:
+            return body, True
+
+        def load_and_store() -> bytes:
+            value = load()
+            self.backend.set(key, value, self.ttl)
+            return value
+
+        return self._flights.do(key, load_and_store, self.wait_seconds), False
+
+    def respond(
+        self,
+        key: str,
+        namespaces: Sequence[str],
+        response_model,
+        load: Callable[[], Any],
+        if_none_match: Optional[str] = None,
+    ) -> Response:
+        body, hit = self.get_or_load(key, namespaces, lambda: render(response_model, load()))
+        return self._response(body, hit, if_none_match)
+
+    async def _backend_call(self, func, *args):
+        if self.backend.blocking:
+            return await run_in_threadpool(func, *args)
+        return func(*args)
+
+    async def respond_async(
+        self,
+        key: str,
+        namespaces: Sequence[str],
+        response_model,
+        load: Callable[[], Awaitable[Any]],
+        if_none_match: Optional[str] = None,
+    ) -> Response:
+        # Same entries and tags as respond(), for async routes. Concurrent misses are not coalesced:
+        # SingleFlight waits by blocking a thread.
+        cache_key, body = await self._backend_call(self._lookup, key, namespaces)
+        hit = body is not None
+        if not hit:
+            body = render(response_model, await load())
+            await self._backend_call(self.backend.set, cache_key, body, self.ttl)
+        return self._response(body, hit, if_none_match)
+
+    def _response(self, body: bytes, hit: bool, if_none_match: Optional[str]) -> Response:
+        # Hashing the body rather than the versions keeps tags valid across processes.
+        etag = body_etag(body)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        headers = {**etag_headers(etag), "X-Cache": "hit" if hit else "miss"}
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, *namespaces: str) -> None:
+        for namespace in dict.fromkeys(namespaces):
+            self.backend.incr(f"version:{namespace}")
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+@lru_cache
+def get_response_cache() -> ResponseCache:
+    settings = get_settings()
+    backend = settings.response_cache_backend
+    if backend == "memory":
+        backend = MemoryResponseCacheBackend(settings.response_cache_size)
+    elif backend == "redis-local":
+        backend = RedisResponseCacheBackend(LocalRedisClient(), settings.response_cache_prefix)
+    elif backend == "redis":
+        import redis
+
+        client = redis.Redis.from_url(settings.response_cache_redis_url)
+        backend = RedisResponseCacheBackend(client, settings.response_cache_prefix)
+    else:
+        raise RuntimeError(f"Unknown response cache backend: {settings.response_cache_backend}")
+    return ResponseCache(backend, settings.response_cache_ttl_seconds, settings.response_cache_wait_seconds)
+
+
+def invalidate_responses(*namespaces: str) -> None:
+    get_response_cache().invalidate(*namespaces)
+
+
+reference_data.add_listener(lambda table: invalidate_responses(REFERENCE_NAMESPACE))
@@ -0,0 +1,321 @@
+import os
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import BinaryIO, Iterator, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import Theory, TheoryDerivative
+
+
+def blob_key(sha256: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def put_file(self, key: str, source_path: str) -> None:
+        # Consumes source_path; an existing blob under the same key is kept and touched, so the
+        # garbage collector's grace period covers the upload that is about to reference it.
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        ...
+
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None
+
+    @abstractmethod
+    def open(self, key: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        ...
+
+    @abstractmethod
+    def modified_at(self, key: str) -> Optional[float]:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def delete_stale(self, key: str, grace_seconds: float) -> bool:
+        # A put_file that lands between the check and the delete is lost; backends that can
+        # re-check after detaching the blob override this.
+        modified_at = self.modified_at(key)
+        if modified_at is None or time.time() - modified_at < grace_seconds:
+            return False
+        self.delete(key)
+        return True
+
+    @abstractmethod
+    def keys(self) -> Iterator[str]:
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def iter_bytes(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = 1024 * 1024,
+    ) -> Iterator[bytes]:
+        stream = self.open(key, start, end)
+        remaining = None if end is None else end - start
+        try:
+            while remaining is None or remaining > 0:
+                chunk = stream.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            stream.close()
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def put_file(self, key: str, source_path: str) -> None:
+        path = self._path(key)
+        try:
+            # Touch before dropping the upload, so a blob released in between is written again.
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(source_path, path)
+            return
+        os.remove(source_path)
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return os.stat(self._path(key)).st_size
+        except FileNotFoundError:
+            return None
+
+    def modified_at(self, key: str) -> Optional[float]:
+        try:
+            return os.stat(self._path(key)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def open(self, key: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        stream = open(self._path(key), "rb")
+        if start:
+            stream.seek(start)
+        return stream
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_stale(self, key: str, grace_seconds: float) -> bool:
+        # The blob is moved aside before its age is checked: a put_file that touched it first is
+        # seen here and the blob is restored, one that comes later misses it and writes a new copy.
+        path = self._path(key)
+        detached = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex}")
+        try:
+            os.rename(path, detached)
+        except FileNotFoundError:
+            return False
+        if time.time() - os.stat(detached).st_mtime < grace_seconds:
+            os.replace(detached, path)
+            return False
+        os.remove(detached)
+        return True
+
+    def keys(self) -> Iterator[str]:
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            for filename in filenames:
+                relative = os.path.relpath(os.path.join(directory, filename), self.root)
+                parts = relative.split(os.sep)
+                if len(parts) == 3 and parts[2].startswith(parts[0] + parts[1]):
+                    yield "/".join(parts)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+
+class S3Storage(StorageBackend):
+    def __init__(self, client, bucket: str, prefix: str = "") -> None:
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def put_file(self, key: str, source_path: str) -> None:
+        object_key = self._object_key(key)
+        try:
+            # S3 only rewrites LastModified on an in-place copy that replaces metadata; a blob
+            # released before the copy is uploaded again.
+            self.client.copy_object(
+                Bucket=self.bucket,
+                Key=object_key,
+                CopySource={"Bucket": self.bucket, "Key": object_key},
+                MetadataDirective="REPLACE",
+            )
+        except Exception as exc:
+            if not _is_not_found(exc):
+                raise
+            self.client.upload_file(source_path, self.bucket, object_key)
+        finally:
+            os.remove(source_path)
+
+    def _head(self, key: str) -> Optional[dict]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as exc:
+            if _is_not_found(exc):
+                return None
+            raise
+
+    def size(self, key: str) -> Optional[int]:
+        head = self._head(key)
+        return None if head is None else head["ContentLength"]
+
+    def modified_at(self, key: str) -> Optional[float]:
+        head = self._head(key)
+        return None if head is None else head["LastModified"].timestamp()
+
+    def open(self, key: str, start: int = 0, end: Optional[int] = None) -> BinaryIO:
+        params = {"Bucket": self.bucket, "Key": self._object_key(key)}
+        if start or end is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        return self.client.get_object(**params)["Body"]
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def keys(self) -> Iterator[str]:
+        token = None
+        while True:
+            params = {"Bucket": self.bucket, "Prefix": self.prefix}
+            if token:
+                params["ContinuationToken"] = token
+            page = self.client.list_objects_v2(**params)
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.prefix):]
+            if not page.get("IsTruncated"):
+                return
+            token = page.get("NextContinuationToken")
+
+
+def _is_not_found(exc: Exception) -> bool:
+    if isinstance(exc, FileNotFoundError):
+        return True
+    error = getattr(exc, "response", {}).get("Error", {})
+    return error.get("Code") in ("404", "NoSuchKey", "NotFound")
+
+
+class LocalS3Client:
+    # Directory-backed stand-in for the subset of the boto3 S3 client used by S3Storage.
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def upload_file(self, filename: str, bucket: str, key: str) -> None:
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.part"
+        shutil.copyfile(filename, tmp_path)
+        os.replace(tmp_path, path)
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        stat = os.stat(self._path(Bucket, Key))
+        return {
+            "ContentLength": stat.st_size,
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        }
+
+    def copy_object(self, Bucket: str, Key: str, CopySource: dict, **kwargs) -> dict:
+        source = self._path(CopySource["Bucket"], CopySource["Key"])
+        path = self._path(Bucket, Key)
+        if source == path:
+            os.utime(path)
+        else:
+            shutil.copyfile(source, path)
+        return {}
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None) -> dict:
+        body = open(self._path(Bucket, Key), "rb")
+        if Range:
+            body.seek(int(Range.removeprefix("bytes=").split("-", 1)[0]))
+        return {"Body": body}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict:
+        try:
+            os.remove(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", ContinuationToken: Optional[str] = None) -> dict:
+        bucket_root = os.path.join(self.root, Bucket)
+        contents = []
+        for directory, _, filenames in os.walk(bucket_root):
+            for filename in filenames:
+                key = os.path.relpath(os.path.join(directory, filename), bucket_root).replace(os.sep, "/")
+                if key.startswith(Prefix) and not key.endswith(".part"):
+                    contents.append({"Key": key})
+        return {"Contents": sorted(contents, key=lambda item: item["Key"]), "IsTruncated": False}
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    settings = get_settings()
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.files_dir)
+    if settings.storage_backend == "s3-local":
+        return S3Storage(LocalS3Client(settings.s3_local_root), settings.s3_bucket, settings.s3_prefix)
+    if settings.storage_backend == "s3":
+        import boto3
+
+        client = boto3.client("s3", endpoint_url=settings.s3_endpoint_url or None)
+        return S3Storage(client, settings.s3_bucket, settings.s3_prefix)
+    raise RuntimeError(f"Unknown storage backend: {settings.storage_backend}")
+
+
+def blob_references(db: Session, key: str) -> int:
+    sources = select(func.count(Theory.id)).where(Theory.file_path == key).scalar_subquery()
+    derived = select(func.count(TheoryDerivative.id)).where(TheoryDerivative.blob_key == key).scalar_subquery()
+    return db.execute(select(sources + derived)).scalar_one()
+
+
+def release_blob(db: Session, storage: StorageBackend, key: str) -> bool:
+    # An upload stores (or touches) its blob before committing the row that references it, so a
+    # recently modified blob may belong to a request that is still in flight; blobs inside the
+    # grace period are left for collect_garbage.
+    if blob_references(db, key):
+        return False
+    return storage.delete_stale(key, get_settings().blob_grace_seconds)
+
+
+def collect_garbage(db: Session, storage: StorageBackend) -> int:
+    referenced = set(db.execute(select(Theory.file_path).where(Theory.file_sha256.is_not(None))).scalars())
+    referenced.update(db.execute(select(TheoryDerivative.blob_key)).scalars())
+    grace_seconds = get_settings().blob_grace_seconds
+    removed = 0
+    for key in list(storage.keys()):
+        if key not in referenced and storage.delete_stale(key, grace_seconds):
+            removed += 1
+    return removed
@@ -0,0 +1,178 @@
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlencode
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.signing import sign, verify
+from app.models import Theory
+from app.services.storage import blob_key
+
+
+@dataclass(frozen=True)
+class TheoryFile:
+    theory_id: int
+    key: str
+    sha256: Optional[str]
+    name: Optional[str]
+    size: Optional[int]
+    updated_at: Optional[datetime]
+
+    @property
+    def etag(self) -> Optional[str]:
+        return f'"{self.sha256}"' if self.sha256 else None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.sha256
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        if self.updated_at is None:
+            return None
+        return format_datetime(self.updated_at.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+    def is_not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        if if_none_match is not None:
+            if self.etag is None:
+                return False
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+        if if_modified_since and self.updated_at is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return self.updated_at.replace(tzinfo=timezone.utc, microsecond=0) <= since
+        return False
+
+
+settings = get_settings()
+
+
+def _link_secret() -> str:
+    return settings.files_link_secret or settings.secret_key
+
+
+def _link_message(theory_id: int, sha256: str, size: str, name: str, expires: int) -> str:
+    return f"{theory_id}:{sha256}:{size}:{expires}:{name}"
+
+
+def link_expiry(now: Optional[float] = None) -> int:
+    # Round up to a bucket so URLs stay identical (and cacheable) for a while.
+    now = time.time() if now is None else now
+    bucket = max(settings.files_url_bucket_seconds, 1)
+    return math.ceil((now + settings.files_url_ttl_seconds) / bucket) * bucket
+
+
+DERIVATIVE_KINDS = ("thumbnail", "optimized", "text")
+
+
+def _file_url(theory_id: int, sha256: str, name: str, size: Optional[int], kind: Optional[str]) -> str:
+    if not settings.files_signed_urls:
+        params = {"d": kind or "", "v": sha256}
+    else:
+        # The link carries everything needed to serve the blob, so verifying it needs no lookup.
+        expires = link_expiry()
+        size_param = "" if size is None else str(size)
+        params = {
+            "v": sha256,
+            "n": name,
+            "s": size_param,
+            "exp": expires,
+            "sig": sign(_link_message(theory_id, sha256, size_param, name, expires), _link_secret()),
+        }
+    query = urlencode({key: value for key, value in params.items() if value != ""})
+    return f"/files/{theory_id}?{query}" if query else f"/files/{theory_id}"
+
+
+def theory_file_url(theory: Theory, kind: Optional[str] = None) -> Optional[str]:
+    if not theory.file_path:
+        return None
+    if kind is None:
+        return _file_url(theory.id, theory.file_sha256 or "", theory.file_name or "", theory.file_size, None)
+    derivative = (theory.derivatives or {}).get(kind)
+    if derivative is None:
+        return None
+    return _file_url(theory.id, derivative["sha256"], derivative["name"], derivative.get("size"), kind)
+
+
+def theory_file_fields(theory: Theory) -> dict:
+    fields = {"file_url": theory_file_url(theory), "processing_status": theory.processing_status}
+    for kind in DERIVATIVE_KINDS:
+        fields[f"{kind}_url"] = theory_file_url(theory, kind)
+    return fields
+
+
+def verify_file_link(
+    theory_id: int, sha256: Optional[str], size: Optional[int], name: Optional[str], expires: int, signature: str
+) -> bool:
+    size_param = "" if size is None else str(size)
+    return verify(_link_message(theory_id, sha256 or "", size_param, name or "", expires), signature, _link_secret())
+
+
+def signed_theory_file(theory_id: int, sha256: str, size: Optional[int], name: Optional[str]) -> TheoryFile:
+    # Built from a verified link alone. Blobs are content-addressed, so the key follows from the
+    # hash; a link outlives a deleted theory or replaced file until it expires.
+    return TheoryFile(theory_id=theory_id, key=blob_key(sha256), sha256=sha256, name=name, size=size, updated_at=None)
+
+
+theory_file_cache = TTLCache(settings.file_meta_cache_size, ttl=settings.file_meta_cache_ttl_seconds)
+
+
+def _theory_files(db: Session, theory_id: int) -> Optional[dict]:
+    files = theory_file_cache.get(theory_id)
+    if files is None:
+        row = db.execute(
+            select(
+                Theory.file_path,
+                Theory.file_sha256,
+                Theory.file_name,
+                Theory.file_size,
+                Theory.updated_at,
+                Theory.derivatives,
+            ).where(Theory.id == theory_id)
+        ).first()
+        if row is None or not row.file_path:
+            return None
+        files = {
+            None: TheoryFile(
+                theory_id=theory_id,
+                key=row.file_path,
+                sha256=row.file_sha256,
+                name=row.file_name,
+                size=row.file_size,
+                updated_at=row.updated_at,
+            )
+        }
+        for derivative_kind, derivative in (row.derivatives or {}).items():
+            files[derivative_kind] = TheoryFile(
+                theory_id=theory_id,
+                key=blob_key(derivative["sha256"]),
+                sha256=derivative["sha256"],
+                name=derivative["name"],
+                size=derivative["size"],
+                updated_at=row.updated_at,
+            )
+        theory_file_cache.set(theory_id, files)
+    return files
+
+
+def load_theory_file(db: Session, theory_id: int, kind: Optional[str] = None) -> Optional[TheoryFile]:
+    files = _theory_files(db, theory_id)
+    return None if files is None else files.get(kind)
+
+
+@event.listens_for(Theory, "after_update")
+@event.listens_for(Theory, "after_delete")
+def _invalidate_theory_file(mapper, connection, target: Theory) -> None:
+    theory_file_cache.pop(target.id)
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.core.workers import WorkerPool
+from app.models import Theory, TheoryDerivative
+from app.services.derivatives import build_derivatives
+from app.services.response_cache import invalidate_responses, theory_namespaces
+from app.services.storage import StorageBackend, blob_key
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+derivative_workers = WorkerPool(
+    workers=settings.derivatives_workers,
+    max_pending=settings.derivatives_max_pending,
+)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        while chunk := source.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _download(storage: StorageBackend, key: str, path: str) -> None:
+    with open(path, "wb") as output:
+        for chunk in storage.iter_bytes(key):
+            output.write(chunk)
+
+
+def _store_outputs(storage: StorageBackend, outputs: dict) -> dict:
+    derivatives = {}
+    for kind, (path, name) in outputs.items():
+        sha256 = _file_sha256(path)
+        size = os.path.getsize(path)
+        storage.put_file(blob_key(sha256), path)
+        derivatives[kind] = {"sha256": sha256, "name": name, "size": size}
+    return derivatives
+
+
+def set_derivatives(theory: Theory, derivatives: Optional[dict]) -> None:
+    theory.derivatives = derivatives
+    theory.derivative_blobs = [
+        TheoryDerivative(kind=kind, blob_key=blob_key(derivative["sha256"]))
+        for kind, derivative in (derivatives or {}).items()
+    ]
+
+
+def _claim_source(session_factory, theory_id: int) -> Optional[tuple]:
+    # Returns the source blob to process, or None when there is nothing left to build.
+    with session_factory() as db:
+        theory = db.get(Theory, theory_id)
+        if theory is None or not theory.file_sha256:
+            return None
+        # Identical uploads share their derivatives.
+        existing = db.execute(
+            select(Theory.derivatives).where(
+                Theory.file_sha256 == theory.file_sha256,
+                Theory.processing_status == READY,
+                Theory.id != theory_id,
+            )
+        ).first()
+        if existing is not None:
+            set_derivatives(theory, existing.derivatives)
+            theory.processing_status = READY
+            db.commit()
+            invalidate_responses(*theory_namespaces(theory))
+            return None
+        return theory.file_path, theory.file_sha256, theory.file_name or "file"
+
+
+def _save_derivatives(
+    session_factory, theory_id: int, file_sha256: str, derivatives: Optional[dict], status: str
+) -> None:
+    with session_factory() as db:
+        theory = db.get(Theory, theory_id)
+        if theory is None or theory.file_sha256 != file_sha256:
+            return
+        set_derivatives(theory, derivatives)
+        theory.processing_status = status
+        db.commit()
+        invalidate_responses(*theory_namespaces(theory))
+
+
+async def process_theory_file(session_factory, storage: StorageBackend, theory_id: int) -> None:
+    # Database work runs in the threadpool: the sessions are synchronous.
+    source = await run_in_threadpool(_claim_source, session_factory, theory_id)
+    if source is None:
+        return
+    key, file_sha256, file_name = source
+
+    staging_dir = os.path.join(settings.files_dir, ".staging")
+    os.makedirs(staging_dir, exist_ok=True)
+    derivatives, status = None, FAILED
+    with tempfile.TemporaryDirectory(dir=staging_dir, prefix=".derivatives-") as workdir:
+        try:
+            source_path = storage.local_path(key)
+            if source_path is None:
+                source_path = os.path.join(workdir, "source")
+                await run_in_threadpool(_download, storage, key, source_path)
+            outputs = await derivative_workers.run(
+                build_derivatives,
+                source_path,
+                file_name,
+                workdir,
+                settings.derivative_image_max_px,
+                settings.derivative_thumbnail_px,
+                settings.derivative_jpeg_quality,
+                timeout=settings.derivatives_timeout_seconds,
+            )
+            derivatives = await run_in_threadpool(_store_outputs, storage, outputs)
+            status = READY
+        except asyncio.TimeoutError:
+            # The pool killed its workers, so a file that hangs the parser cannot hold one forever.
+            logger.warning("Building derivatives for theory %s timed out", theory_id)
+        except Exception:
+            logger.exception("Failed to build derivatives for theory %s", theory_id)
+
+    await run_in_threadpool(_save_derivatives, session_factory, theory_id, file_sha256, derivatives, status)
+
+
+def _pending_theory_ids(session_factory) -> list:
+    with session_factory() as db:
+        return db.execute(
+            select(Theory.id).where(Theory.file_sha256.is_not(None), Theory.processing_status.in_([PENDING, FAILED]))
+        ).scalars().all()
+
+
+async def process_pending(session_factory, storage: StorageBackend) -> int:
+    theory_ids = await run_in_threadpool(_pending_theory_ids, session_factory)
+    for theory_id in theory_ids:
+        await process_theory_file(session_factory, storage, theory_id)
+    return len(theory_ids)
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    from app.db.session import SessionLocal
+    from app.services.storage import get_storage
+
+    try:
+        processed = asyncio.run(process_pending(SessionLocal, get_storage()))
+    finally:
+        derivative_workers.shutdown()
+    print(f"Processed {processed} theory files")
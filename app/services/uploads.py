@@ -0,0 +1,164 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from app.services.storage import StorageBackend, blob_key
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(f"Upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    key: str
+    filename: str
+    size: int
+    sha256: str
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _MultipartReader:
+    # Collects small form fields in memory and hands file bytes to the caller as they arrive.
+
+    def __init__(self, file_field: str, max_bytes: int, max_field_bytes: int) -> None:
+        self.file_field = file_field
+        self.max_bytes = max_bytes
+        self.max_field_bytes = max_field_bytes
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.pending: list = []
+        self.pending_bytes = 0
+        self._field_bytes = 0
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name = ""
+        self._is_file = False
+        self._value = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in options:
+            if self._name != self.file_field or self.filename is not None:
+                raise InvalidUpload("Unexpected file field")
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self._is_file = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._is_file:
+            self.size += end - start
+            if self.size > self.max_bytes:
+                raise UploadTooLarge(self.max_bytes)
+            chunk = data[start:end]
+            self.digest.update(chunk)
+            self.pending.append(chunk)
+            self.pending_bytes += len(chunk)
+            return
+        self._field_bytes += end - start
+        if self._field_bytes > self.max_field_bytes:
+            raise InvalidUpload("Form fields too large")
+        self._value += data[start:end]
+
+    def on_part_end(self) -> None:
+        if not self._is_file:
+            try:
+                self.fields[self._name] = self._value.decode("utf-8")
+            except UnicodeDecodeError as exc:
+                raise InvalidUpload("Form fields must be UTF-8") from exc
+
+    def take_pending(self) -> list:
+        pending = self.pending
+        self.pending, self.pending_bytes = [], 0
+        return pending
+
+
+async def save_multipart_upload(
+    stream: AsyncIterator[bytes],
+    content_type: str,
+    storage: StorageBackend,
+    staging_dir: str,
+    file_field: str,
+    max_bytes: int,
+    chunk_size: int,
+    max_field_bytes: int = 64 * 1024,
+) -> Tuple[Dict[str, str], Optional[StoredUpload]]:
+    # Parses the request body as it arrives: the file goes straight to one staging file (which
+    # the storage backend then moves or uploads) and the parse stops as soon as it passes
+    # max_bytes, whether or not the client sent Content-Length.
+    _, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise InvalidUpload("Missing multipart boundary")
+    reader = _MultipartReader(file_field, max_bytes, max_field_bytes)
+    parser = MultipartParser(boundary, reader.callbacks())
+
+    os.makedirs(staging_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=staging_dir, prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as output:
+            async for data in stream:
+                try:
+                    parser.write(data)
+                except MultipartParseError as exc:
+                    raise InvalidUpload("Malformed multipart body") from exc
+                if reader.pending_bytes >= chunk_size:
+                    await run_in_threadpool(output.writelines, reader.take_pending())
+            parser.finalize()
+            await run_in_threadpool(output.writelines, reader.take_pending())
+        if reader.filename is None:
+            _remove_quietly(tmp_path)
+            return reader.fields, None
+        key = blob_key(reader.digest.hexdigest())
+        await run_in_threadpool(storage.put_file, key, tmp_path)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+    filename = os.path.basename(reader.filename) or "upload"
+    return reader.fields, StoredUpload(key=key, filename=filename, size=reader.size, sha256=reader.digest.hexdigest())
@@ -1,14 +1,24 @@
 import os
+import sys
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
 from app.db.base import Base
 from app.api.deps import get_db
 from app.core.security import hash_password
-from app.models import User, UserRole, ClassGroup, Subject
+from app.models import User, UserRole, ClassGroup, Subject, Topic, Assignment, AssignmentType
+from app.services.auth import build_user_access_token
+from app.services.grading import grading_plan_cache
+from app.services.idempotency import get_idempotency_store
+from app.services.principal_cache import principal_cache
+from app.services.reference_data import reference_data
+from app.services.response_cache import get_response_cache
+from app.services.storage import get_storage
+from app.services.theory_files import theory_file_cache
 
 
 @pytest.fixture(scope="session")
@@ -23,6 +33,47 @@ def db_engine(tmp_path_factory):
     Base.metadata.drop_all(engine)
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    principal_cache.clear()
+    reference_data.clear()
+    theory_file_cache.clear()
+    grading_plan_cache.clear()
+    get_idempotency_store.cache_clear()
+    get_response_cache.cache_clear()
+
+
+@pytest.fixture()
+def override_settings(monkeypatch):
+    def apply(**values):
+        instances = {id(get_settings()): get_settings()}
+        for name, module in list(sys.modules.items()):
+            if name.startswith("app.") and isinstance(getattr(module, "settings", None), Settings):
+                instances[id(module.settings)] = module.settings
+        for instance in instances.values():
+            for key, value in values.items():
+                monkeypatch.setattr(instance, key, value)
+
+    return apply
+
+
+@pytest.fixture()
+def files_dir(tmp_path, override_settings):
+    directory = tmp_path / "uploads"
+    override_settings(files_dir=str(directory))
+    get_storage.cache_clear()
+    yield directory
+    get_storage.cache_clear()
+
+
+@pytest.fixture(params=["local", "s3-local"])
+def storage(request, tmp_path, files_dir, override_settings):
+    override_settings(storage_backend=request.param, s3_local_root=str(tmp_path / "s3"))
+    get_storage.cache_clear()
+    return get_storage()
+
+
 @pytest.fixture()
 def db_session(db_engine):
     session_local = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
@@ -31,6 +82,21 @@ def db_session(db_engine):
         yield db
     finally:
         db.close()
+        with db_engine.begin() as connection:
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
+
+
+@pytest.fixture()
+def query_counter(db_engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(db_engine, "before_cursor_execute", before_cursor_execute)
 
 
 @pytest.fixture()
@@ -73,3 +139,58 @@ def seed_data(db_session):
     db_session.add_all([teacher, student])
     db_session.commit()
     return {"teacher": teacher, "student": student}
+
+
+@pytest.fixture()
+def topic(db_session, seed_data) -> Topic:
+    topic = Topic(
+        title="Дроби",
+        subject_id=seed_data["teacher"].subject_id,
+        class_group_id=seed_data["student"].class_group_id,
+    )
+    db_session.add(topic)
+    db_session.commit()
+    return topic
+
+
+@pytest.fixture()
+def make_assignment(db_session, seed_data):
+    def factory(questions=None, topic=None, **fields) -> Assignment:
+        student = seed_data["student"]
+        teacher = seed_data["teacher"]
+        if topic is None:
+            topic = Topic(title="Дроби", subject_id=teacher.subject_id, class_group_id=student.class_group_id)
+            db_session.add(topic)
+            db_session.flush()
+        values = {
+            "class_group_id": student.class_group_id,
+            "subject_id": teacher.subject_id,
+            "topic_id": topic.id,
+            "type": AssignmentType.practice,
+            "title": "ПР №1",
+            "max_attempts": 3,
+            "published": True,
+            "questions": questions or [],
+        }
+        values.update(fields)
+        assignment = Assignment(**values)
+        db_session.add(assignment)
+        db_session.commit()
+        return assignment
+
+    return factory
+
+
+def auth_headers(user: User) -> dict:
+    token = build_user_access_token(user, expires_minutes=30)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture()
+def teacher_headers(seed_data):
+    return auth_headers(seed_data["teacher"])
+
+
+@pytest.fixture()
+def student_headers(seed_data):
+    return auth_headers(seed_data["student"])
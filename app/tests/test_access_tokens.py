@@ -0,0 +1,59 @@
+from fastapi import status
+from jose import jwt
+
+from app.core.config import get_settings
+from app.services.auth import build_access_token
+
+
+def user_queries(statements) -> list:
+    return [statement for statement in statements if "FROM users" in statement]
+
+
+def test_login_token_carries_scope_claims(client, seed_data):
+    student = seed_data["student"]
+    response = client.post("/auth/login", json={"phone": student.phone, "password": "student123"})
+    settings = get_settings()
+    claims = jwt.decode(response.json()["access_token"], settings.secret_key, algorithms=[settings.algorithm])
+
+    assert claims["uid"] == student.id
+    assert claims["cid"] == student.class_group_id
+    assert claims["sid"] is None
+    assert claims["ver"] == 0
+
+
+def test_student_reads_skip_auth_queries(client, seed_data, student_headers, query_counter):
+    client.get("/student/subjects", headers=student_headers)
+
+    query_counter.clear()
+    response = client.get("/student/subjects", headers=student_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert user_queries(query_counter) == []
+
+
+def test_set_password_revokes_issued_tokens(client, seed_data, student_headers):
+    assert client.get("/student/subjects", headers=student_headers).status_code == status.HTTP_200_OK
+
+    client.post(
+        "/auth/set-password",
+        json={"phone": seed_data["student"].phone, "new_password": "new-secret"},
+    )
+
+    assert client.get("/student/subjects", headers=student_headers).status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.get("/me", headers=student_headers).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_class_change_revokes_issued_tokens(client, db_session, seed_data, student_headers):
+    assert client.get("/student/subjects", headers=student_headers).status_code == status.HTTP_200_OK
+
+    seed_data["student"].class_group_id = None
+    db_session.commit()
+
+    assert client.get("/student/subjects", headers=student_headers).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_legacy_token_without_claims_still_works(client, seed_data):
+    student = seed_data["student"]
+    token = build_access_token(phone=student.phone, role=student.role.value, expires_minutes=5)
+
+    response = client.get("/student/subjects", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_200_OK
@@ -1,3 +1,4 @@
+import pytest
 from fastapi import status
 
 
@@ -29,3 +30,46 @@ def test_login_student(client, seed_data):
     data = response.json()
     assert data["role"] == "student"
     assert data["user"]["phone"] == seed_data["student"].phone
+
+
+def test_set_password_then_login(client, seed_data):
+    response = client.post(
+        "/auth/set-password",
+        json={"phone": seed_data["student"].phone, "new_password": "new-secret"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.post(
+        "/auth/login",
+        json={"phone": seed_data["student"].phone, "password": "new-secret"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.post(
+        "/auth/login",
+        json={"phone": seed_data["student"].phone, "password": "student123"},
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_login_returns_503_when_hasher_is_saturated(client, seed_data, monkeypatch):
+    from app.core.security import password_hasher
+
+    monkeypatch.setattr(password_hasher, "max_pending", 0)
+    response = client.post(
+        "/auth/login",
+        json={"phone": seed_data["student"].phone, "password": "student123"},
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_login_does_not_hold_a_threadpool_thread_during_bcrypt(client, seed_data, monkeypatch):
+    from app.core.security import password_hasher
+
+    monkeypatch.setattr(password_hasher, "call", lambda *args, **kwargs: pytest.fail("blocking hasher call"))
+    response = client.post(
+        "/auth/login",
+        json={"phone": seed_data["student"].phone, "password": "student123"},
+    )
+    assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,155 @@
+from fastapi import status
+from sqlalchemy import update
+
+from app.models import Submission
+from app.services.etags import etag_matches
+
+QUESTIONS = [{"type": "select", "prompt": "2 + 2", "points": 1, "correct_answer": "4"}]
+
+
+def get(client, path, params, headers, etag=None):
+    if etag is not None:
+        headers = {**headers, "If-None-Match": etag}
+    return client.get(path, params=params, headers=headers)
+
+
+def test_etag_matching():
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('W/"x", W/"abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
+    assert not etag_matches('W/"abcd"', 'W/"abc"')
+
+
+def test_unchanged_assignments_poll_is_not_modified(
+    client, make_assignment, student_headers, seed_data, teacher_headers, query_counter
+):
+    assignment = make_assignment(questions=QUESTIONS)
+    params = {"subject": "Математика", "type": "practice", "topic_id": assignment.topic_id}
+    first = get(client, "/student/assignments", params, student_headers)
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    query_counter.clear()
+    polled = get(client, "/student/assignments", params, student_headers, etag)
+    assert polled.status_code == status.HTTP_304_NOT_MODIFIED
+    assert polled.content == b""
+    assert polled.headers["ETag"] == etag
+    assert len([statement for statement in query_counter if "FROM assignments" in statement]) == 1
+
+    client.post(f"/student/assignments/{assignment.id}/submit", json={"answers": {"q1": "4"}}, headers=student_headers)
+    submitted = get(client, "/student/assignments", params, student_headers, etag)
+    assert submitted.status_code == status.HTTP_200_OK
+    assert submitted.json()[0]["attempts_used"] == 1
+    assert submitted.headers["ETag"] != etag
+
+    client.post(
+        "/teacher/attempts/reset",
+        json={"student_id": seed_data["student"].id, "assignment_id": assignment.id},
+        headers=teacher_headers,
+    )
+    reset = get(client, "/student/assignments", params, student_headers, submitted.headers["ETag"])
+    assert reset.status_code == status.HTTP_200_OK
+    assert reset.json()[0]["attempts_used"] == 0
+    assert reset.headers["ETag"] not in (etag, submitted.headers["ETag"])
+
+    client.patch(f"/teacher/assignments/{assignment.id}", json={"title": "ПР №2"}, headers=teacher_headers)
+    renamed = get(client, "/student/assignments", params, student_headers, etag)
+    assert renamed.status_code == status.HTTP_200_OK
+    assert renamed.json()[0]["title"] == "ПР №2"
+
+
+def test_unchanged_grades_poll_is_not_modified(client, make_assignment, student_headers):
+    assignment = make_assignment(questions=QUESTIONS)
+    submit = f"/student/assignments/{assignment.id}/submit"
+    client.post(submit, json={"answers": {"q1": "4"}}, headers=student_headers)
+    params = {"subject": "Математика"}
+    etag = get(client, "/student/grades", params, student_headers).headers["ETag"]
+
+    assert get(client, "/student/grades", params, student_headers, etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    client.post(submit, json={"answers": {"q1": "5"}}, headers=student_headers)
+    changed = get(client, "/student/grades", params, student_headers, etag)
+    assert changed.status_code == status.HTTP_200_OK
+    assert len(changed.json()["items"]) == 2
+
+
+def test_regrade_that_keeps_the_grade_total_changes_the_etag(
+    client, db_session, make_assignment, student_headers, teacher_headers
+):
+    right = make_assignment(questions=QUESTIONS)
+    wrong = make_assignment(questions=QUESTIONS, topic=right.topic, title="ПР №2")
+    for assignment, answer in ((right, "4"), (wrong, "5")):
+        client.post(
+            f"/student/assignments/{assignment.id}/submit", json={"answers": {"q1": answer}}, headers=student_headers
+        )
+    # Stale grades with the same total as the correct ones (5 + 2).
+    for assignment, grade in ((right, 2), (wrong, 5)):
+        db_session.execute(update(Submission).where(Submission.assignment_id == assignment.id).values(grade=grade))
+    db_session.commit()
+    params = {"subject": "Математика"}
+    etag = get(client, "/student/grades", params, student_headers).headers["ETag"]
+
+    for assignment in (right, wrong):
+        client.post(f"/teacher/assignments/{assignment.id}/regrade", headers=teacher_headers)
+
+    regraded = get(client, "/student/grades", params, student_headers, etag)
+    assert regraded.status_code == status.HTTP_200_OK
+    assert sorted(item["grade"] for item in regraded.json()["items"]) == [2, 5]
+
+
+def test_catalog_lists_are_not_modified_until_written(client, topic, teacher_headers, student_headers):
+    params = {"class_id": topic.class_group_id, "subject": "Математика"}
+    etag = get(client, "/teacher/theory", params, teacher_headers).headers["ETag"]
+    topics_etag = get(client, "/student/topics", {"subject": "Математика"}, student_headers).headers["ETag"]
+
+    assert get(client, "/teacher/theory", params, teacher_headers, etag).status_code == status.HTTP_304_NOT_MODIFIED
+    polled = get(client, "/student/topics", {"subject": "Математика"}, student_headers, topics_etag)
+    assert polled.status_code == status.HTTP_304_NOT_MODIFIED
+
+    client.post(
+        "/teacher/theory",
+        json={**params, "topic_id": topic.id, "kind": "text", "text": "Дроби"},
+        headers=teacher_headers,
+    )
+    changed = get(client, "/teacher/theory", params, teacher_headers, etag)
+    assert changed.status_code == status.HTTP_200_OK
+    assert [item["text"] for item in changed.json()] == ["Дроби"]
+
+
+def test_teacher_grade_lists_are_not_modified_until_submissions_change(
+    client, db_session, make_assignment, student_headers, teacher_headers, seed_data
+):
+    assignment = make_assignment(questions=QUESTIONS)
+    submit = f"/student/assignments/{assignment.id}/submit"
+    client.post(submit, json={"answers": {"q1": "4"}}, headers=student_headers)
+    class_id = seed_data["student"].class_group_id
+    lists = [
+        ("/teacher/submissions", {"assignment_id": assignment.id}),
+        ("/teacher/grades/summary", {"class_id": class_id, "subject": "Математика"}),
+        (
+            "/teacher/grades/by-topic",
+            {"class_id": class_id, "subject": "Математика", "topic_id": assignment.topic_id, "type": "practice"},
+        ),
+    ]
+    etags = {}
+    for path, params in lists:
+        first = get(client, path, params, teacher_headers)
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        etags[path] = first.headers["ETag"]
+        assert get(client, path, params, teacher_headers, etags[path]).status_code == status.HTTP_304_NOT_MODIFIED
+
+    # A regrade rewrites grades in place: no rows are added.
+    db_session.execute(update(Submission).where(Submission.assignment_id == assignment.id).values(grade=2))
+    db_session.commit()
+    client.post(f"/teacher/assignments/{assignment.id}/regrade", headers=teacher_headers)
+    for path, params in lists:
+        regraded = get(client, path, params, teacher_headers, etags[path])
+        assert regraded.status_code == status.HTTP_200_OK
+        etags[path] = regraded.headers["ETag"]
+
+    client.post(submit, json={"answers": {"q1": "5"}}, headers=student_headers)
+    for path, params in lists:
+        assert get(client, path, params, teacher_headers, etags[path]).status_code == status.HTTP_200_OK
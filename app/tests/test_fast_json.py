@@ -0,0 +1,57 @@
+import enum
+from datetime import datetime
+
+from fastapi import status
+
+from app.core.responses import FastJSONResponse
+from app.schemas.assignment import SubmissionList
+from app.schemas.student import GradesResponse, SubjectOut
+from app.schemas.teacher import GradeByTopicResponse, GradeSummaryResponse
+
+QUESTIONS = [{"type": "select", "prompt": "2 + 2", "points": 1, "correct_answer": "4"}]
+
+
+class Color(str, enum.Enum):
+    red = "red"
+
+
+def test_render_handles_models_and_native_types():
+    body = FastJSONResponse(
+        {"subject": SubjectOut(name="Математика"), "at": datetime(2024, 1, 2, 3, 4, 5), "color": Color.red, 1: None}
+    ).body
+
+    assert body.decode() == '{"subject":{"name":"Математика"},"at":"2024-01-02T03:04:05","color":"red","1":null}'
+
+
+def test_hot_routes_match_their_response_models(
+    client, make_assignment, seed_data, student_headers, teacher_headers
+):
+    assignment = make_assignment(questions=QUESTIONS)
+    for answer in ("4", "5"):
+        client.post(
+            f"/student/assignments/{assignment.id}/submit", json={"answers": {"q1": answer}}, headers=student_headers
+        )
+    teacher_params = {
+        "class_id": assignment.class_group_id,
+        "subject": "Математика",
+        "topic_id": assignment.topic_id,
+        "type": "practice",
+    }
+    requests = [
+        ("/teacher/submissions", {"assignment_id": assignment.id}, teacher_headers, SubmissionList),
+        ("/teacher/grades/by-topic", teacher_params, teacher_headers, GradeByTopicResponse),
+        ("/teacher/grades/summary", teacher_params, teacher_headers, GradeSummaryResponse),
+        ("/student/grades", {"subject": "Математика"}, student_headers, GradesResponse),
+    ]
+    for path, params, headers, response_model in requests:
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == status.HTTP_200_OK, path
+        assert response.headers["content-type"] == "application/json", path
+        payload = response.json()
+        assert response_model.model_validate(payload).model_dump(mode="json") == payload, path
+
+    submissions = client.get("/teacher/submissions", params={"assignment_id": assignment.id}, headers=teacher_headers)
+    assert [item["answers"] for item in submissions.json()["items"]] == [{"q1": "5"}, {"q1": "4"}]
+    assert client.get("/student/grades", params={"subject": "Математика"}, headers=student_headers).json()[
+        "avg_grade"
+    ] == 3.5
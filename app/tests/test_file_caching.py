@@ -0,0 +1,110 @@
+import hashlib
+
+from fastapi import status
+
+from app.models import Theory, Topic
+from app.services.storage import S3Storage
+
+CONTENT = bytes(range(256)) * 64
+
+
+def upload_theory(client, headers, topic: Topic, content: bytes = CONTENT) -> dict:
+    response = client.post(
+        "/teacher/theory",
+        data={"class_id": topic.class_group_id, "subject": "Математика", "topic_id": topic.id, "kind": "file"},
+        files={"file": ("lecture.pdf", content, "application/pdf")},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_file_url_is_versioned_and_immutable(client, storage, topic, teacher_headers, override_settings):
+    override_settings(files_signed_urls=False, files_require_signature=False)
+    theory = upload_theory(client, teacher_headers, topic)
+    sha = hashlib.sha256(CONTENT).hexdigest()
+
+    assert theory["file_url"] == f"/files/{theory['id']}?v={sha}"
+    response = client.get(theory["file_url"])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == CONTENT
+    assert response.headers["etag"] == f'"{sha}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    unversioned = client.get(f"/files/{theory['id']}")
+    assert unversioned.headers["cache-control"] == "no-cache"
+    assert client.get(f"/files/{theory['id']}?v=stale").headers["cache-control"] == "no-cache"
+
+
+def test_conditional_get_returns_304_without_queries(
+    client, storage, topic, teacher_headers, query_counter, override_settings
+):
+    override_settings(files_require_signature=False)
+    theory = upload_theory(client, teacher_headers, topic)
+    url = f"/files/{theory['id']}"
+    first = client.get(url)
+    query_counter.clear()
+
+    response = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["etag"] == first.headers["etag"]
+    assert query_counter == []
+
+    modified = client.get(url, headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == status.HTTP_200_OK
+
+
+def test_single_range_request(client, storage, topic, teacher_headers):
+    theory = upload_theory(client, teacher_headers, topic)
+
+    response = client.get(theory["file_url"], headers={"Range": "bytes=100-199"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == CONTENT[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+
+    suffix = client.get(theory["file_url"], headers={"Range": "bytes=-10"})
+    assert suffix.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert suffix.content == CONTENT[-10:]
+
+    stale = client.get(theory["file_url"], headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert stale.status_code == status.HTTP_200_OK
+    assert stale.content == CONTENT
+
+    outside = client.get(theory["file_url"], headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert outside.status_code == status.HTTP_416_RANGE_NOT_SATISFIABLE
+    assert outside.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_multi_range_request(client, storage, topic, teacher_headers):
+    theory = upload_theory(client, teacher_headers, topic)
+
+    response = client.get(theory["file_url"], headers={"Range": "bytes=0-9,1000-1009"})
+
+    if isinstance(storage, S3Storage):
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == CONTENT
+    else:
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response.headers["content-type"].startswith("multipart/byteranges")
+        assert CONTENT[0:10] in response.content
+        assert CONTENT[1000:1010] in response.content
+
+
+def test_metadata_cache_is_invalidated_on_update(
+    client, db_session, storage, topic, teacher_headers, override_settings
+):
+    override_settings(files_require_signature=False)
+    theory = upload_theory(client, teacher_headers, topic)
+    etag = client.get(theory["file_url"]).headers["etag"]
+
+    other = b"%PDF-1.4 replacement"
+    row = db_session.get(Theory, theory["id"])
+    row.file_sha256 = hashlib.sha256(other).hexdigest()
+    db_session.commit()
+
+    response = client.get(f"/files/{theory['id']}", headers={"If-None-Match": etag})
+    assert response.status_code != status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == f'"{hashlib.sha256(other).hexdigest()}"'
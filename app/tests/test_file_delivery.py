@@ -0,0 +1,103 @@
+import hashlib
+import os
+import time
+from urllib.parse import parse_qs, quote, urlsplit
+
+import pytest
+from fastapi import status
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.core.signing import nginx_secure_link
+from app.models import Topic
+from app.services.storage import S3Storage, blob_key
+
+CONTENT = b"%PDF-1.4 " + b"x" * 4096
+KEY = blob_key(hashlib.sha256(CONTENT).hexdigest())
+
+
+def upload_theory(client, headers, topic: Topic) -> dict:
+    response = client.post(
+        "/teacher/theory",
+        data={"class_id": topic.class_group_id, "subject": "Математика", "topic_id": topic.id, "kind": "file"},
+        files={"file": ("Конспект.pdf", CONTENT, "application/pdf")},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_direct_delivery_streams_from_app(client, storage, topic, teacher_headers):
+    theory = upload_theory(client, teacher_headers, topic)
+
+    response = client.get(theory["file_url"])
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == CONTENT
+    assert "x-accel-redirect" not in response.headers
+
+
+def test_x_accel_redirect_delivery(client, storage, topic, teacher_headers, override_settings):
+    override_settings(file_delivery="x-accel", files_internal_prefix="/protected-files/")
+    theory = upload_theory(client, teacher_headers, topic)
+
+    response = client.get(theory["file_url"])
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b""
+    assert response.headers["x-accel-redirect"] == f"/protected-files/{KEY}"
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["content-disposition"] == f"attachment; filename*=utf-8''{quote('Конспект.pdf')}"
+    assert response.headers["etag"] == f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+
+    revalidated = client.get(theory["file_url"], headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+    assert "x-accel-redirect" not in revalidated.headers
+
+
+def test_x_sendfile_delivery(client, storage, topic, teacher_headers, override_settings, files_dir):
+    override_settings(file_delivery="x-sendfile")
+    theory = upload_theory(client, teacher_headers, topic)
+
+    response = client.get(theory["file_url"])
+
+    assert response.status_code == status.HTTP_200_OK
+    if isinstance(storage, S3Storage):
+        assert "x-sendfile" not in response.headers
+        assert response.content == CONTENT
+    else:
+        assert response.content == b""
+        assert response.headers["x-sendfile"] == os.path.abspath(files_dir / KEY)
+        assert os.path.exists(response.headers["x-sendfile"])
+
+
+def test_signed_redirect_delivery(client, storage, topic, teacher_headers, override_settings):
+    override_settings(
+        file_delivery="redirect",
+        files_static_base_url="https://static.example.com/theory",
+        files_link_secret="static-secret",
+        files_link_ttl_seconds=120,
+    )
+    theory = upload_theory(client, teacher_headers, topic)
+
+    response = client.get(theory["file_url"], follow_redirects=False)
+
+    assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+    assert response.headers["cache-control"] == "no-store"
+    location = urlsplit(response.headers["location"])
+    assert f"{location.scheme}://{location.netloc}{location.path}" == f"https://static.example.com/theory/{KEY}"
+    query = parse_qs(location.query)
+    expires = int(query["expires"][0])
+    assert time.time() < expires <= time.time() + 120
+    assert query["md5"][0] == nginx_secure_link(location.path, expires, "static-secret")
+
+
+def test_redirect_delivery_requires_static_base_url():
+    with pytest.raises(ValidationError, match="FILES_STATIC_BASE_URL"):
+        Settings(file_delivery="redirect", files_static_base_url="")
+    assert Settings(file_delivery="redirect", files_static_base_url="https://static.example.com").file_delivery == "redirect"
+
+
+def test_misspelled_delivery_mode_fails_at_startup():
+    with pytest.raises(ValidationError, match="file_delivery"):
+        Settings(file_delivery="x-acel")
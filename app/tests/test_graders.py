@@ -0,0 +1,157 @@
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import status
+
+from app.services.grading import check_answers, compile_grading_plan, grade_answers, grading_pool
+from app.services.regrade import correctness_matrix
+
+QUESTIONS = [
+    {"type": "numeric", "prompt": "π", "points": 1, "correct_answer": "3.14", "tolerance": 0.01},
+    {"type": "math", "prompt": "(x + 1)^2", "points": 1, "correct_answer": "(x + 1)^2"},
+    {"type": "regex", "prompt": "Год", "points": 1, "correct_answer": r"\d{4}( год)?"},
+    {"type": "fuzzy", "prompt": "Автор", "points": 1, "correct_answer": "Лев Толстой"},
+]
+
+
+def check(question: dict, answer) -> bool:
+    plan = compile_grading_plan([question])
+    return check_answers([(plan.questions[0], answer)])[0]
+
+
+@pytest.mark.parametrize(
+    "index, answer, expected",
+    [
+        (0, "3,141", True),
+        (0, 3.15, True),
+        (0, "3.2", False),
+        (0, "пи", False),
+        (1, "x^2 + 2*x + 1", True),
+        (1, "x**2 + 2x", False),
+        (1, "(x + 1) * (x - 1)", False),
+        (1, "__import__('os')", False),
+        (2, "1812 год", True),
+        (2, "около 1812", False),
+        (3, "лев толстой", True),
+        (3, "Лев Толстый", True),
+        (3, "Фёдор Достоевский", False),
+    ],
+)
+def test_graders(index, answer, expected):
+    assert check(QUESTIONS[index], answer) is expected
+
+
+def test_legacy_question_types():
+    plan = compile_grading_plan(
+        [
+            {"type": "single_choice", "points": 1, "correct_answer": ["a", "b"]},
+            {"type": "multiple_choice", "points": 1, "correct_answer": ["x", "y"]},
+            {"type": "text_input", "points": 1, "correct_answer": " Париж "},
+            {"type": "unknown", "points": 1, "correct_answer": "?"},
+        ]
+    )
+
+    assert grade_answers(plan, {"q1": "b", "q2": ["y", "x"], "q3": "париж", "q4": "?"}) == (75, 4)
+
+
+def test_pathological_regex_times_out_and_pool_recovers(override_settings):
+    override_settings(grading_timeout_seconds=0.2)
+    plan = compile_grading_plan(
+        [
+            {"type": "regex", "points": 1, "correct_answer": "(a+)+$"},
+            {"type": "regex", "points": 1, "correct_answer": "a+b"},
+        ]
+    )
+    check_answers([(plan.questions[1], "ab")])
+
+    started = time.monotonic()
+    assert check_answers([(plan.questions[0], "a" * 40 + "b"), (plan.questions[1], "aab")]) == [False, True]
+    assert time.monotonic() - started < 5
+
+
+def test_hung_worker_is_killed():
+    with pytest.raises(FutureTimeout):
+        grading_pool.call(time.sleep, 30, timeout=0.5)
+
+    assert grading_pool.call(abs, -1, timeout=30) == 1
+
+
+def test_batches_share_the_request_deadline(monkeypatch, override_settings):
+    override_settings(grading_batch_size=1, grading_deadline_seconds=0.5)
+    plan = compile_grading_plan(QUESTIONS[2:])
+    timeouts = []
+
+    def slow_call(func, items, item_timeout, timeout):
+        # A batch that uses up all of its hard timeout.
+        timeouts.append(timeout)
+        time.sleep(timeout)
+        return [True] * len(items)
+
+    monkeypatch.setattr(grading_pool, "call", slow_call)
+
+    assert check_answers([(plan.questions[0], "1812"), (plan.questions[1], "Лев Толстой")]) == [True, False]
+    assert len(timeouts) == 1 and timeouts[0] <= 0.5
+
+
+def test_broken_pool_answers_503(client, make_assignment, student_headers, monkeypatch):
+    assignment = make_assignment(questions=QUESTIONS)
+    calls = []
+
+    def broken(*args, **kwargs):
+        calls.append(args)
+        raise BrokenProcessPool()
+
+    monkeypatch.setattr(grading_pool, "call", broken)
+
+    response = client.post(
+        f"/student/assignments/{assignment.id}/submit",
+        json={"answers": {"q2": "x^2 + 2x + 1"}},
+        headers=student_headers,
+    )
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "1"
+    assert len(calls) == 2
+
+
+def test_regrade_matrix_uses_expensive_graders():
+    plan = compile_grading_plan(QUESTIONS)
+    answers = [
+        {"q1": "3.14", "q2": "x^2 + 2x + 1", "q3": "1812", "q4": "Толстой Лев"},
+        {"q1": "3", "q2": "(1 + x)*(x + 1)", "q3": "1812 год", "q4": "Лев Толстой"},
+    ]
+
+    assert correctness_matrix(plan, answers).tolist() == [[True, False, True, False], [False, True, True, True]]
+
+
+def test_submit_with_expensive_question(client, make_assignment, student_headers):
+    assignment = make_assignment(questions=QUESTIONS)
+
+    response = client.post(
+        f"/student/assignments/{assignment.id}/submit",
+        json={"answers": {"q1": "3.14", "q2": "1 + 2*x + x^2", "q3": "1812", "q4": "Лев Толстой"}},
+        headers=student_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["score"] == 100
+
+
+def test_invalid_correct_answer_is_rejected(client, topic, seed_data, teacher_headers):
+    response = client.post(
+        "/teacher/assignments",
+        json={
+            "class_id": seed_data["student"].class_group_id,
+            "subject": "Математика",
+            "topic_id": topic.id,
+            "type": "practice",
+            "title": "ПР",
+            "max_attempts": 1,
+            "questions": [{"type": "regex", "prompt": "?", "points": 1, "correct_answer": "(unclosed"}],
+        },
+        headers=teacher_headers,
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
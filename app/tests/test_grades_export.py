@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+import os
+import tracemalloc
+
+import pytest
+
+from fastapi import status
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.models import AssignmentType, Topic
+from app.services.grade_export import EXPORT_COLUMNS, export_chunks, export_statement
+
+QUESTIONS = [{"type": "select", "prompt": "2 + 2", "points": 1, "correct_answer": "4"}]
+
+
+def export(client, headers, **params):
+    return client.get("/teacher/grades/export", params={"subject": "Математика", **params}, headers=headers)
+
+
+def test_export_formats_and_filters(client, make_assignment, seed_data, student_headers, teacher_headers):
+    practice = make_assignment(questions=QUESTIONS)
+    homework = make_assignment(questions=QUESTIONS, topic=practice.topic, type=AssignmentType.homework, title="ДЗ")
+    for assignment, answer in ((practice, "4"), (practice, "5"), (homework, "4")):
+        client.post(
+            f"/student/assignments/{assignment.id}/submit", json={"answers": {"q1": answer}}, headers=student_headers
+        )
+    class_id = practice.class_group_id
+
+    response = export(client, teacher_headers, class_id=class_id)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"].startswith('attachment; filename="grades-')
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert rows[0] == list(EXPORT_COLUMNS)
+    assert [(row[6], row[7], row[8], row[10]) for row in rows[1:]] == [
+        ("ПР №1", "practice", "1", "5"),
+        ("ПР №1", "practice", "2", "2"),
+        ("ДЗ", "homework", "1", "5"),
+    ]
+    assert rows[1][2] == seed_data["student"].full_name
+
+    response = export(client, teacher_headers, class_id=class_id, type="homework", format="ndjson")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [(record["assignment_title"], record["grade"]) for record in records] == [("ДЗ", 5)]
+    assert set(records[0]) == set(EXPORT_COLUMNS)
+
+    empty = export(client, teacher_headers, class_id=class_id, topic_id=0)
+    assert empty.content.decode("utf-8-sig").splitlines() == [",".join(EXPORT_COLUMNS)]
+    assert export(client, teacher_headers, class_id=class_id, format="xlsx").status_code == 422
+    assert export(client, teacher_headers, class_id=class_id, subject="Химия").status_code == 404
+    assert export(client, student_headers, class_id=class_id).status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_csv_export_escapes_formulas(client, db_session, make_assignment, student_headers, teacher_headers):
+    assignment = make_assignment(questions=QUESTIONS, title="=HYPERLINK(\"http://x\")")
+    db_session.get(Topic, assignment.topic_id).title = "@SUM(A1)"
+    db_session.commit()
+    client.post(f"/student/assignments/{assignment.id}/submit", json={"answers": {"q1": "4"}}, headers=student_headers)
+
+    response = export(client, teacher_headers, class_id=assignment.class_group_id)
+
+    row = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))[1]
+    assert (row[4], row[6]) == ("'@SUM(A1)", "'=HYPERLINK(\"http://x\")")
+    ndjson = export(client, teacher_headers, class_id=assignment.class_group_id, format="ndjson")
+    assert json.loads(ndjson.text)["topic_title"] == "@SUM(A1)"
+
+
+def export_in_constant_memory(db_session, make_assignment, seed_data, count, peak_limit):
+    assignment = make_assignment(max_attempts=count)
+    db_session.execute(
+        text(
+            "INSERT INTO submissions (assignment_id, student_id, attempt_no, answers, score, grade, submitted_at) "
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :count) "
+            "SELECT :assignment_id, :student_id, n, '{}', n % 101, 2 + n % 4, "
+            "datetime('2024-09-01', '+' || n || ' seconds') FROM seq"
+        ),
+        {"count": count, "assignment_id": assignment.id, "student_id": seed_data["student"].id},
+    )
+    db_session.commit()
+
+    statement = export_statement(assignment.class_group_id, assignment.subject_id)
+    lines = 0
+    largest_chunk = 0
+    tracemalloc.start()
+    try:
+        for chunk in export_chunks(sessionmaker(bind=db_session.get_bind()), statement, "ndjson", 1000):
+            lines += chunk.count(b"\n")
+            largest_chunk = max(largest_chunk, len(chunk))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert lines == count
+    assert largest_chunk < 512 * 1024
+    assert peak < peak_limit
+
+
+def test_export_streams_in_batches(db_session, make_assignment, seed_data):
+    # Buffering 20 000 rows and their JSON would take several times this limit.
+    export_in_constant_memory(db_session, make_assignment, seed_data, 20_000, 4 * 2**20)
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_TESTS"), reason="set RUN_SLOW_TESTS=1 to run")
+def test_million_row_export_runs_in_constant_memory(db_session, make_assignment, seed_data):
+    export_in_constant_memory(db_session, make_assignment, seed_data, 1_000_000, 16 * 2**20)
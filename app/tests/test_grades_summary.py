@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from fastapi import status
+
+from app.models import Submission, User, UserRole
+
+
+def add_students(db_session, class_group_id: int, count: int, start: int = 0) -> list:
+    students = [
+        User(
+            full_name=f"Ученик {index:03d}",
+            phone=f"+7999100{index:04d}",
+            role=UserRole.student,
+            class_group_id=class_group_id,
+        )
+        for index in range(start, start + count)
+    ]
+    db_session.add_all(students)
+    db_session.commit()
+    return students
+
+
+def summary(client, headers, class_group_id: int):
+    response = client.get(
+        "/teacher/grades/summary",
+        params={"class_id": class_group_id, "subject": "Математика"},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_grades_summary_aggregates(client, db_session, seed_data, teacher_headers, make_assignment):
+    student = seed_data["student"]
+    assignment = make_assignment()
+    idle = add_students(db_session, student.class_group_id, 1)[0]
+    started = datetime(2026, 9, 1, 9, 0)
+    db_session.add_all([
+        Submission(
+            assignment_id=assignment.id,
+            student_id=student.id,
+            attempt_no=attempt_no,
+            answers={},
+            score=score,
+            grade=grade,
+            submitted_at=started + timedelta(minutes=attempt_no),
+        )
+        for attempt_no, score, grade in [(1, 50, 2), (2, 100, 5), (3, 80, 4)]
+    ])
+    db_session.commit()
+
+    students = {item["id"]: item for item in summary(client, teacher_headers, student.class_group_id)["students"]}
+
+    assert students[student.id] == {
+        "id": student.id,
+        "full_name": student.full_name,
+        "avg_grade": 3.67,
+        "submissions_count": 3,
+        "last_grade": 4,
+    }
+    assert students[idle.id]["avg_grade"] == 0.0
+    assert students[idle.id]["submissions_count"] == 0
+    assert students[idle.id]["last_grade"] is None
+
+
+def test_grades_summary_query_count_is_constant(
+    client, db_session, seed_data, teacher_headers, make_assignment, query_counter
+):
+    class_group_id = seed_data["student"].class_group_id
+    assignment = make_assignment()
+
+    def submit_for(students):
+        db_session.add_all([
+            Submission(
+                assignment_id=assignment.id,
+                student_id=student.id,
+                attempt_no=1,
+                answers={},
+                score=100,
+                grade=5,
+            )
+            for student in students
+        ])
+        db_session.commit()
+
+    submit_for(add_students(db_session, class_group_id, 2))
+    summary(client, teacher_headers, class_group_id)
+    query_counter.clear()
+    small = summary(client, teacher_headers, class_group_id)
+    small_queries = len(query_counter)
+
+    submit_for(add_students(db_session, class_group_id, 40, start=2))
+    query_counter.clear()
+    large = summary(client, teacher_headers, class_group_id)
+
+    assert len(large["students"]) == len(small["students"]) + 40
+    assert len(query_counter) == small_queries
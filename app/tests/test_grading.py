@@ -0,0 +1,54 @@
+from fastapi import status
+
+from app.services.grading import compile_grading_plan, get_grading_plan, grade_answers, grade_submission
+
+QUESTIONS = [
+    {"type": "select", "prompt": "2 + 2", "points": "2", "correct_answer": "4"},
+    {"type": "checkbox", "prompt": "Чётные", "points": 3, "correct_answer": ["2", "4"]},
+    {"type": "text", "prompt": "Столица", "points": 5, "correct_answer": "  Москва "},
+    {"type": "text", "prompt": "Эссе", "points": 10},
+]
+
+
+def test_compiled_plan_normalizes_answers_once():
+    plan = compile_grading_plan(QUESTIONS)
+
+    assert plan.points == (2, 3, 5, 10)
+    assert plan.total_points == 20
+    assert plan.questions[1].correct == frozenset({"2", "4"})
+    assert plan.questions[2].correct == "москва"
+    assert plan.questions[3].correct is None
+
+
+def test_grade_answers():
+    plan = compile_grading_plan(QUESTIONS)
+
+    assert grade_answers(plan, {"q1": "4", "q2": ["4", "2"], "q3": "москва"}) == (50, 2)
+    assert grade_answers(plan, {"q1": "4", "q2": "2", "q3": " МОСКВА"}) == (35, 2)
+    assert grade_answers(plan, {}) == (0, 2)
+    all_correct = {"q1": "4", "q2": ["2", "4"], "q3": "Москва"}
+    assert grade_answers(compile_grading_plan(QUESTIONS[:3]), all_correct) == (100, 5)
+    assert grade_answers(compile_grading_plan([]), {}) == (0, 2)
+
+
+def test_plan_is_cached_per_assignment_version(
+    client, db_session, make_assignment, teacher_headers, student_headers
+):
+    assignment = make_assignment(questions=QUESTIONS[:1])
+    plan = get_grading_plan(assignment)
+    assert get_grading_plan(assignment) is plan
+
+    response = client.patch(
+        f"/teacher/assignments/{assignment.id}",
+        json={"questions": [{"type": "select", "prompt": "2 + 2", "points": 2, "correct_answer": "5"}]},
+        headers=teacher_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    db_session.refresh(assignment)
+    assert get_grading_plan(assignment) is not plan
+    assert grade_submission(assignment, {"q1": "5"}) == (100, 5)
+    submitted = client.post(
+        f"/student/assignments/{assignment.id}/submit", json={"answers": {"q1": "5"}}, headers=student_headers
+    )
+    assert submitted.json()["score"] == 100
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import status
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.models import IdempotencyKey, Submission
+from app.services.idempotency import NEW, get_idempotency_store, request_fingerprint
+
+QUESTIONS = [{"type": "select", "prompt": "2 + 2", "points": 1, "correct_answer": "4"}]
+
+
+@pytest.fixture(params=["db", "memory"])
+def idempotency_backend(request, override_settings):
+    override_settings(idempotency_backend=request.param)
+    get_idempotency_store.cache_clear()
+    return request.param
+
+
+def submit(client, assignment, headers, answers, key=None):
+    if key is not None:
+        headers = {**headers, "Idempotency-Key": key}
+    return client.post(f"/student/assignments/{assignment.id}/submit", json={"answers": answers}, headers=headers)
+
+
+def test_retry_replays_original_response(
+    idempotency_backend, client, db_session, make_assignment, student_headers, monkeypatch
+):
+    assignment = make_assignment(questions=QUESTIONS)
+    first = submit(client, assignment, student_headers, {"q1": "4"}, key="retry-1")
+    assert first.status_code == status.HTTP_200_OK
+
+    monkeypatch.setattr(
+        "app.api.routes.student.grade_submission", lambda *args: pytest.fail("a replay must not regrade")
+    )
+    replay = submit(client, assignment, student_headers, {"q1": "4"}, key="retry-1")
+
+    assert replay.status_code == status.HTTP_200_OK
+    assert replay.json() == first.json() == {"ok": True, "attempt_no": 1, "score": 100, "grade": 5, "attempts_left": 2}
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert db_session.query(Submission).filter(Submission.assignment_id == assignment.id).count() == 1
+
+
+def test_new_key_is_a_new_attempt(idempotency_backend, client, make_assignment, student_headers):
+    assignment = make_assignment(questions=QUESTIONS)
+
+    assert submit(client, assignment, student_headers, {"q1": "4"}, key="a").json()["attempt_no"] == 1
+    assert submit(client, assignment, student_headers, {"q1": "4"}, key="b").json()["attempt_no"] == 2
+    assert submit(client, assignment, student_headers, {"q1": "4"}).json()["attempt_no"] == 3
+
+
+def test_key_reused_for_different_request(idempotency_backend, client, make_assignment, student_headers):
+    assignment = make_assignment(questions=QUESTIONS)
+    submit(client, assignment, student_headers, {"q1": "4"}, key="same")
+
+    response = submit(client, assignment, student_headers, {"q1": "5"}, key="same")
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+def test_failed_request_releases_key(idempotency_backend, client, make_assignment, student_headers):
+    assignment = make_assignment(questions=QUESTIONS, max_attempts=1)
+    submit(client, assignment, student_headers, {"q1": "4"})
+
+    assert submit(client, assignment, student_headers, {"q1": "4"}, key="late").status_code == 400
+    assert submit(client, assignment, student_headers, {"q1": "4"}, key="late").status_code == 400
+
+
+def test_db_keys_expire_and_stale_locks_are_taken_over(client, db_session, make_assignment, student_headers, seed_data):
+    assignment = make_assignment(questions=QUESTIONS)
+    scope = f"student:{seed_data['student'].id}"
+    old = datetime.utcnow() - timedelta(days=2)
+    db_session.add_all([
+        IdempotencyKey(
+            scope=scope, key="expired", fingerprint="x", response={}, created_at=old, locked_at=old, completed_at=old
+        ),
+        IdempotencyKey(scope="student:0", key="other", fingerprint="x", created_at=old, locked_at=old),
+    ])
+    db_session.commit()
+
+    assert submit(client, assignment, student_headers, {"q1": "4"}, key="expired").json()["attempt_no"] == 1
+    assert get_idempotency_store().purge_expired(db_session) == 1
+    assert db_session.query(IdempotencyKey).count() == 1
+
+    stale = db_session.get(IdempotencyKey, (scope, "expired"))
+    stale.completed_at = None
+    stale.locked_at = datetime.utcnow() - timedelta(minutes=5)
+    db_session.commit()
+    response = submit(client, assignment, student_headers, {"q1": "4"}, key="expired")
+    assert response.json()["attempt_no"] == 2
+
+
+def test_parallel_request_with_same_key_conflicts(
+    idempotency_backend, client, db_session, make_assignment, student_headers, seed_data
+):
+    assignment = make_assignment(questions=QUESTIONS)
+    store = get_idempotency_store()
+    scope = f"student:{seed_data['student'].id}"
+    fingerprint = request_fingerprint("submit", assignment.id, {"q1": "4"})
+    assert store.claim(db_session, scope, "double-tap", fingerprint).status == NEW
+
+    response = submit(client, assignment, student_headers, {"q1": "4"}, key="double-tap")
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_misspelled_backend_fails_at_startup():
+    with pytest.raises(ValidationError, match="idempotency_backend"):
+        Settings(idempotency_backend="memroy")
@@ -0,0 +1,48 @@
+import os
+
+from sqlalchemy import create_engine, text
+
+from app.db.pool import InstrumentedQueuePool, pool_stats, render_pool_metrics
+from app.db.session import engine_options
+
+
+def test_engine_options_skip_pool_sizing_for_memory_sqlite():
+    assert engine_options("sqlite://", InstrumentedQueuePool) == {}
+    options = engine_options("postgresql://admin:admin@db:5432/school", InstrumentedQueuePool)
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert {"pool_size", "max_overflow", "pool_timeout", "pool_recycle", "pool_pre_ping"} <= options.keys()
+
+
+def test_instrumented_pool_records_checkout_wait(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=2,
+        max_overflow=1,
+    )
+    waits_before = pool_stats["sync"].wait_seconds.count
+
+    with engine.connect() as first, engine.connect() as second, engine.connect() as third:
+        for connection in (first, second, third):
+            connection.execute(text("SELECT 1"))
+        rendered = render_pool_metrics({"sync": engine.pool})
+        assert f'db_pool_checked_out{{pool="sync",pid="{os.getpid()}"}} 3' in rendered
+        assert f'db_pool_overflow{{pool="sync",pid="{os.getpid()}"}} 1' in rendered
+        assert f'db_pool_size{{pool="sync",pid="{os.getpid()}"}} 2' in rendered
+
+    assert pool_stats["sync"].wait_seconds.count == waits_before + 3
+    engine.dispose()
+
+
+def test_metrics_endpoint(client, override_settings):
+    assert client.get("/metrics").status_code == 404
+
+    override_settings(metrics_enabled=True, metrics_token="scrape-token")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "db_pool_wait_seconds_count" in response.text
+    assert "db_pool_timeouts_total" in response.text
@@ -0,0 +1,54 @@
+from fastapi import status
+
+from app.services.principal_cache import PrincipalCache
+
+
+def user_queries(statements) -> list:
+    return [statement for statement in statements if "FROM users" in statement]
+
+
+def test_get_current_user_is_cached_per_token(client, seed_data, student_headers, query_counter):
+    response = client.get("/me", headers=student_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(user_queries(query_counter)) == 1
+
+    query_counter.clear()
+    response = client.get("/me", headers=student_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["profile"]["class_group"]["name"] == "7а"
+    assert user_queries(query_counter) == []
+
+
+def test_set_password_invalidates_cached_principal(client, seed_data, student_headers, query_counter):
+    client.get("/me", headers=student_headers)
+    response = client.post(
+        "/auth/set-password",
+        json={"phone": seed_data["student"].phone, "new_password": "new-secret"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    query_counter.clear()
+    client.get("/me", headers=student_headers)
+    assert len(user_queries(query_counter)) == 1
+
+
+def test_profile_update_invalidates_cached_principal(client, db_session, seed_data, teacher_headers):
+    client.get("/teacher/profile", headers=teacher_headers)
+
+    seed_data["teacher"].room = "305"
+    db_session.commit()
+
+    response = client.get("/teacher/profile", headers=teacher_headers)
+    assert response.json()["room"] == "305"
+
+
+def test_generations_stay_bounded_without_reviving_invalidated_entries(db_session, seed_data):
+    cache = PrincipalCache(maxsize=2, ttl=60)
+    student = seed_data["student"]
+    cache.set("token", student, cache.generation(student.id))
+    cache.invalidate_user(student.id)
+    for user_id in range(1000, 1010):
+        cache.invalidate_user(user_id)
+
+    assert len(cache._generations) <= 2
+    assert cache.get(db_session, "token") is None
@@ -0,0 +1,80 @@
+import re
+
+import pytest
+from sqlalchemy import select
+
+from app.db.base import Base
+from app.models import (
+    Assignment,
+    AssignmentType,
+    StudentAssignmentProgress,
+    Subject,
+    Submission,
+    Theory,
+    Topic,
+    User,
+)
+from app.services.attempts import attempts_summary_statement
+from app.services.grade_aggregates import class_grade_summary_statement
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+HOT_QUERIES = {
+    "subject_by_name": select(Subject).where(Subject.name == "Математика"),
+    "teacher_topics": select(Topic).where(Topic.class_group_id == 1, Topic.subject_id == 1),
+    "teacher_theory": select(Theory).where(Theory.class_group_id == 1, Theory.subject_id == 1),
+    "teacher_assignments": select(Assignment).where(
+        Assignment.class_group_id == 1,
+        Assignment.subject_id == 1,
+        Assignment.type == AssignmentType.practice,
+    ),
+    "teacher_grades_summary": class_grade_summary_statement(1, 1),
+    "teacher_grades_by_topic": select(Submission, Assignment, User)
+    .join(Assignment, Submission.assignment_id == Assignment.id)
+    .join(User, Submission.student_id == User.id)
+    .where(
+        Assignment.class_group_id == 1,
+        Assignment.topic_id == 1,
+        Assignment.type == AssignmentType.practice,
+        Assignment.subject_id == 1,
+    )
+    .order_by(Submission.submitted_at.desc()),
+    "teacher_submissions": select(Submission, User)
+    .join(User, Submission.student_id == User.id)
+    .where(Submission.assignment_id == 1)
+    .order_by(Submission.submitted_at.desc()),
+    "student_topics": select(Topic).where(Topic.subject_id == 1, Topic.class_group_id == 1),
+    "student_theory": select(Theory).where(Theory.subject_id == 1, Theory.topic_id == 1),
+    "student_assignments": select(Assignment).where(
+        Assignment.subject_id == 1,
+        Assignment.topic_id == 1,
+        Assignment.type == AssignmentType.practice,
+        Assignment.published.is_(True),
+    ),
+    "student_attempts_summary": attempts_summary_statement(1, [1, 2, 3]),
+    "student_attempts_used": select(StudentAssignmentProgress.attempts_used).where(
+        StudentAssignmentProgress.student_id == 1, StudentAssignmentProgress.assignment_id == 1
+    ),
+    "student_grades": select(Submission, Assignment, Topic)
+    .join(Assignment, Submission.assignment_id == Assignment.id)
+    .join(Topic, Assignment.topic_id == Topic.id)
+    .where(Submission.student_id == 1, Assignment.subject_id == 1)
+    .order_by(Submission.submitted_at.desc()),
+}
+
+
+def explain(db_engine, statement) -> list:
+    sql = str(statement.compile(dialect=db_engine.dialect, compile_kwargs={"literal_binds": True}))
+    with db_engine.connect() as connection:
+        return [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_avoids_full_table_scan(db_engine, name):
+    plan = explain(db_engine, HOT_QUERIES[name])
+    full_scans = [
+        detail
+        for detail in plan
+        if (match := FULL_SCAN.match(detail)) and match.group(1) in Base.metadata.tables
+    ]
+    assert not full_scans, f"{name} plan regressed to a full scan: {plan}"
@@ -0,0 +1,85 @@
+from fastapi import status
+from sqlalchemy import insert
+
+from app.models import ClassGroup, Subject, TeacherClass, Topic
+from app.services.reference_data import reference_data
+
+
+def reference_queries(statements) -> list:
+    return [
+        statement for statement in statements
+        if any(f"FROM {table}" in statement for table in ("subjects", "topics", "class_groups"))
+    ]
+
+
+def list_topics(client, headers) -> list:
+    response = client.get("/student/topics", params={"subject": "Математика"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    return [item["title"] for item in response.json()]
+
+
+def test_lookups_are_served_from_memory(client, topic, student_headers, teacher_headers, query_counter):
+    class_id = topic.class_group_id
+    assert list_topics(client, student_headers) == ["Дроби"]
+    assert reference_queries(query_counter)
+
+    query_counter.clear()
+    assert list_topics(client, student_headers) == ["Дроби"]
+    assert client.get("/student/subjects", headers=student_headers).json() == [{"name": "Математика"}]
+    assert reference_queries(query_counter) == []
+
+    params = {"class_id": class_id, "subject": "Математика"}
+    summary = client.get("/teacher/grades/summary", params=params, headers=teacher_headers)
+    assert summary.json()["class_group"]["name"] == "7а"
+    query_counter.clear()
+    client.get("/teacher/grades/summary", params=params, headers=teacher_headers)
+    assert reference_queries(query_counter) == []
+
+
+def test_committed_writes_invalidate(client, db_session, topic, student_headers):
+    assert list_topics(client, student_headers) == ["Дроби"]
+
+    db_session.add(Topic(title="Уравнения", subject_id=topic.subject_id, class_group_id=topic.class_group_id))
+    db_session.flush()
+    version = reference_data.version("topics")
+    db_session.rollback()
+    assert reference_data.version("topics") == version
+
+    db_session.add(Topic(title="Проценты", subject_id=topic.subject_id, class_group_id=topic.class_group_id))
+    db_session.commit()
+    assert list_topics(client, student_headers) == ["Дроби", "Проценты"]
+
+    topic.subject.name = "Алгебра"
+    db_session.commit()
+    response = client.get("/student/topics", params={"subject": "Математика"}, headers=student_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = client.get("/student/topics", params={"subject": "Алгебра"}, headers=student_headers)
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_rows_written_by_another_process_are_found(client, db_session, seed_data, teacher_headers):
+    teacher_id = seed_data["teacher"].id
+    assert client.get("/teacher/classes", headers=teacher_headers).json() == []
+    seeded = {"class_id": seed_data["student"].class_group_id, "subject": "Математика"}
+    assert client.get("/teacher/grades/summary", params=seeded, headers=teacher_headers).status_code == 200
+
+    # Core inserts skip the ORM events, like a commit made by another worker.
+    class_id = db_session.execute(
+        insert(ClassGroup).values(grade=8, letter="б", name="8б").returning(ClassGroup.id)
+    ).scalar_one()
+    db_session.execute(insert(TeacherClass).values(teacher_id=teacher_id, class_group_id=class_id))
+    db_session.execute(insert(Subject).values(name="Физика"))
+    db_session.commit()
+    version = reference_data.version("class_groups")
+
+    classes = client.get("/teacher/classes", headers=teacher_headers)
+    assert classes.status_code == status.HTTP_200_OK
+    assert [item["name"] for item in classes.json()] == ["8б"]
+    assert reference_data.version("class_groups") == version + 1
+
+    params = {"class_id": class_id, "subject": "Физика"}
+    summary = client.get("/teacher/grades/summary", params=params, headers=teacher_headers)
+    assert summary.status_code == status.HTTP_200_OK
+    assert summary.json()["class_group"]["name"] == "8б"
+    missing = client.get("/teacher/grades/summary", params={**params, "class_id": 999}, headers=teacher_headers)
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
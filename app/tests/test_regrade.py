@@ -0,0 +1,201 @@
+import math
+import random
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+
+from fastapi import status
+from sqlalchemy import insert, update
+from sqlalchemy.orm import sessionmaker
+
+from app.models import RegradeJob, StudentAssignmentProgress, Submission
+from app.services import regrade
+from app.services.grading import compile_grading_plan, grade_answers, grading_pool
+from app.services.regrade import (
+    FAILED,
+    QUEUED,
+    RUNNING,
+    correctness_matrix,
+    grade_matrix,
+    run_regrade_job,
+    start_regrade_job,
+)
+
+QUESTIONS = [
+    {"type": "select", "prompt": "2 + 2", "points": 2, "correct_answer": "5"},
+    {"type": "checkbox", "prompt": "Чётные", "points": 3, "correct_answer": ["2", "4"]},
+    {"type": "text", "prompt": "Столица", "points": 5, "correct_answer": "Москва"},
+    {"type": "text", "prompt": "Эссе", "points": 7},
+]
+
+
+def random_answers(rng: random.Random) -> dict:
+    return {
+        "q1": rng.choice(["4", "5", None]),
+        "q2": rng.choice([["2", "4"], ["4", "2"], ["2"], "2"]),
+        "q3": rng.choice(["москва", " МОСКВА ", "Питер"]),
+    }
+
+
+def test_correctness_matrix_grading_matches_grade_answers():
+    rng = random.Random(7)
+    plan = compile_grading_plan(QUESTIONS)
+    answers = [random_answers(rng) for _ in range(500)]
+
+    scores, grades = grade_matrix(plan, correctness_matrix(plan, answers))
+
+    assert [(int(score), int(grade)) for score, grade in zip(scores, grades)] == [
+        grade_answers(plan, row) for row in answers
+    ]
+
+
+def test_regrade_rewrites_stale_scores_in_chunks(
+    client, db_session, seed_data, make_assignment, teacher_headers, override_settings, query_counter
+):
+    override_settings(regrade_chunk_size=400)
+    rng = random.Random(3)
+    assignment = make_assignment(questions=QUESTIONS)
+    student_id = seed_data["student"].id
+    answers = [random_answers(rng) for _ in range(1500)]
+    db_session.execute(
+        insert(Submission),
+        [
+            {
+                "assignment_id": assignment.id,
+                "student_id": student_id,
+                "attempt_no": index + 1,
+                "answers": row,
+                "score": 0,
+                "grade": 2,
+            }
+            for index, row in enumerate(answers)
+        ],
+    )
+    db_session.commit()
+    query_counter.clear()
+
+    response = client.post(f"/teacher/assignments/{assignment.id}/regrade", headers=teacher_headers)
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job = client.get(f"/teacher/regrade-jobs/{response.json()['id']}", headers=teacher_headers).json()
+    plan = compile_grading_plan(QUESTIONS)
+    expected = [grade_answers(plan, row) for row in answers]
+    assert job["status"] == "done"
+    assert job["total"] == job["processed"] == 1500
+    assert job["updated"] == sum(1 for score, grade in expected if (score, grade) != (0, 2))
+    assert job["progress"] == 1.0
+
+    stored = db_session.query(Submission.score, Submission.grade).order_by(Submission.id).all()
+    assert [tuple(row) for row in stored] == expected
+    chunk_selects = [
+        statement for statement in query_counter
+        if statement.lstrip().upper().startswith("SELECT") and "submissions.answers" in statement
+    ]
+    assert len(chunk_selects) == math.ceil(1500 / 400) + 1
+
+    progress = db_session.get(StudentAssignmentProgress, (student_id, assignment.id))
+    assert progress.attempts_used == 1500
+    assert (progress.last_score, progress.last_grade) == expected[-1]
+    assert (progress.best_score, progress.best_grade) == max(expected)
+
+
+def test_regrade_unknown_assignment_and_job(client, seed_data, teacher_headers, student_headers):
+    assert client.post("/teacher/assignments/999/regrade", headers=teacher_headers).status_code == 404
+    assert client.get("/teacher/regrade-jobs/missing", headers=teacher_headers).status_code == 404
+    assert client.post("/teacher/assignments/999/regrade", headers=student_headers).status_code == 403
+
+
+def test_regrade_jobs_are_stored_and_stale_ones_are_replaced(
+    client, db_session, make_assignment, teacher_headers, override_settings
+):
+    override_settings(regrade_stale_seconds=60)
+    assignment = make_assignment(questions=QUESTIONS)
+    job, created = start_regrade_job(db_session, assignment.id)
+    assert created and job.status == QUEUED
+
+    # Another process sees the same row and joins it instead of starting a second job.
+    db_session.expire_all()
+    again, created = start_regrade_job(db_session, assignment.id)
+    assert (again.id, created) == (job.id, False)
+    polled = client.get(f"/teacher/regrade-jobs/{job.id}", headers=teacher_headers)
+    assert polled.json()["status"] == QUEUED
+
+    job.status = RUNNING
+    job.heartbeat_at = datetime.utcnow() - timedelta(seconds=120)
+    db_session.commit()
+
+    response = client.post(f"/teacher/assignments/{assignment.id}/regrade", headers=teacher_headers)
+
+    new_id = response.json()["id"]
+    assert new_id != job.id
+    assert client.get(f"/teacher/regrade-jobs/{new_id}", headers=teacher_headers).json()["status"] == "done"
+    db_session.expire_all()
+    stale = db_session.get(RegradeJob, job.id)
+    assert (stale.status, stale.error) == (FAILED, "Interrupted")
+
+
+def insert_submissions(db_session, assignment, student_id, answers, score=100, grade=5):
+    db_session.execute(
+        insert(Submission),
+        [
+            {
+                "assignment_id": assignment.id,
+                "student_id": student_id,
+                "attempt_no": index + 1,
+                "answers": row,
+                "score": score,
+                "grade": grade,
+            }
+            for index, row in enumerate(answers)
+        ],
+    )
+    db_session.commit()
+
+
+def stored_scores(db_session):
+    db_session.expire_all()
+    return db_session.query(Submission.score, Submission.grade).order_by(Submission.id).all()
+
+
+def test_grading_timeout_fails_the_job_instead_of_lowering_scores(
+    client, db_session, seed_data, make_assignment, teacher_headers, monkeypatch
+):
+    assignment = make_assignment(questions=[{"type": "regex", "points": 1, "correct_answer": "a+b"}])
+    insert_submissions(db_session, assignment, seed_data["student"].id, [{"q1": "ab"}, {"q1": "aab"}])
+    calls = []
+
+    def timed_out(*args, **kwargs):
+        calls.append(args)
+        raise FutureTimeout()
+
+    monkeypatch.setattr(grading_pool, "call", timed_out)
+
+    response = client.post(f"/teacher/assignments/{assignment.id}/regrade", headers=teacher_headers)
+
+    job = client.get(f"/teacher/regrade-jobs/{response.json()['id']}", headers=teacher_headers).json()
+    assert job["status"] == FAILED and "timed out" in job["error"]
+    assert len(calls) == 2
+    assert [tuple(row) for row in stored_scores(db_session)] == [(100, 5), (100, 5)]
+
+
+def test_runner_stops_when_its_job_is_taken_over(db_session, seed_data, make_assignment, monkeypatch):
+    assignment = make_assignment(questions=QUESTIONS)
+    insert_submissions(db_session, assignment, seed_data["student"].id, [{"q1": "4"}] * 3)
+    job, _ = start_regrade_job(db_session, assignment.id)
+    session_factory = sessionmaker(bind=db_session.get_bind())
+    grade_rows = regrade._grade_rows
+
+    def taken_over(plan, rows):
+        # Another process declares the job stale while this chunk is being graded.
+        with session_factory() as other:
+            other.execute(update(RegradeJob).where(RegradeJob.id == job.id).values(status=FAILED, error="Interrupted"))
+            other.commit()
+        return grade_rows(plan, rows)
+
+    monkeypatch.setattr(regrade, "_grade_rows", taken_over)
+
+    run_regrade_job(session_factory, job.id, chunk_size=2)
+
+    db_session.expire_all()
+    stale = db_session.get(RegradeJob, job.id)
+    assert (stale.status, stale.error, stale.processed) == (FAILED, "Interrupted", 0)
+    assert [tuple(row) for row in stored_scores(db_session)] == [(100, 5)] * 3
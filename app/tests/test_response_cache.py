@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+from fastapi import status
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.services.response_cache import get_response_cache
+
+QUESTIONS = [{"type": "select", "prompt": "2 + 2", "points": 1, "correct_answer": "4"}]
+
+
+@pytest.fixture(params=["memory", "redis-local"])
+def response_cache_backend(request, override_settings):
+    override_settings(response_cache_backend=request.param)
+    get_response_cache.cache_clear()
+    return request.param
+
+
+def theory_queries(statements) -> list:
+    return [statement for statement in statements if "FROM theory" in statement]
+
+
+def text_theory(topic, text: str) -> dict:
+    return {"class_id": topic.class_group_id, "subject": "Математика", "topic_id": topic.id, "kind": "text", "text": text}
+
+
+def student_theory(client, headers, topic):
+    response = client.get(
+        "/student/theory", params={"subject": "Математика", "topic_id": topic.id}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response
+
+
+def test_repeated_reads_are_served_from_cache(
+    response_cache_backend, client, topic, student_headers, teacher_headers, query_counter
+):
+    client.post("/teacher/theory", json=text_theory(topic, "½ = 0.5"), headers=teacher_headers)
+    first = student_theory(client, student_headers, topic)
+    assert first.headers["X-Cache"] == "miss"
+
+    query_counter.clear()
+    second = student_theory(client, student_headers, topic)
+
+    assert second.headers["X-Cache"] == "hit"
+    assert second.json() == first.json()
+    assert [item["text"] for item in second.json()] == ["½ = 0.5"]
+    assert theory_queries(query_counter) == []
+
+
+def test_theory_writes_invalidate(response_cache_backend, client, topic, student_headers, teacher_headers):
+    assert student_theory(client, student_headers, topic).json() == []
+    params = {"class_id": topic.class_group_id, "subject": "Математика"}
+    assert client.get("/teacher/theory", params=params, headers=teacher_headers).json() == []
+
+    created = client.post("/teacher/theory", json=text_theory(topic, "v1"), headers=teacher_headers).json()
+    assert [item["text"] for item in student_theory(client, student_headers, topic).json()] == ["v1"]
+    listed = client.get("/teacher/theory", params=params, headers=teacher_headers).json()
+    assert [item["text"] for item in listed] == ["v1"]
+
+    client.patch(f"/teacher/theory/{created['id']}", json={"text": "v2"}, headers=teacher_headers)
+    assert [item["text"] for item in student_theory(client, student_headers, topic).json()] == ["v2"]
+
+    client.delete(f"/teacher/theory/{created['id']}", headers=teacher_headers)
+    assert student_theory(client, student_headers, topic).json() == []
+    assert client.get("/teacher/theory", params=params, headers=teacher_headers).json() == []
+
+
+def test_assignment_writes_invalidate(response_cache_backend, client, topic, teacher_headers):
+    params = {"class_id": topic.class_group_id, "subject": "Математика", "type": "homework"}
+    assert client.get("/teacher/assignments", params=params, headers=teacher_headers).json() == []
+
+    created = client.post(
+        "/teacher/assignments",
+        json={
+            "class_id": topic.class_group_id,
+            "subject": "Математика",
+            "topic_id": topic.id,
+            "type": "homework",
+            "title": "Дроби",
+            "max_attempts": 3,
+            "questions": QUESTIONS,
+        },
+        headers=teacher_headers,
+    ).json()
+    listed = client.get("/teacher/assignments", params=params, headers=teacher_headers).json()
+    assert [item["title"] for item in listed] == ["Дроби"]
+
+    client.patch(f"/teacher/assignments/{created['id']}", json={"title": "Дроби 2"}, headers=teacher_headers)
+    listed = client.get("/teacher/assignments", params=params, headers=teacher_headers).json()
+    assert [item["title"] for item in listed] == ["Дроби 2"]
+
+    client.delete(f"/teacher/assignments/{created['id']}", headers=teacher_headers)
+    assert client.get("/teacher/assignments", params=params, headers=teacher_headers).json() == []
+
+
+def test_concurrent_misses_load_once(response_cache_backend):
+    cache = get_response_cache()
+    loads = []
+    barrier = threading.Barrier(8)
+    results = []
+
+    def load() -> bytes:
+        loads.append(1)
+        time.sleep(0.2)
+        return b"[]"
+
+    def read() -> None:
+        barrier.wait()
+        results.append(cache.get_or_load("topics:student:1:1::", ("reference",), load))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert [body for body, _ in results] == [b"[]"] * 8
+    assert cache.get_or_load("topics:student:1:1::", ("reference",), load) == (b"[]", True)
+
+    cache.invalidate("reference")
+    assert cache.get_or_load("topics:student:1:1::", ("reference",), load) == (b"[]", False)
+    assert len(loads) == 2
+
+
+def test_misspelled_backend_fails_at_startup():
+    with pytest.raises(ValidationError, match="response_cache_backend"):
+        Settings(response_cache_backend="memroy")
@@ -0,0 +1,133 @@
+import hashlib
+import time
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import pytest
+from fastapi import status
+from pydantic import ValidationError
+
+from app.core.config import Settings, get_settings
+from app.core.signing import sign
+from app.models import Theory, TheoryKind, Topic
+from app.services.theory_files import theory_file_cache
+
+CONTENT = b"%PDF-1.4 signed notes"
+
+
+def upload_theory(client, headers, topic: Topic) -> dict:
+    response = client.post(
+        "/teacher/theory",
+        data={"class_id": topic.class_group_id, "subject": "Математика", "topic_id": topic.id, "kind": "file"},
+        files={"file": ("notes.pdf", CONTENT, "application/pdf")},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def student_file_url(client, headers, topic: Topic) -> str:
+    response = client.get("/student/theory", params={"subject": "Математика", "topic_id": topic.id}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()[0]["file_url"]
+
+
+def with_params(url: str, **changes) -> str:
+    parts = urlsplit(url)
+    params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+    params.update(changes)
+    return f"{parts.path}?{urlencode(params)}"
+
+
+def test_signed_url_is_served_without_a_db_query(
+    client, storage, topic, teacher_headers, student_headers, query_counter
+):
+    upload_theory(client, teacher_headers, topic)
+    url = student_file_url(client, student_headers, topic)
+    assert url == student_file_url(client, student_headers, topic)
+    theory_file_cache.clear()
+    query_counter.clear()
+
+    response = client.get(url)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == CONTENT
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert "immutable" in response.headers["cache-control"]
+    revalidated = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+    assert query_counter == []
+
+
+def test_tampered_or_expired_links_are_rejected(client, storage, topic, teacher_headers, student_headers):
+    upload_theory(client, teacher_headers, topic)
+    url = student_file_url(client, student_headers, topic)
+    theory_id = int(urlsplit(url).path.rsplit("/", 1)[-1])
+
+    assert client.get(with_params(url, sig="A" * 43)).status_code == status.HTTP_403_FORBIDDEN
+    other_sha = hashlib.sha256(b"other").hexdigest()
+    assert client.get(with_params(url, v=other_sha)).status_code == status.HTTP_403_FORBIDDEN
+    assert client.get(with_params(url, s=1)).status_code == status.HTTP_403_FORBIDDEN
+    assert client.get(with_params(url, exp=int(time.time()) + 10**6)).status_code == status.HTTP_403_FORBIDDEN
+    other_theory = url.replace(f"/files/{theory_id}", f"/files/{theory_id + 1}")
+    assert client.get(other_theory).status_code == status.HTTP_403_FORBIDDEN
+
+    sha = hashlib.sha256(CONTENT).hexdigest()
+    expired = int(time.time()) - 1
+    signature = sign(f"{theory_id}:{sha}:{len(CONTENT)}:{expired}:notes.pdf", get_settings().secret_key)
+    response = client.get(with_params(url, exp=expired, sig=signature))
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json()["detail"] == "File link expired"
+
+
+def test_issued_links_live_until_expiry_and_a_new_secret_revokes_them(
+    client, storage, topic, teacher_headers, student_headers, override_settings
+):
+    theory = upload_theory(client, teacher_headers, topic)
+    url = student_file_url(client, student_headers, topic)
+    expires = int(parse_qs(urlsplit(url).query)["exp"][0])
+    assert expires <= time.time() + get_settings().files_url_ttl_seconds + get_settings().files_url_bucket_seconds
+
+    client.delete(f"/teacher/theory/{theory['id']}", headers=teacher_headers)
+
+    # The blob is still within its grace period, so the link works until it expires.
+    assert client.get(url).content == CONTENT
+    override_settings(files_link_secret="rotated")
+    assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_unsigned_urls_are_rejected_unless_opted_out(
+    client, storage, topic, teacher_headers, student_headers, override_settings
+):
+    theory = upload_theory(client, teacher_headers, topic)
+
+    assert client.get(f"/files/{theory['id']}").status_code == status.HTTP_403_FORBIDDEN
+    assert client.get(student_file_url(client, student_headers, topic)).status_code == status.HTTP_200_OK
+    override_settings(files_require_signature=False)
+    assert client.get(f"/files/{theory['id']}").status_code == status.HTTP_200_OK
+
+
+def test_unsigned_links_need_an_explicit_opt_out():
+    with pytest.raises(ValidationError):
+        Settings(files_signed_urls=False)
+    assert not Settings(files_signed_urls=False, files_require_signature=False).files_require_signature
+
+
+def test_legacy_files_get_signed_links(client, db_session, files_dir, topic, student_headers, tmp_path):
+    legacy = tmp_path / "1700000000.0_old.pdf"
+    legacy.write_bytes(b"old upload")
+    db_session.add(
+        Theory(
+            class_group_id=topic.class_group_id,
+            subject_id=topic.subject_id,
+            topic_id=topic.id,
+            kind=TheoryKind.file,
+            file_path=str(legacy),
+        )
+    )
+    db_session.commit()
+
+    url = student_file_url(client, student_headers, topic)
+
+    assert "v=" not in url
+    assert client.get(url).content == b"old upload"
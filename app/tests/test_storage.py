@@ -0,0 +1,176 @@
+import hashlib
+import os
+import time
+
+import pytest
+from fastapi import status
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.models import Theory, TheoryKind, Topic
+from app.services import storage as storage_module
+from app.services.storage import LocalS3Client, LocalStorage, S3Storage, blob_key, collect_garbage
+
+
+def upload_theory(client, headers, topic: Topic, filename: str, content: bytes) -> int:
+    response = client.post(
+        "/teacher/theory",
+        data={"class_id": topic.class_group_id, "subject": "Математика", "topic_id": topic.id, "kind": "file"},
+        files={"file": (filename, content, "application/pdf")},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()["id"]
+
+
+def test_identical_uploads_share_one_blob(client, db_session, storage, topic, teacher_headers, override_settings):
+    override_settings(files_require_signature=False)
+    content = b"%PDF-1.4 shared notes"
+    key = blob_key(hashlib.sha256(content).hexdigest())
+
+    first_id = upload_theory(client, teacher_headers, topic, "notes.pdf", content)
+    second_id = upload_theory(client, teacher_headers, topic, "copy.pdf", content)
+
+    assert {theory.file_path for theory in db_session.query(Theory)} == {key}
+    assert list(storage.keys()) == [key]
+    for theory_id, filename in ((first_id, "notes.pdf"), (second_id, "copy.pdf")):
+        response = client.get(f"/files/{theory_id}")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == content
+        assert response.headers["content-type"] == "application/pdf"
+        if isinstance(storage, S3Storage):
+            assert response.headers["content-length"] == str(len(content))
+        else:
+            assert filename in response.headers["content-disposition"]
+
+
+def backdate(storage, key: str, seconds: int) -> None:
+    path = storage.local_path(key) or storage.client._path(storage.bucket, storage._object_key(key))
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_delete_theory_collects_unreferenced_blob(
+    client, db_session, storage, topic, teacher_headers, override_settings
+):
+    override_settings(blob_grace_seconds=0, files_require_signature=False)
+    content = b"%PDF-1.4 lecture"
+    key = blob_key(hashlib.sha256(content).hexdigest())
+    first_id = upload_theory(client, teacher_headers, topic, "notes.pdf", content)
+    second_id = upload_theory(client, teacher_headers, topic, "notes.pdf", content)
+
+    assert client.delete(f"/teacher/theory/{first_id}", headers=teacher_headers).status_code == status.HTTP_200_OK
+    assert storage.exists(key)
+    assert client.get(f"/files/{second_id}").content == content
+
+    assert client.delete(f"/teacher/theory/{second_id}", headers=teacher_headers).status_code == status.HTTP_200_OK
+    assert not storage.exists(key)
+    assert list(storage.keys()) == []
+
+
+def test_collect_garbage_removes_orphans_only(client, db_session, storage, topic, teacher_headers, tmp_path):
+    upload_theory(client, teacher_headers, topic, "notes.pdf", b"kept")
+    orphan = tmp_path / "orphan"
+    orphan.write_bytes(b"orphan")
+    orphan_key = blob_key(hashlib.sha256(b"orphan").hexdigest())
+    storage.put_file(orphan_key, str(orphan))
+
+    assert collect_garbage(db_session, storage) == 0
+    backdate(storage, orphan_key, 2 * 3600)
+    assert collect_garbage(db_session, storage) == 1
+    assert list(storage.keys()) == [blob_key(hashlib.sha256(b"kept").hexdigest())]
+
+
+def test_reupload_keeps_blob_released_by_concurrent_delete(
+    client, db_session, storage, topic, teacher_headers, override_settings, tmp_path
+):
+    override_settings(blob_grace_seconds=3600)
+    content = b"%PDF-1.4 shared"
+    key = blob_key(hashlib.sha256(content).hexdigest())
+    first_id = upload_theory(client, teacher_headers, topic, "notes.pdf", content)
+    backdate(storage, key, 2 * 3600)
+
+    # An upload of the same content has stored its blob but not yet committed its row.
+    source = tmp_path / "upload"
+    source.write_bytes(content)
+    storage.put_file(key, str(source))
+    assert client.delete(f"/teacher/theory/{first_id}", headers=teacher_headers).status_code == status.HTTP_200_OK
+    assert collect_garbage(db_session, storage) == 0
+    assert storage.exists(key)
+
+    backdate(storage, key, 2 * 3600)
+    assert collect_garbage(db_session, storage) == 1
+    assert not storage.exists(key)
+
+
+@pytest.mark.parametrize("upload_first", [True, False])
+def test_release_racing_a_reupload_keeps_the_blob(tmp_path, monkeypatch, upload_first):
+    storage = LocalStorage(str(tmp_path / "blobs"))
+    content = b"%PDF-1.4 shared"
+    key = blob_key(hashlib.sha256(content).hexdigest())
+    source = tmp_path / "upload"
+    source.write_bytes(content)
+    storage.put_file(key, str(source))
+    backdate(storage, key, 2 * 3600)
+
+    # The upload lands after the release saw an old blob, just before or just after it is detached.
+    rename = os.rename
+
+    def racing_rename(src, dst):
+        source.write_bytes(content)
+        if upload_first:
+            storage.put_file(key, str(source))
+        rename(src, dst)
+        if not upload_first:
+            storage.put_file(key, str(source))
+
+    monkeypatch.setattr(storage_module.os, "rename", racing_rename)
+    assert storage.delete_stale(key, 3600) is not upload_first
+    monkeypatch.undo()
+
+    assert not source.exists()
+    with storage.open(key) as stream:
+        assert stream.read() == content
+    assert time.time() - storage.modified_at(key) < 60
+    assert list(storage.keys()) == [key]
+
+
+def test_legacy_file_paths_are_still_served(
+    client, db_session, seed_data, topic, files_dir, tmp_path, override_settings
+):
+    override_settings(files_require_signature=False)
+    legacy = tmp_path / "1700000000.0_old.pdf"
+    legacy.write_bytes(b"old upload")
+    theory = Theory(
+        class_group_id=topic.class_group_id,
+        subject_id=topic.subject_id,
+        topic_id=topic.id,
+        kind=TheoryKind.file,
+        file_path=str(legacy),
+    )
+    db_session.add(theory)
+    db_session.commit()
+
+    response = client.get(f"/files/{theory.id}")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"old upload"
+
+
+def test_local_s3_client_put_is_idempotent(tmp_path):
+    storage = S3Storage(LocalS3Client(str(tmp_path / "s3")), "bucket", prefix="theory/")
+    for _ in range(2):
+        source = tmp_path / "blob"
+        source.write_bytes(b"payload")
+        storage.put_file("ab/cd/abcd", str(source))
+        assert not source.exists()
+
+    assert list(storage.keys()) == ["ab/cd/abcd"]
+    assert b"".join(storage.iter_bytes("ab/cd/abcd")) == b"payload"
+    storage.delete("ab/cd/abcd")
+    assert not storage.exists("ab/cd/abcd")
+
+
+def test_misspelled_backend_fails_at_startup():
+    with pytest.raises(ValidationError, match="storage_backend"):
+        Settings(storage_backend="s4")
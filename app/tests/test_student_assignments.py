@@ -0,0 +1,155 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.api.deps import get_db
+from app.models import StudentAssignmentProgress, Submission
+from app.services.progress import rebuild_progress
+
+
+def list_assignments(client, headers, topic_id: int):
+    response = client.get(
+        "/student/assignments",
+        params={"subject": "Математика", "type": "practice", "topic_id": topic_id},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_student_assignments_attempts_and_last_grade(client, db_session, seed_data, student_headers, make_assignment):
+    student = seed_data["student"]
+    done = make_assignment(title="ПР №1", max_attempts=2)
+    fresh = make_assignment(title="ПР №2", topic=done.topic)
+    db_session.add_all([
+        Submission(assignment_id=done.id, student_id=student.id, attempt_no=1, answers={}, score=40, grade=2),
+        Submission(assignment_id=done.id, student_id=student.id, attempt_no=2, answers={}, score=95, grade=5),
+    ])
+    rebuild_progress(db_session)
+    db_session.commit()
+
+    items = {item["id"]: item for item in list_assignments(client, student_headers, done.topic_id)}
+
+    assert items[done.id]["attempts_used"] == 2
+    assert items[done.id]["attempts_left"] == 0
+    assert items[done.id]["last_grade"] == 5
+    assert items[fresh.id]["attempts_used"] == 0
+    assert items[fresh.id]["attempts_left"] == 3
+    assert items[fresh.id]["last_grade"] is None
+
+
+def test_student_assignments_query_count_is_constant(
+    client, db_session, seed_data, student_headers, make_assignment, query_counter
+):
+    student = seed_data["student"]
+    first = make_assignment()
+    topic_id = first.topic_id
+
+    def add_with_submission(assignment):
+        db_session.add(
+            Submission(assignment_id=assignment.id, student_id=student.id, attempt_no=1, answers={}, score=100, grade=5)
+        )
+        db_session.commit()
+
+    add_with_submission(first)
+    list_assignments(client, student_headers, topic_id)
+    query_counter.clear()
+    list_assignments(client, student_headers, topic_id)
+    single = len(query_counter)
+
+    for index in range(10):
+        add_with_submission(make_assignment(title=f"ДЗ {index}", topic=first.topic))
+    query_counter.clear()
+    items = list_assignments(client, student_headers, topic_id)
+
+    assert len(items) == 11
+    assert len(query_counter) == single
+
+
+def test_parallel_submits_respect_max_attempts(db_engine, db_session, seed_data, student_headers, make_assignment):
+    assignment = make_assignment(max_attempts=3)
+    session_local = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+    def override_get_db():
+        db = session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(
+                pool.map(
+                    lambda _: TestClient(app).post(
+                        f"/student/assignments/{assignment.id}/submit", json={"answers": {}}, headers=student_headers
+                    ),
+                    range(8),
+                )
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+    accepted = [response.json() for response in responses if response.status_code == status.HTTP_200_OK]
+    assert sorted(item["attempt_no"] for item in accepted) == [1, 2, 3]
+    assert sorted(item["attempts_left"] for item in accepted) == [0, 1, 2]
+    assert all(response.status_code in (200, 400) for response in responses)
+    stored = db_session.query(Submission.attempt_no).filter(Submission.assignment_id == assignment.id).all()
+    assert sorted(attempt_no for (attempt_no,) in stored) == [1, 2, 3]
+
+
+def test_attempt_numbers_are_unique(db_session, seed_data, make_assignment):
+    assignment = make_assignment()
+    student = seed_data["student"]
+    for _ in range(2):
+        db_session.add(
+            Submission(assignment_id=assignment.id, student_id=student.id, attempt_no=1, answers={}, score=0, grade=2)
+        )
+
+    with pytest.raises(IntegrityError):
+        db_session.commit()
+    db_session.rollback()
+
+
+def test_progress_row_follows_submits_and_reset(
+    client, db_session, seed_data, student_headers, teacher_headers, make_assignment
+):
+    student = seed_data["student"]
+    assignment = make_assignment(questions=[{"type": "select", "prompt": "2 + 2", "points": 1, "correct_answer": "4"}])
+    url = f"/student/assignments/{assignment.id}/submit"
+
+    for answer in ("4", "5"):
+        assert client.post(url, json={"answers": {"q1": answer}}, headers=student_headers).status_code == 200
+
+    def progress():
+        db_session.expire_all()
+        return db_session.get(StudentAssignmentProgress, (student.id, assignment.id))
+
+    row = progress()
+    assert (row.attempts_used, row.last_score, row.last_grade, row.best_score, row.best_grade) == (2, 0, 2, 100, 5)
+    assert row.last_submitted_at is not None
+    maintained = (row.attempts_used, row.last_score, row.last_grade, row.best_score, row.best_grade)
+
+    rebuild_progress(db_session)
+    db_session.commit()
+    row = progress()
+    assert (row.attempts_used, row.last_score, row.last_grade, row.best_score, row.best_grade) == maintained
+
+    detail = client.get(f"/student/assignments/{assignment.id}", headers=student_headers).json()
+    assert (detail["attempts_used"], detail["attempts_left"]) == (2, 1)
+
+    reset = client.post(
+        "/teacher/attempts/reset",
+        json={"student_id": student.id, "assignment_id": assignment.id},
+        headers=teacher_headers,
+    )
+    assert reset.status_code == 200
+    assert progress() is None
+    assert client.post(url, json={"answers": {"q1": "4"}}, headers=student_headers).json()["attempt_no"] == 1
@@ -0,0 +1,124 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.api.deps import get_async_db, get_db
+from app.api.routes import student, student_async
+from app.db.session import to_async_url
+from app.models import Submission
+from app.services.progress import rebuild_progress
+from app.services.response_cache import get_response_cache
+
+
+@pytest.fixture()
+def async_client(db_engine, db_session):
+    async_engine = create_async_engine(to_async_url(db_engine.url.render_as_string()), poolclass=NullPool)
+    session_local = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_local() as db:
+            yield db
+
+    def override_get_db():
+        yield db_session
+
+    app = FastAPI()
+    app.include_router(student_async.router, prefix="/student")
+    app.include_router(student.router, prefix="/student")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+
+
+def test_to_async_url():
+    assert to_async_url("postgresql://admin:admin@db:5432/school") == "postgresql+asyncpg://admin:admin@db:5432/school"
+    assert to_async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+
+
+def test_async_student_endpoints_match_sync(async_client, client, db_session, seed_data, student_headers, make_assignment):
+    student = seed_data["student"]
+    assignment = make_assignment()
+    topic_id = assignment.topic_id
+    db_session.add(
+        Submission(assignment_id=assignment.id, student_id=student.id, attempt_no=1, answers={}, score=80, grade=4)
+    )
+    rebuild_progress(db_session)
+    db_session.commit()
+
+    requests = [
+        ("/student/topics", {"subject": "Математика"}),
+        ("/student/theory", {"subject": "Математика", "topic_id": topic_id}),
+        ("/student/assignments", {"subject": "Математика", "type": "practice", "topic_id": topic_id}),
+        ("/student/grades", {"subject": "Математика"}),
+    ]
+    for path, params in requests:
+        async_response = async_client.get(path, params=params, headers=student_headers)
+        sync_response = client.get(path, params=params, headers=student_headers)
+        assert async_response.status_code == 200, path
+        assert async_response.json() == sync_response.json(), path
+
+    assert async_client.get(
+        "/student/assignments",
+        params={"subject": "Математика", "type": "practice", "topic_id": topic_id},
+        headers=student_headers,
+    ).json()[0]["last_grade"] == 4
+
+
+def test_async_list_etags_match_sync(async_client, client, student_headers, make_assignment):
+    assignment = make_assignment()
+    requests = [
+        ("/student/assignments", {"subject": "Математика", "type": "practice", "topic_id": assignment.topic_id}),
+        ("/student/grades", {"subject": "Математика"}),
+    ]
+    for path, params in requests:
+        etag = client.get(path, params=params, headers=student_headers).headers["ETag"]
+        polled = async_client.get(path, params=params, headers={**student_headers, "If-None-Match": etag})
+        assert polled.status_code == 304, path
+
+
+def test_async_routes_use_only_the_async_session(async_client, seed_data, student_headers, make_assignment):
+    assignment = make_assignment()
+    async_client.app.dependency_overrides[get_db] = lambda: pytest.fail("async route opened a sync session")
+    requests = [
+        ("/student/topics", {"subject": "Математика"}),
+        ("/student/theory", {"subject": "Математика", "topic_id": assignment.topic_id}),
+        ("/student/assignments", {"subject": "Математика", "type": "practice", "topic_id": assignment.topic_id}),
+        ("/student/grades", {"subject": "Математика"}),
+    ]
+    for path, params in requests:
+        assert async_client.get(path, params=params, headers=student_headers).status_code == 200, path
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis-local"])
+def test_async_catalog_routes_share_the_response_cache(
+    backend, async_client, client, student_headers, make_assignment, override_settings
+):
+    override_settings(response_cache_backend=backend)
+    get_response_cache.cache_clear()
+    assignment = make_assignment()
+    requests = [
+        ("/student/topics", {"subject": "Математика"}),
+        ("/student/theory", {"subject": "Математика", "topic_id": assignment.topic_id}),
+    ]
+    for path, params in requests:
+        sync_response = client.get(path, params=params, headers=student_headers)
+        async_response = async_client.get(path, params=params, headers=student_headers)
+        assert (sync_response.headers["X-Cache"], async_response.headers["X-Cache"]) == ("miss", "hit"), path
+        assert async_response.headers["ETag"] == sync_response.headers["ETag"], path
+        polled = async_client.get(
+            path, params=params, headers={**student_headers, "If-None-Match": sync_response.headers["ETag"]}
+        )
+        assert polled.status_code == 304, path
+
+
+def test_async_routes_reject_revoked_tokens(async_client, db_session, seed_data, student_headers):
+    student = seed_data["student"]
+    assert async_client.get("/student/topics", params={"subject": "Математика"}, headers=student_headers).status_code == 200
+
+    student.token_version = (student.token_version or 0) + 1
+    db_session.commit()
+
+    response = async_client.get("/student/topics", params={"subject": "Математика"}, headers=student_headers)
+    assert response.status_code == 401
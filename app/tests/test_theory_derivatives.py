@@ -0,0 +1,195 @@
+import asyncio
+import io
+import os
+import time
+import zipfile
+
+import pytest
+from fastapi import status
+
+from app.models import Theory, TheoryDerivative, Topic
+from app.services.derivatives import build_derivatives
+from app.services.storage import blob_key, blob_references
+from app.services.theory_processing import derivative_workers
+
+
+def png_bytes(size=(2400, 1800)) -> bytes:
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.radial_gradient("L").resize(size).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, "PNG")
+    return output.getvalue()
+
+
+def pdf_bytes() -> bytes:
+    pikepdf = pytest.importorskip("pikepdf")
+    pdf = pikepdf.new()
+    font = pdf.make_indirect(
+        pikepdf.Dictionary(Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1, BaseFont=pikepdf.Name.Helvetica)
+    )
+    for number in range(3):
+        page = pdf.add_blank_page(page_size=(595, 842))
+        page.Resources = pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=font))
+        page.Contents = pdf.make_stream(f"BT /F1 12 Tf 72 770 Td (Fractions, page {number + 1}) Tj ET".encode())
+    output = io.BytesIO()
+    pdf.save(output)
+    return output.getvalue()
+
+
+def docx_bytes() -> bytes:
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        archive.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            "<w:p><w:r><w:t>Сложение </w:t></w:r><w:r><w:t>дробей</w:t></w:r></w:p>"
+            "<w:p><w:r><w:t>Пример 1</w:t></w:r></w:p>"
+            "</w:body></w:document>",
+        )
+    return output.getvalue()
+
+
+def build(tmp_path, filename: str, content: bytes) -> dict:
+    source = tmp_path / filename
+    source.write_bytes(content)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    return build_derivatives(str(source), filename, str(output_dir), 1600, 320, 80)
+
+
+def test_image_derivatives_are_downscaled(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    content = png_bytes()
+
+    outputs = build(tmp_path, "scan.png", content)
+
+    optimized_path, optimized_name = outputs["optimized"]
+    assert optimized_name == "scan.jpg"
+    assert os.path.getsize(optimized_path) < len(content)
+    with Image.open(optimized_path) as image:
+        assert max(image.size) == 1600
+    with Image.open(outputs["thumbnail"][0]) as image:
+        assert max(image.size) == 320
+
+
+def test_pdf_derivatives(tmp_path):
+    pikepdf = pytest.importorskip("pikepdf")
+
+    outputs = build(tmp_path, "lecture.pdf", pdf_bytes())
+
+    with pikepdf.open(outputs["optimized"][0]) as pdf:
+        assert pdf.is_linearized
+    assert outputs["thumbnail"][1] == "lecture-thumbnail.jpg"
+    with open(outputs["text"][0], encoding="utf-8") as text:
+        assert "Fractions, page 3" in text.read()
+
+
+def test_docx_text_is_extracted(tmp_path):
+    outputs = build(tmp_path, "notes.docx", docx_bytes())
+
+    assert list(outputs) == ["text"]
+    with open(outputs["text"][0], encoding="utf-8") as text:
+        assert text.read() == "Сложение дробей\nПример 1"
+
+
+def test_unknown_formats_have_no_derivatives(tmp_path):
+    assert build(tmp_path, "video.mp4", b"\x00" * 64) == {}
+
+
+def upload_theory(client, headers, topic: Topic, filename: str, content: bytes) -> dict:
+    response = client.post(
+        "/teacher/theory",
+        data={"class_id": topic.class_group_id, "subject": "Математика", "topic_id": topic.id, "kind": "file"},
+        files={"file": (filename, content, "application/octet-stream")},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def list_theory(client, headers, topic: Topic) -> list:
+    response = client.get(
+        "/teacher/theory",
+        params={"class_id": topic.class_group_id, "subject": "Математика"},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_upload_builds_derivatives_in_worker_process(client, db_session, storage, topic, teacher_headers):
+    content = png_bytes()
+
+    created = upload_theory(client, teacher_headers, topic, "scan.png", content)
+
+    assert created["processing_status"] == "pending"
+    assert created["thumbnail_url"] is None
+    assert derivative_workers._executor is not None
+    [theory] = list_theory(client, teacher_headers, topic)
+    assert theory["processing_status"] == "ready"
+    assert theory["text_url"] is None
+    thumbnail = client.get(theory["thumbnail_url"])
+    assert thumbnail.status_code == status.HTTP_200_OK
+    assert thumbnail.headers["content-type"] == "image/jpeg"
+    optimized = client.get(theory["optimized_url"])
+    assert len(optimized.content) < len(content)
+    assert client.get(theory["file_url"]).content == content
+    assert len(list(storage.keys())) == 3
+
+
+def test_unsigned_derivative_urls(client, storage, topic, teacher_headers, override_settings):
+    override_settings(files_signed_urls=False, files_require_signature=False)
+    upload_theory(client, teacher_headers, topic, "scan.png", png_bytes())
+
+    [theory] = list_theory(client, teacher_headers, topic)
+
+    assert theory["thumbnail_url"].startswith(f"/files/{theory['id']}?d=thumbnail&v=")
+    assert client.get(theory["thumbnail_url"]).headers["content-type"] == "image/jpeg"
+
+
+def test_identical_uploads_share_derivatives_and_are_collected(
+    client, db_session, storage, topic, teacher_headers, override_settings
+):
+    override_settings(blob_grace_seconds=0)
+    content = png_bytes()
+    first = upload_theory(client, teacher_headers, topic, "scan.png", content)
+    second = upload_theory(client, teacher_headers, topic, "scan.png", content)
+
+    rows = {row.id: row for row in db_session.query(Theory)}
+    assert rows[first["id"]].derivatives == rows[second["id"]].derivatives
+    assert len(list(storage.keys())) == 3
+    keys = {blob_key(derivative["sha256"]) for derivative in rows[first["id"]].derivatives.values()}
+    assert {row.blob_key for row in db_session.query(TheoryDerivative)} == keys
+    assert {blob_references(db_session, key) for key in keys} == {2}
+
+    client.delete(f"/teacher/theory/{first['id']}", headers=teacher_headers)
+    assert len(list(storage.keys())) == 3
+    assert {blob_references(db_session, key) for key in keys} == {1}
+    client.delete(f"/teacher/theory/{second['id']}", headers=teacher_headers)
+    assert list(storage.keys()) == []
+
+
+def test_failed_processing_is_recorded(client, storage, topic, teacher_headers):
+    upload_theory(client, teacher_headers, topic, "broken.pdf", b"not a pdf")
+
+    [theory] = list_theory(client, teacher_headers, topic)
+
+    assert theory["processing_status"] == "failed"
+    assert theory["thumbnail_url"] is None
+
+
+def test_hung_derivative_worker_is_killed():
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(derivative_workers.run(time.sleep, 30, timeout=0.5))
+
+    assert asyncio.run(derivative_workers.run(abs, -1, timeout=30)) == 1
+
+
+def test_processing_that_times_out_is_failed(client, storage, topic, teacher_headers, override_settings):
+    override_settings(derivatives_timeout_seconds=0.001)
+    upload_theory(client, teacher_headers, topic, "scan.png", png_bytes())
+
+    [theory] = list_theory(client, teacher_headers, topic)
+
+    assert theory["processing_status"] == "failed"
+    assert theory["thumbnail_url"] is None
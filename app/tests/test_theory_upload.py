@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import tracemalloc
+
+import pytest
+from fastapi import status
+
+from app.models import Theory, Topic
+from app.services.storage import LocalStorage, blob_key
+from app.services.uploads import InvalidUpload, UploadTooLarge, save_multipart_upload
+
+MEMORY_LIMIT = 4 * 1024 * 1024
+CHUNK = 256 * 1024
+BOUNDARY = "lecture-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def multipart_body(size: int, fields: dict = None) -> tuple:
+    # Yields the body in CHUNK-sized pieces, the way a server hands over a large request.
+    digest = hashlib.sha256()
+    block = bytes(range(256)) * (CHUNK // 256)
+
+    def chunks():
+        for name, value in (fields or {"kind": "file"}).items():
+            yield (
+                f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            ).encode()
+        yield (
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="../lecture.mp4"\r\n'
+            "Content-Type: video/mp4\r\n\r\n"
+        ).encode()
+        written = 0
+        while written < size:
+            piece = block[: size - written]
+            written += len(piece)
+            yield piece
+        yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+    written = 0
+    while written < size:
+        piece = block[: size - written]
+        digest.update(piece)
+        written += len(piece)
+    return chunks(), digest.hexdigest()
+
+
+async def as_stream(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def save(tmp_path, chunks, storage, max_bytes: int):
+    return asyncio.run(
+        save_multipart_upload(
+            as_stream(chunks),
+            CONTENT_TYPE,
+            storage,
+            str(tmp_path / "staging"),
+            file_field="file",
+            max_bytes=max_bytes,
+            chunk_size=CHUNK,
+        )
+    )
+
+
+def test_save_multipart_upload_streams_with_bounded_memory(tmp_path):
+    size = 4 * MEMORY_LIMIT
+    chunks, expected_sha = multipart_body(size)
+    storage = LocalStorage(str(tmp_path / "files"))
+
+    tracemalloc.start()
+    try:
+        fields, stored = save(tmp_path, chunks, storage, max_bytes=size)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < MEMORY_LIMIT
+    assert fields == {"kind": "file"}
+    assert stored.size == size
+    assert stored.sha256 == expected_sha
+    assert stored.filename == "lecture.mp4"
+    assert stored.key == blob_key(expected_sha)
+    assert list(storage.keys()) == [stored.key]
+    assert list((tmp_path / "staging").iterdir()) == []
+
+
+def test_save_multipart_upload_stops_reading_past_the_limit(tmp_path):
+    chunks, _ = multipart_body(8 * CHUNK)
+    storage = LocalStorage(str(tmp_path / "files"))
+    with pytest.raises(UploadTooLarge):
+        save(tmp_path, chunks, storage, max_bytes=2 * CHUNK)
+    # The remaining file chunks and the closing boundary are never requested.
+    assert len(list(chunks)) > 4
+    assert list(storage.keys()) == []
+    assert list((tmp_path / "staging").iterdir()) == []
+
+
+def test_save_multipart_upload_rejects_oversized_fields(tmp_path):
+    chunks, _ = multipart_body(CHUNK, {"kind": "x" * (128 * 1024)})
+    with pytest.raises(InvalidUpload):
+        save(tmp_path, chunks, LocalStorage(str(tmp_path / "files")), max_bytes=2 * CHUNK)
+    assert list((tmp_path / "staging").iterdir()) == []
+
+
+def add_topic(db_session, seed_data) -> Topic:
+    topic = Topic(
+        title="Дроби",
+        subject_id=seed_data["teacher"].subject_id,
+        class_group_id=seed_data["student"].class_group_id,
+    )
+    db_session.add(topic)
+    db_session.commit()
+    return topic
+
+
+def upload_theory(client, headers, topic: Topic, content: bytes):
+    return client.post(
+        "/teacher/theory",
+        data={"class_id": topic.class_group_id, "subject": "Математика", "topic_id": topic.id, "kind": "file"},
+        files={"file": ("notes.pdf", content, "application/pdf")},
+        headers=headers,
+    )
+
+
+def test_create_theory_stores_file_metadata(client, db_session, seed_data, teacher_headers, files_dir):
+    topic = add_topic(db_session, seed_data)
+
+    response = upload_theory(client, teacher_headers, topic, b"%PDF-1.4 notes")
+
+    assert response.status_code == status.HTTP_200_OK
+    theory = db_session.get(Theory, response.json()["id"])
+    assert theory.file_name == "notes.pdf"
+    assert theory.file_size == len(b"%PDF-1.4 notes")
+    assert theory.file_sha256 == hashlib.sha256(b"%PDF-1.4 notes").hexdigest()
+
+
+def test_create_theory_rejects_file_over_limit(
+    client, db_session, seed_data, teacher_headers, files_dir, override_settings
+):
+    topic = add_topic(db_session, seed_data)
+    override_settings(max_upload_bytes=8)
+
+    response = upload_theory(client, teacher_headers, topic, b"x" * 64)
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert db_session.query(Theory).count() == 0
+
+
+def test_chunked_upload_without_content_length_is_capped(
+    client, db_session, seed_data, teacher_headers, files_dir, override_settings
+):
+    topic = add_topic(db_session, seed_data)
+    override_settings(max_upload_bytes=CHUNK)
+    fields = {"class_id": topic.class_group_id, "subject": "Математика", "topic_id": topic.id, "kind": "file"}
+    chunks, _ = multipart_body(4 * CHUNK, fields)
+
+    response = client.post(
+        "/teacher/theory", content=chunks, headers={**teacher_headers, "Content-Type": CONTENT_TYPE}
+    )
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert db_session.query(Theory).count() == 0
+
+
+def test_upload_with_missing_fields_is_rejected(client, db_session, seed_data, teacher_headers, files_dir):
+    response = client.post(
+        "/teacher/theory",
+        data={"kind": "file"},
+        files={"file": ("notes.pdf", b"%PDF-1.4", "application/pdf")},
+        headers=teacher_headers,
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
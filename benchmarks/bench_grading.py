@@ -0,0 +1,79 @@
+"""Per-submission grading cost with and without a compiled grading plan.
+
+Grades the same 100-question test with the previous implementation, which walked
+the raw questions JSON on every call, and with the cached compiled plan.
+
+    python -m benchmarks.bench_grading --questions 100 --number 20000
+"""
+
+import argparse
+import random
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.services.grading import grade_submission, score_to_grade
+
+
+def grade_uncompiled(assignment, answers):
+    total_points = 0
+    earned_points = 0
+    for index, question in enumerate(assignment.questions, start=1):
+        points = int(question.get("points", 1))
+        total_points += points
+        answer = answers.get(f"q{index}")
+        correct_answer = question.get("correct_answer")
+        q_type = question.get("type")
+        if correct_answer is None:
+            continue
+        if q_type == "select":
+            if answer == correct_answer:
+                earned_points += points
+        elif q_type == "checkbox":
+            if isinstance(answer, list) and set(answer) == set(correct_answer):
+                earned_points += points
+        elif q_type == "text":
+            if isinstance(answer, str) and str(correct_answer).strip().lower() == answer.strip().lower():
+                earned_points += points
+    score = int((earned_points / total_points) * 100) if total_points else 0
+    return score, score_to_grade(score)
+
+
+def make_test(questions: int, seed: int = 1):
+    rng = random.Random(seed)
+    items, answers = [], {}
+    for index in range(1, questions + 1):
+        kind = ("select", "checkbox", "text")[index % 3]
+        if kind == "select":
+            correct = rng.choice("abcd")
+            answer = correct if rng.random() < 0.7 else "a"
+        elif kind == "checkbox":
+            correct = rng.sample(["a", "b", "c", "d", "e"], 3)
+            answer = list(reversed(correct)) if rng.random() < 0.7 else correct[:2]
+        else:
+            correct = f"  Ответ номер {index} "
+            answer = correct.upper() if rng.random() < 0.7 else "не знаю"
+        items.append(
+            {"type": kind, "text": f"Вопрос {index}", "points": str(rng.randint(1, 3)), "correct_answer": correct}
+        )
+        answers[f"q{index}"] = answer
+    assignment = SimpleNamespace(id=1, updated_at=datetime(2026, 1, 1), questions=items)
+    return assignment, answers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    assignment, answers = make_test(args.questions)
+    assert grade_uncompiled(assignment, answers) == grade_submission(assignment, answers)
+
+    for name, func in (("uncompiled", grade_uncompiled), ("compiled", grade_submission)):
+        best = min(timeit.repeat(lambda: func(assignment, answers), number=args.number, repeat=5))
+        print(f"{name:>10}: {best / args.number * 1e6:.1f} us per submission")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Serializing a large submission list: response_model path against FastJSONResponse.
+
+Serves the same ``--items`` submissions through a minimal app three ways: building the
+response model and letting FastAPI validate and serialize it (the previous route code),
+returning dicts that FastAPI validates against response_model, and returning the dicts
+through FastJSONResponse. Timings are per request and include the in-process HTTP round trip.
+
+    python -m benchmarks.bench_json --items 10000 --number 20
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.responses import FastJSONResponse
+from app.schemas.assignment import SubmissionList
+
+
+def submissions(count: int) -> list:
+    started = datetime(2024, 9, 1, 8, 0)
+    return [
+        {
+            "id": index,
+            "student_id": index % 300,
+            "student_name": f"Ученик {index % 300}",
+            "attempt_no": 1 + index % 3,
+            "answers": {f"q{question}": ("b", ["a", "c"], "ответ")[question % 3] for question in range(1, 21)},
+            "score": index % 101,
+            "grade": 2 + index % 4,
+            "submitted_at": (started + timedelta(minutes=index)).isoformat(),
+        }
+        for index in range(count)
+    ]
+
+
+def build_app(items: list) -> FastAPI:
+    app = FastAPI()
+    payload = {"items": items, "page": 1, "page_size": len(items), "total": len(items)}
+
+    @app.get("/model", response_model=SubmissionList)
+    def model():
+        return SubmissionList(**payload)
+
+    @app.get("/dicts", response_model=SubmissionList)
+    def dicts():
+        return payload
+
+    @app.get("/fast", response_model=SubmissionList)
+    def fast():
+        return FastJSONResponse(payload)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    client = TestClient(build_app(submissions(args.items)))
+    bodies = {path: client.get(path).json() for path in ("/model", "/dicts", "/fast")}
+    assert bodies["/model"] == bodies["/dicts"] == bodies["/fast"]
+
+    timings = {}
+    for path in bodies:
+        seconds = min(timeit.repeat(lambda: client.get(path), number=args.number, repeat=3)) / args.number
+        timings[path] = seconds
+        print(f"{path:7} {seconds * 1000:8.1f} ms/request")
+    print(f"FastJSONResponse is {timings['/model'] / timings['/fast']:.1f}x faster than the response model path")
+
+
+if __name__ == "__main__":
+    main()
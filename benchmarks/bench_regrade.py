@@ -0,0 +1,124 @@
+"""Regrading a large assignment: wall time and peak Python memory.
+
+Fills a scratch SQLite database with ``--submissions`` rows for one assignment and runs
+the chunked regrade over them.
+
+    python -m benchmarks.bench_regrade --submissions 100000 --chunk-size 2000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models import (
+    Assignment,
+    AssignmentType,
+    ClassGroup,
+    RegradeJob,
+    Subject,
+    Submission,
+    Topic,
+    User,
+    UserRole,
+)
+from app.services.regrade import run_regrade_job, start_regrade_job
+
+QUESTIONS = [
+    {
+        "type": ("select", "checkbox", "text")[index % 3],
+        "prompt": f"Вопрос {index}",
+        "points": 1 + index % 3,
+        "correct_answer": ("b", ["a", "c"], "ответ")[index % 3],
+    }
+    for index in range(20)
+]
+
+
+def answers(rng: random.Random) -> dict:
+    values = ("b", ["c", "a"], "Ответ")
+    return {f"q{index + 1}": values[index % 3] if rng.random() < 0.7 else None for index in range(len(QUESTIONS))}
+
+
+def seed(session, submissions: int) -> int:
+    class_group = ClassGroup(grade=7, letter="а", name="7а")
+    subject = Subject(name="Математика")
+    session.add_all([class_group, subject])
+    session.flush()
+    topic = Topic(title="Дроби", subject_id=subject.id, class_group_id=class_group.id)
+    student = User(full_name="Ученик", phone="+70000000000", role=UserRole.student, class_group_id=class_group.id)
+    session.add_all([topic, student])
+    session.flush()
+    assignment = Assignment(
+        class_group_id=class_group.id,
+        subject_id=subject.id,
+        topic_id=topic.id,
+        type=AssignmentType.homework,
+        title="Контрольная",
+        max_attempts=submissions,
+        questions=QUESTIONS,
+    )
+    session.add(assignment)
+    session.flush()
+
+    rng = random.Random(1)
+    batch = []
+    for attempt_no in range(1, submissions + 1):
+        batch.append(
+            {
+                "assignment_id": assignment.id,
+                "student_id": student.id,
+                "attempt_no": attempt_no,
+                "answers": answers(rng),
+                "score": 0,
+                "grade": 2,
+            }
+        )
+        if len(batch) == 10000:
+            session.execute(insert(Submission), batch)
+            batch = []
+    if batch:
+        session.execute(insert(Submission), batch)
+    session.commit()
+    return assignment.id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--submissions", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        session_local = sessionmaker(bind=engine)
+        with session_local() as session:
+            assignment_id = seed(session, args.submissions)
+
+        with session_local() as session:
+            job_id = start_regrade_job(session, assignment_id)[0].id
+        tracemalloc.start()
+        started = time.perf_counter()
+        run_regrade_job(session_local, job_id, args.chunk_size)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with session_local() as session:
+            job = session.get(RegradeJob, job_id)
+        engine.dispose()
+
+    print(
+        f"{job.processed} submissions, {job.updated} updated in {elapsed:.2f} s "
+        f"({job.processed / elapsed:.0f}/s), peak Python memory {peak / 2**20:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Throughput of the student read endpoints with the sync and the async database engine.
+
+Starts uvicorn once per mode against the same database and fires ``--clients``
+concurrent clients at ``/student/assignments``.
+
+    python -m benchmarks.bench_student_async --clients 500 --requests 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+STUDENT_PHONE = "+79990001001"
+STUDENT_PASSWORD = "student123"
+
+
+def start_server(port: int, database_url: str, async_db: bool, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url, ASYNC_DB_ENABLED=str(async_db).lower())
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get("/docs")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def run_load(base_url: str, clients: int, requests_per_client: int) -> dict:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        response = await client.post("/auth/login", json={"phone": STUDENT_PHONE, "password": STUDENT_PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        params = {"subject": "Математика", "type": "practice", "topic_id": 1}
+        latencies = []
+        errors = 0
+
+        async def worker() -> None:
+            nonlocal errors
+            for _ in range(requests_per_client):
+                started = time.perf_counter()
+                try:
+                    result = await client.get("/student/assignments", params=params, headers=headers)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if result.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latencies) or [0.0]
+    return {
+        "requests": clients * requests_per_client,
+        "errors": errors,
+        "rps": (clients * requests_per_client - errors) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    for async_db in (False, True):
+        server = start_server(args.port, args.database_url, async_db, args.workers)
+        try:
+            asyncio.run(wait_until_ready(base_url))
+            stats = asyncio.run(run_load(base_url, args.clients, args.requests))
+        finally:
+            server.terminate()
+            server.wait()
+        mode = "async" if async_db else "sync"
+        print(
+            f"{mode:>5}: {stats['requests']} requests, {stats['errors']} errors, "
+            f"{stats['rps']:.0f} req/s, p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
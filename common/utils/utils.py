@@ -9,6 +9,7 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import NoResultFound
 
+from app.services.grading import compile_grading_plan, earned_points
 from common.models import models
 from common.models.models import (
     Student, TeachersAuthCode, Teacher,
@@ -413,35 +414,20 @@ def get_current_student(
     return student_in_db
 
 
-def do_autograde_test(test, answers_list):
-    question_map = {q.id: q for q in test.questions}
-    total = len(test.questions)
-    correct = 0
-
-    for ans_item in answers_list:
-        qid = ans_item.question_id
-        user_answer = ans_item.answer
-        question = question_map.get(qid)
-        if not question:
-            continue
-
-        if question.question_type in ["multiple_choice", "single_choice"]:
-            correct_this = False
-            if question.question_type == "multiple_choice":
-                if isinstance(user_answer, list) and question.correct_answers:
-                    if set(user_answer) == set(question.correct_answers):
-                        correct_this = True
-            else:
-                if isinstance(user_answer, str) and question.correct_answers:
-                    if user_answer in question.correct_answers:
-                        correct_this = True
-            if correct_this:
-                correct += 1
-
-        elif question.question_type == "text_input":
-            if question.text_answer and isinstance(user_answer, str):
-                if user_answer.strip().lower() == question.text_answer.strip().lower():
-                    correct += 1
+def _autograde(questions, answers_list):
+    # Старые тесты и экзамены проверяются тем же движком, что и задания app/: каждый вопрос стоит 1 балл.
+    keys = {q.id: f"q{index}" for index, q in enumerate(questions, start=1)}
+    plan = compile_grading_plan(
+        {
+            "type": q.question_type,
+            "points": 1,
+            "correct_answer": (q.text_answer if q.question_type == "text_input" else q.correct_answers) or None,
+        }
+        for q in questions
+    )
+    answers = {keys[item.question_id]: item.answer for item in answers_list if item.question_id in keys}
+    correct = earned_points(plan, answers)
+    total = len(questions)
 
     score = 0.0
     if total > 0:
@@ -449,40 +435,12 @@ def do_autograde_test(test, answers_list):
     return (correct, total, score)
 
 
-def do_autograde_exam(exam, answers_list):
-    question_map = {q.id: q for q in exam.questions}
-    total = len(exam.questions)
-    correct = 0
-
-    for ans_item in answers_list:
-        qid = ans_item.question_id
-        user_answer = ans_item.answer
-        question = question_map.get(qid)
-        if not question:
-            continue
+def do_autograde_test(test, answers_list):
+    return _autograde(test.questions, answers_list)
 
-        if question.question_type in ["multiple_choice", "single_choice"]:
-            correct_this = False
-            if question.question_type == "multiple_choice":
-                if isinstance(user_answer, list) and question.correct_answers:
-                    if set(user_answer) == set(question.correct_answers):
-                        correct_this = True
-            else:
-                if isinstance(user_answer, str) and question.correct_answers:
-                    if user_answer in question.correct_answers:
-                        correct_this = True
-            if correct_this:
-                correct += 1
-
-        elif question.question_type == "text_input":
-            if question.text_answer and isinstance(user_answer, str):
-                if user_answer.strip().lower() == question.text_answer.strip().lower():
-                    correct += 1
 
-    score = 0.0
-    if total > 0:
-        score = (correct / total) * 100.0
-    return (correct, total, score)
+def do_autograde_exam(exam, answers_list):
+    return _autograde(exam.questions, answers_list)
 
 
 def calculate_grade_from_score(score: float) -> str: